@@ -452,6 +452,13 @@ class ProcessingInstallationError(InaSAFEError):
     pass
 
 
+class ScratchQuotaExceededError(InaSAFEError):
+
+    """When the scratch workspaces use more than their quota."""
+
+    pass
+
+
 class AlignRastersError(Exception):
 
     """Raised if alignment of hazard and exposure rasters failed."""
@@ -31,6 +31,10 @@ from safe.utilities.rounding import (
 import logging
 LOGGER = logging.getLogger('InaSAFE')
 
+# Scratch workspaces in use, the last one is used by temp_dir and
+# unique_filename. See safe.utilities.scratch.
+scratch_workspaces = []
+
 
 class MEMORYSTATUSEX(ctypes.Structure):
 
@@ -101,6 +105,9 @@ def temp_dir(sub_dir='work'):
     If you specify INASAFE_WORK_DIR as an environment var, it will be
     used in preference to the system temp directory.
 
+    If a scratch workspace is in use, the directory is created in this
+    workspace instead, so it is removed with the workspace.
+
     :param sub_dir: Optional argument which will cause an additional
         subdirectory to be created e.g. /tmp/inasafe/foo/
     :type sub_dir: str
@@ -110,6 +117,12 @@ def temp_dir(sub_dir='work'):
 
     :raises: Any errors from the underlying system calls.
     """
+    if scratch_workspaces:
+        path = os.path.join(scratch_workspaces[-1].path, sub_dir)
+        if not os.path.exists(path):
+            os.makedirs(path)
+        return path
+
     user = getpass.getuser().replace(' ', '_')
     current_date = date.today()
     date_string = current_date.isoformat()
@@ -0,0 +1,258 @@
+# coding=utf-8
+
+"""Add layers to a datastore in a background thread.
+
+In debug mode, the impact function writes every intermediate layer to the
+datastore, which takes as long as the analysis itself on big layers. The
+background writer takes a snapshot of the layer, in memory, and writes it in
+a thread while the analysis continues. Only the data is written in the
+thread: the names are given when layers are added, the keywords are written
+and the layers are checked in the main thread at the end, since it needs the
+layers of the datastore. Raster layers are not copied, a QGIS layer can't be
+used in two threads, they are written directly once the layers before them
+are written. Layers get the same names and the same content as if they were
+written directly.
+"""
+
+import logging
+from copy import deepcopy
+from Queue import Queue
+from threading import Thread
+from uuid import uuid4
+
+from qgis.core import QGis, QgsFeature, QgsVectorLayer, QgsWKBTypes
+
+from safe.gis.sanity_check import check_layer
+from safe.gis.vector.feature_writer import FeatureWriter, is_scratch_layer
+from safe.utilities.gis import is_vector_layer
+from safe.utilities.i18n import tr
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# If False, layers are written directly by add_layer.
+background = True
+
+# Maximum number of layers waiting to be written. When the queue is full,
+# add_layer waits, so snapshots don't use all the memory.
+queue_size = 4
+
+
+def layer_snapshot(layer):
+    """Copy a vector layer in memory, with its keywords.
+
+    The features are copied in the same order, with the same geometry type,
+    CRS and fields, so the snapshot is written like the layer. The FID of a
+    scratch layer is not copied, it's not an attribute.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :return: The copy.
+    :rtype: QgsVectorLayer
+    """
+    if layer.wkbType() == QGis.WKBNoGeometry:
+        geometry = 'none'
+    else:
+        geometry = QgsWKBTypes.displayString(
+            QGis.fromOldWkbType(layer.wkbType()))
+    snapshot = QgsVectorLayer(
+        '%s?uuid=%s' % (geometry, uuid4()), layer.name(), 'memory')
+    snapshot.setCrs(layer.crs())
+    start = 1 if is_scratch_layer(layer) else 0
+    snapshot.dataProvider().addAttributes(layer.fields().toList()[start:])
+    snapshot.updateFields()
+
+    out_feature = QgsFeature()
+    with FeatureWriter(snapshot) as writer:
+        for feature in layer.getFeatures():
+            out_feature.setGeometry(feature.geometry())
+            out_feature.setAttributes(feature.attributes()[start:])
+            writer.addFeature(out_feature)
+
+    snapshot.keywords = deepcopy(layer.keywords)
+    return snapshot
+
+
+class BackgroundWriter(object):
+
+    """Add layers to a datastore in a background thread.
+
+    It's used as a context manager, it waits for the last layers at the end:
+
+        with BackgroundWriter(datastore) as writer:
+            writer.add_layer(layer, 'hazard')
+
+    .. versionadded:: 4.2
+    """
+
+    def __init__(self, datastore, check=False):
+        """Constructor.
+
+        :param datastore: The datastore to write to.
+        :type datastore: DataStore
+
+        :param check: If the layer should be checked after being written.
+        :type check: bool
+        """
+        self.datastore = datastore
+        self.check = check
+        self._queue = Queue(maxsize=queue_size)
+        self._thread = None
+        self._error = None
+        # Layers added to the queue, by name in the datastore.
+        self._layers = {}
+        # Names of the layers written by the thread, but not checked yet.
+        self._written = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close(raise_error=exception_type is None)
+
+    def add_layer(self, layer, layer_name):
+        """Add a layer to the datastore, in the background.
+
+        :param layer: The layer to add. Vector layers are copied, so they can
+            be modified after. Raster layers are written before returning.
+        :type layer: QgsMapLayer
+
+        :param layer_name: The name of the layer in the datastore.
+        :type layer_name: str
+        """
+        if not background:
+            self._add_layer(layer, layer_name)
+            return
+
+        if self._error:
+            # The analysis will fail at the end, don't write anything else.
+            return
+
+        if not is_vector_layer(layer):
+            # The layer would be read by the thread while the analysis is
+            # still using it. It's written after the layers in the queue.
+            if self._thread:
+                self._queue.join()
+            if not self._error:
+                self._add_layer(layer, layer_name)
+            return
+
+        # The name is given in the main thread, in the order layers are added.
+        name = self.datastore.new_layer_name(layer_name)
+        if name in self._layers or self.datastore.layer_uri(name):
+            raise Exception(
+                'Something went wrong with the datastore : {error_message}'
+                .format(error_message=tr(
+                    'The layer already exists in the datastore.')))
+
+        layer = layer_snapshot(layer)
+        self._layers[name] = layer.keywords
+        if not self._thread:
+            self._thread = Thread(target=self._work, name='BackgroundWriter')
+            self._thread.daemon = True
+            self._thread.start()
+        self._queue.put((layer, name))
+
+    def wait(self):
+        """Wait until all layers are written, then write their keywords.
+
+        :raises: The first error raised while writing a layer.
+        """
+        if self._thread:
+            self._queue.join()
+        if self._error:
+            raise self._error
+        # The thread is waiting for the next layer, it doesn't write now.
+        written, self._written = self._written, []
+        for name in written:
+            self._check(name, self._layers.pop(name))
+
+    def close(self, raise_error=True):
+        """Wait for all layers and stop the thread.
+
+        :param raise_error: If the first error while writing a layer should
+            be raised.
+        :type raise_error: bool
+        """
+        try:
+            if raise_error:
+                self.wait()
+        finally:
+            if self._thread:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+
+    def _work(self):
+        """Write the layers of the queue, until None is received."""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if not self._error:
+                    self._write(*item)
+            except Exception as e:
+                LOGGER.exception(
+                    'The layer %s could not be written.' % item[1])
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write(self, layer, name):
+        """Write the data of a layer to the datastore, in the thread.
+
+        :param layer: The snapshot of the layer.
+        :type layer: QgsVectorLayer
+
+        :param name: The name of the layer in the datastore.
+        :type name: str
+        """
+        result, message = self.datastore.write_layer(layer, name)
+        if not result:
+            raise Exception(
+                'Something went wrong with the datastore : {error_message}'
+                .format(error_message=message))
+        self._written.append(name)
+
+    def _add_layer(self, layer, layer_name):
+        """Add a layer to the datastore directly, in the main thread.
+
+        :param layer: The layer to add.
+        :type layer: QgsMapLayer
+
+        :param layer_name: The name of the layer in the datastore.
+        :type layer_name: str
+        """
+        result, name = self.datastore.add_layer(layer, layer_name)
+        if not result:
+            raise Exception(
+                'Something went wrong with the datastore : {error_message}'
+                .format(error_message=name))
+        self._check(name)
+
+    def _check(self, name, keywords=None):
+        """Write the keywords of a layer and check it, in the main thread.
+
+        :param name: The name of the layer in the datastore.
+        :type name: str
+
+        :param keywords: The keywords to write, if any.
+        :type keywords: dict
+        """
+        if keywords is not None:
+            result, message = self.datastore.write_layer_keywords(
+                name, keywords)
+            if not result:
+                raise Exception(
+                    'Something went wrong with the datastore : '
+                    '{error_message}'.format(error_message=message))
+        if self.check:
+            # This one checks the GeoJSON file. We noticed some difference
+            # between checking a memory layer and a file based layer.
+            check_layer(self.datastore.layer(name))
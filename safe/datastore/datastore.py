@@ -7,6 +7,8 @@ import logging
 from abc import ABCMeta, abstractmethod
 from qgis.core import QgsMapLayer, QgsRasterLayer, QgsVectorLayer, QGis
 
+from safe.datastore.background_writer import layer_snapshot
+from safe.gis.vector.feature_writer import is_scratch_layer
 from safe.utilities.keyword_io import KeywordIO
 from safe.utilities.i18n import tr
 from safe.utilities.utilities import monkey_patch_keywords
@@ -105,16 +107,64 @@ class DataStore(object):
 
         .. versionadded:: 4.0
         """
+        layer_name = self.new_layer_name(layer_name)
+
+        if self.layer_uri(layer_name):
+            return False, tr('The layer already exists in the datastore.')
+
+        result = self.write_layer(layer, layer_name)
+        if not result[0]:
+            return result
+
+        try:
+            keywords = layer.keywords
+        except AttributeError:
+            return result
+
+        return self.write_layer_keywords(result[1], keywords)
+
+    def new_layer_name(self, layer_name):
+        """The name of a new layer in the datastore, with its index if any.
+
+        :param layer_name: The name of the layer.
+        :type layer_name: str
+
+        :return: The name to use in the datastore.
+        :rtype: str
+
+        .. versionadded:: 4.2
+        """
         if self._use_index:
             layer_name = '%s-%s' % (self._index, layer_name)
             self._index += 1
+        return layer_name
 
-        if self.layer_uri(layer_name):
-            return False, tr('The layer already exists in the datastore.')
+    def write_layer(self, layer, layer_name):
+        """Write the data of a layer to the datastore, without its keywords.
+
+        Only the given layer is used, not the layers of the datastore, so it
+        can be called from another thread.
+
+        :param layer: The layer to add.
+        :type layer: QgsMapLayer
 
+        :param layer_name: The name of the layer in the datastore.
+        :type layer_name: str
+
+        :returns: A two-tuple. The first element will be True if we could add
+            the layer to the datastore. The second element will be the layer
+            name which has been used or the error message.
+        :rtype: (bool, str)
+
+        .. versionadded:: 4.2
+        """
         if isinstance(layer, QgsRasterLayer):
             result = self._add_raster_layer(layer, layer_name)
         else:
+            if is_scratch_layer(layer):
+                # The FID of a GeoPackage in a scratch directory is not an
+                # attribute of the analysis.
+                layer = layer_snapshot(layer)
             if layer.wkbType() == QGis.WKBNoGeometry:
                 result = self._add_tabular_layer(layer, layer_name)
             else:
@@ -123,20 +173,32 @@ class DataStore(object):
         if result[0]:
             LOGGER.info(
                 u'Layer saved {layer_name}'.format(layer_name=result[1]))
+        return result
 
-        try:
-            layer.keywords
-            real_layer = self.layer(result[1])
-            if isinstance(real_layer, bool):
-                message = ('{name} was not found in the datastore or the '
-                           'layer was not valid.'.format(name=result[1]))
-                LOGGER.debug(message)
-                return False, message
-            KeywordIO().write_keywords(real_layer, layer.keywords)
-        except AttributeError:
-            pass
+    def write_layer_keywords(self, layer_name, keywords):
+        """Write the keywords of a layer in the datastore.
 
-        return result
+        :param layer_name: The name of the layer in the datastore.
+        :type layer_name: str
+
+        :param keywords: The keywords of the layer.
+        :type keywords: dict
+
+        :returns: A two-tuple. The first element will be True if we could
+            write the keywords. The second element will be the layer name or
+            the error message.
+        :rtype: (bool, str)
+
+        .. versionadded:: 4.2
+        """
+        real_layer = self.layer(layer_name)
+        if isinstance(real_layer, bool):
+            message = ('{name} was not found in the datastore or the '
+                       'layer was not valid.'.format(name=layer_name))
+            LOGGER.debug(message)
+            return False, message
+        KeywordIO().write_keywords(real_layer, keywords)
+        return True, layer_name
 
     def layer(self, layer_name):
         """Get QGIS layer.
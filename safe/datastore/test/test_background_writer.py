@@ -0,0 +1,135 @@
+# coding=utf-8
+"""Test the background writer of a datastore."""
+
+import os
+import unittest
+from os.path import join
+from tempfile import mkdtemp
+from threading import current_thread
+
+from safe.test.utilities import (
+    get_qgis_app,
+    load_test_raster_layer,
+    load_test_vector_layer)
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from safe.datastore import background_writer
+from safe.datastore.background_writer import BackgroundWriter
+from safe.datastore.folder import Folder
+from safe.definitions.constants import ANALYSIS_SUCCESS, PREPARE_SUCCESS
+from safe.impact_function.impact_function import ImpactFunction
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+def geojson_files(path):
+    """Content of GeoJSON files in a directory, by file name."""
+    files = {}
+    for name in os.listdir(path):
+        if name.endswith('.geojson'):
+            with open(join(path, name), 'rb') as geojson:
+                files[name] = geojson.read()
+    return files
+
+
+def folder():
+    """A folder datastore writing GeoJSON in a new directory."""
+    datastore = Folder(mkdtemp())
+    datastore.default_vector_format = 'geojson'
+    return datastore
+
+
+class TestBackgroundWriter(unittest.TestCase):
+
+    """Test the background writer of a datastore."""
+
+    def tearDown(self):
+        background_writer.background = True
+
+    def test_background_writer(self):
+        """Test a layer is written as it was when it was added."""
+        layer = load_test_vector_layer(
+            'gisv4', 'hazard', 'classified_vector.geojson',
+            clone_to_memory=True)
+        expected = folder()
+        self.assertTrue(expected.add_layer(layer, 'hazard')[0])
+
+        datastore = folder()
+        # The layers of the datastore are only used in the main thread.
+        threads = []
+        datastore_layer = datastore.layer
+
+        def layer_in_thread(name):
+            threads.append(current_thread().name)
+            return datastore_layer(name)
+        datastore.layer = layer_in_thread
+
+        keywords = dict(layer.keywords)
+        with BackgroundWriter(datastore, check=True) as writer:
+            writer.add_layer(layer, 'hazard')
+            # The layer is modified while it's being written.
+            layer.dataProvider().deleteFeatures(
+                [feature.id() for feature in layer.getFeatures()])
+
+        self.assertEqual(
+            geojson_files(datastore.uri_path),
+            geojson_files(expected.uri_path))
+        self.assertEqual(
+            datastore.layer('hazard').keywords['layer_purpose'],
+            keywords['layer_purpose'])
+        self.assertTrue(threads)
+        self.assertEqual(set(threads), {current_thread().name})
+
+    def test_error(self):
+        """Test an error in the background is raised at the end."""
+        layer = load_test_vector_layer(
+            'gisv4', 'hazard', 'classified_vector.geojson',
+            clone_to_memory=True)
+        datastore = folder()
+        with self.assertRaises(Exception):
+            with BackgroundWriter(datastore) as writer:
+                writer.add_layer(layer, 'hazard')
+                # The layer already exists in the datastore.
+                writer.add_layer(layer, 'hazard')
+
+    def test_raster(self):
+        """Test a raster is written directly, after the previous layers."""
+        vector = load_test_vector_layer(
+            'gisv4', 'hazard', 'classified_vector.geojson',
+            clone_to_memory=True)
+        raster = load_test_raster_layer('gisv4', 'hazard', 'earthquake.asc')
+        datastore = folder()
+        with BackgroundWriter(datastore) as writer:
+            writer.add_layer(vector, 'vector')
+            writer.add_layer(raster, 'raster')
+            self.assertItemsEqual(datastore.layers(), ['vector', 'raster'])
+
+    def run_debug_analysis(self):
+        """Run an analysis in debug mode and return the GeoJSON files."""
+        impact_function = ImpactFunction()
+        impact_function.hazard = load_test_vector_layer(
+            'gisv4', 'hazard', 'classified_vector.geojson')
+        impact_function.exposure = load_test_vector_layer(
+            'gisv4', 'exposure', 'buildings.geojson')
+        impact_function.aggregation = load_test_vector_layer(
+            'gisv4', 'aggregation', 'small_grid.geojson')
+        impact_function.debug_mode = True
+        status, message = impact_function.prepare()
+        self.assertEqual(PREPARE_SUCCESS, status, message)
+        status, message = impact_function.run()
+        self.assertEqual(ANALYSIS_SUCCESS, status, message)
+        return geojson_files(impact_function.datastore.uri_path)
+
+    def test_debug_analysis(self):
+        """Test intermediate layers are the same when written directly."""
+        background_writer.background = False
+        expected = self.run_debug_analysis()
+        background_writer.background = True
+        files = self.run_debug_analysis()
+
+        self.assertEqual(sorted(files.keys()), sorted(expected.keys()))
+        for name, content in expected.items():
+            self.assertEqual(files[name], content, name)
@@ -19,6 +19,7 @@ inasafe_default_settings = {
     'developer_mode': False,
     'generate_report': True,
     'memory_profile': False,
+    'raster_on_raster_analysis': False,
 
     'ISO19115_ORGANIZATION': 'InaSAFE.org',
     'ISO19115_URL': 'http://inasafe.org',
@@ -28,7 +29,31 @@ inasafe_default_settings = {
     'currency': idr['key'],
 
     'keywordCachePath': join(
-        QgsApplication.qgisSettingsDirPath(), 'inasafe', 'metadata.db')
+        QgsApplication.qgisSettingsDirPath(), 'inasafe', 'metadata.db'),
+
+    'useAggregationCache': True,
+    'aggregationCachePath': join(
+        QgsApplication.qgisSettingsDirPath(), 'inasafe', 'aggregation_cache'),
+    # Maximum size in MB of the aggregation cache.
+    'aggregationCacheSize': 1024,
+
+    'geometryRepairProcesses': 1,
+    'bufferProcesses': 1,
+    'atlasProcesses': 1,
+    'reportProcesses': 1,
+    'stepProcesses': 1,
+
+    'persistentSpatialIndex': False,
+    'spatialIndexCachePath': join(
+        QgsApplication.qgisSettingsDirPath(), 'inasafe', 'spatial_index'),
+
+    'osmTileCachePath': join(
+        QgsApplication.qgisSettingsDirPath(), 'inasafe', 'osm_tiles'),
+    'osmTileCacheDays': 7,
+
+    # Quota in MB of the scratch workspaces of analyses, 0 for no limit.
+    'scratchQuota': 0,
+    'scratchRamDisk': False
 
     # Make sure first to not have cyclic import
     # 'organisation_logo_path': resources_path(
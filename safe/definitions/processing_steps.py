@@ -113,6 +113,11 @@ align_steps = {
     'output_layer_name': '%s_aligned',
 }
 
+cross_tabulation_steps = {
+    'step_name': tr('Cross tabulation'),
+    'output_layer_name': 'cross_tabulation',
+}
+
 polygonize_steps = {
     'step_name': tr('Polygonize'),
     'output_layer_name': '%s_polygonized',
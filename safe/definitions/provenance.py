@@ -57,6 +57,11 @@ provenance_end_datetime = {
     'name': tr('End Datetime'),
     'provenance_key': 'end_datetime'
 }
+provenance_execution_plan = {
+    'key': 'provenance_execution_plan',
+    'name': tr('Execution Plan'),
+    'provenance_key': 'execution_plan'
+}
 provenance_exposure_keywords = {
     'key': 'provenance_exposure_keywords',
     'name': tr('Exposure Keywords'),
@@ -157,6 +162,11 @@ provenance_start_datetime = {
     'name': tr('Start Datetime'),
     'provenance_key': 'start_datetime'
 }
+provenance_step_schedule = {
+    'key': 'provenance_step_schedule',
+    'name': tr('Step Schedule'),
+    'provenance_key': 'step_schedule'
+}
 provenance_user = {
     'key': 'provenance_user',
     'name': tr('User'),
@@ -237,6 +247,7 @@ provenance_list = [
     provenance_data_store_uri,
     provenance_duration,
     provenance_end_datetime,
+    provenance_execution_plan,
     provenance_exposure_keywords,
     provenance_exposure_layer,
     provenance_exposure_layer_id,
@@ -257,6 +268,7 @@ provenance_list = [
     provenance_qt_version,
     provenance_requested_extent,
     provenance_start_datetime,
+    provenance_step_schedule,
     provenance_user,
     # Output layer path
     provenance_layer_exposure_summary,
@@ -2,16 +2,16 @@
 
 """Clip a raster by bounding box."""
 
-import processing
 import logging
 
+from osgeo import gdal
 from qgis.core import QgsRasterLayer
 
-from safe.common.exceptions import ProcessingInstallationError
+from safe.common.exceptions import InvalidExtentError
 from safe.common.utilities import unique_filename, temp_dir
 from safe.definitions.processing_steps import quick_clip_steps
+from safe.gis.raster.tools import pixel_window
 from safe.gis.sanity_check import check_layer
-from safe.utilities.gis import is_raster_y_inverted
 from safe.utilities.profiling import profile
 from safe.utilities.utilities import get_error_message
 
@@ -25,10 +25,14 @@ LOGGER = logging.getLogger('InaSAFE')
 
 @profile
 def clip_by_extent(layer, extent, callback=None):
-    """Clip a raster using a bounding box using processing.
+    """Clip a raster using a bounding box.
 
     Issue https://github.com/inasafe/inasafe/issues/3183
 
+    The clip is done in-process with a GDAL virtual raster (VRT). The VRT is
+    only a pixel window over the source raster, no pixel is copied. Next steps
+    will read only this window directly from the source file.
+
     :param layer: The layer to reproject.
     :type layer: QgsRasterLayer
 
@@ -45,14 +49,14 @@ def clip_by_extent(layer, extent, callback=None):
 
     .. versionadded:: 4.0
     """
-    parameters = dict()
+    window = None
     # noinspection PyBroadException
     try:
         output_layer_name = quick_clip_steps['output_layer_name']
         processing_step = quick_clip_steps['step_name']
         output_layer_name = output_layer_name % layer.keywords['layer_purpose']
 
-        output_raster = unique_filename(dir=temp_dir())
+        output_raster = unique_filename(suffix='.vrt', dir=temp_dir())
 
         # We make one pixel size buffer on the extent to cover every pixels.
         # See https://github.com/inasafe/inasafe/issues/3655
@@ -61,46 +65,30 @@ def clip_by_extent(layer, extent, callback=None):
         buffer_size = max(pixel_size_x, pixel_size_y)
         extent = extent.buffer(buffer_size)
 
-        if is_raster_y_inverted(layer):
-            # The raster is Y inverted. We need to switch Y min and Y max.
-            bbox = [
-                str(extent.xMinimum()),
-                str(extent.xMaximum()),
-                str(extent.yMaximum()),
-                str(extent.yMinimum())
-            ]
-        else:
-            # The raster is normal.
-            bbox = [
-                str(extent.xMinimum()),
-                str(extent.xMaximum()),
-                str(extent.yMinimum()),
-                str(extent.yMaximum())
-            ]
-
-        # These values are all from the processing algorithm.
-        # https://github.com/qgis/QGIS/blob/master/python/plugins/processing/
-        # algs/gdal/ClipByExtent.py
-        # Please read the file to know these parameters.
-        parameters['INPUT'] = layer.source()
-        parameters['NO_DATA'] = ''
-        parameters['PROJWIN'] = ','.join(bbox)
-        parameters['RTYPE'] = 5
-        parameters['COMPRESS'] = 4
-        parameters['JPEGCOMPRESSION'] = 75
-        parameters['ZLEVEL'] = 6
-        parameters['PREDICTOR'] = 1
-        parameters['TILED'] = False
-        parameters['BIGTIFF'] = 0
-        parameters['TFW'] = False
-        parameters['EXTRA'] = ''
-        parameters['OUTPUT'] = output_raster
-        result = processing.runalg("gdalogr:cliprasterbyextent", parameters)
-
-        if result is None:
-            raise ProcessingInstallationError
-
-        clipped = QgsRasterLayer(result['OUTPUT'], output_layer_name)
+        source = gdal.Open(layer.source(), gdal.GA_ReadOnly)
+
+        # The window is computed from the geotransform, rows are counted from
+        # the first row of the file. It's working if the raster is Y inverted
+        # or not. See https://github.com/inasafe/inasafe/issues/4026
+        window = pixel_window(
+            source.GetGeoTransform(),
+            source.RasterXSize,
+            source.RasterYSize,
+            extent)
+        if not window[2] or not window[3]:
+            raise InvalidExtentError(
+                'The extent does not overlap the raster.')
+
+        clipped_raster = gdal.Translate(
+            output_raster, source, format='VRT', srcWin=list(window))
+        if clipped_raster is None:
+            raise Exception(gdal.GetLastErrorMsg())
+
+        # The VRT is written on disk when the dataset is closed.
+        clipped_raster = None
+        source = None
+
+        clipped = QgsRasterLayer(output_raster, output_layer_name)
 
         # We transfer keywords to the output.
         clipped.keywords = layer.keywords.copy()
@@ -114,9 +102,9 @@ def clip_by_extent(layer, extent, callback=None):
         # It will take more processing time until we clip the vector layer.
         # Check https://github.com/inasafe/inasafe/issues/4026 why we got some
         # exceptions with this step.
-        LOGGER.exception(parameters)
+        LOGGER.exception(window)
         LOGGER.exception(
-           'Error from QGIS clip raster by extent. Please check the QGIS '
+           'Error from GDAL clip raster by extent. Please check the GDAL '
            'logs too !')
         LOGGER.info(
             'Even if we got an exception, we are continuing the analysis. The '
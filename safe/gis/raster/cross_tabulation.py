@@ -0,0 +1,349 @@
+# coding=utf-8
+
+"""Cross tabulate a continuous raster exposure with a raster hazard."""
+
+import logging
+import numpy as np
+from osgeo import gdal, ogr, osr
+from qgis.core import QGis, QgsFeature
+
+from safe.common.exceptions import NoFeaturesInExtentError
+from safe.common.utilities import unique_filename, temp_dir
+from safe.definitions.fields import (
+    hazard_id_field,
+    hazard_class_field,
+    exposure_count_field,
+    total_field,
+)
+from safe.definitions.hazard_classifications import not_exposed_class
+from safe.definitions.layer_purposes import (
+    layer_purpose_aggregate_hazard_impacted)
+from safe.definitions.processing_steps import cross_tabulation_steps
+from safe.definitions.utilities import definition
+from safe.gis.raster.tools import (
+    pixel_window, window_geo_transform, block_windows)
+from safe.gis.sanity_check import check_layer
+from safe.gis.vector.feature_writer import layer_attributes
+from safe.gis.vector.tools import (
+    create_memory_layer, create_field_from_definition)
+from safe.utilities.metadata import (
+    active_thresholds_value_maps, active_classification)
+from safe.utilities.profiling import profile
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+
+@profile
+def cross_tabulate(exposure, hazard, aggregation, callback=None):
+    """Sum a continuous raster exposure per aggregation area and hazard class.
+
+    This is the raster on raster equivalent of polygonizing the hazard, doing
+    the union with the aggregation layer and running the zonal statistics on
+    the exposure. The hazard is never converted to vectors :
+     * aggregation areas are rasterized once on the exposure grid,
+     * the classified hazard is resampled (nearest neighbour) on the exposure
+       grid block by block,
+     * exposure values are summed per (aggregation area, hazard class) with
+       numpy.
+
+    A pixel belongs to an area or a hazard class if its centre falls in it,
+    like in the zonal statistics.
+
+    The output has one row per hazard class found in each aggregation area.
+    The geometry of a row is the geometry of the aggregation area.
+
+    Output layer :
+    | haz_id | haz_class | aggr_id | aggr_name | extra* | exposure_count |
+
+    :param exposure: The continuous raster exposure.
+    :type exposure: QgsRasterLayer
+
+    :param hazard: The classified raster hazard.
+    :type hazard: QgsRasterLayer
+
+    :param aggregation: The aggregation layer in the exposure CRS.
+    :type aggregation: QgsVectorLayer
+
+    :param callback: A function to all to indicate progress. The function
+        should accept params 'current' (int), 'maximum' (int) and 'step' (str).
+        Defaults to None.
+    :type callback: function
+
+    :return: The aggregate hazard impacted layer.
+    :rtype: QgsVectorLayer
+
+    .. versionadded:: 4.1
+    """
+    output_layer_name = cross_tabulation_steps['output_layer_name']
+    processing_step = cross_tabulation_steps['step_name']
+
+    exposure_key = exposure.keywords['exposure']
+    classification = active_classification(hazard.keywords, exposure_key)
+    value_map = active_thresholds_value_maps(hazard.keywords, exposure_key)
+
+    # Index 0 is kept for pixels without hazard.
+    hazard_classes = [
+        hazard_class for hazard_class in
+        definition(classification)['classes']
+        if hazard_class['key'] in value_map]
+    class_count = len(hazard_classes) + 1
+
+    exposure_raster = gdal.Open(exposure.source(), gdal.GA_ReadOnly)
+    exposure_band = exposure_raster.GetRasterBand(
+        exposure.keywords.get('active_band', 1))
+    exposure_no_data = exposure_band.GetNoDataValue()
+    projection = exposure_raster.GetProjectionRef()
+    geo_transform = exposure_raster.GetGeoTransform()
+
+    x_offset, y_offset, width, height = pixel_window(
+        geo_transform,
+        exposure_raster.RasterXSize,
+        exposure_raster.RasterYSize,
+        aggregation.extent())
+    if not width or not height:
+        raise NoFeaturesInExtentError
+
+    window_transform = window_geo_transform(geo_transform, x_offset, y_offset)
+
+    zones, feature_ids = _rasterize_aggregation(
+        aggregation, window_transform, width, height, projection)
+    zone_band = zones.GetRasterBand(1)
+
+    hazard_raster = gdal.Open(hazard.source(), gdal.GA_ReadOnly)
+    hazard_projection = hazard_raster.GetProjectionRef()
+
+    bins = (len(feature_ids) + 1) * class_count
+    sums = np.zeros(bins, dtype=np.float64)
+    counts = np.zeros(bins, dtype=np.int64)
+
+    blocks = list(block_windows(width, height))
+    for current, block in enumerate(blocks):
+        if callback:
+            callback(
+                current=current, maximum=len(blocks), step=processing_step)
+        x, y, block_width, block_height = block
+
+        exposure_values = exposure_band.ReadAsArray(
+            x_offset + x, y_offset + y, block_width, block_height)
+        exposure_values = exposure_values.astype(np.float64)
+        invalid = np.isnan(exposure_values)
+        if exposure_no_data is not None:
+            invalid |= exposure_values == exposure_no_data
+        exposure_values[invalid] = 0
+
+        zone_values = zone_band.ReadAsArray(x, y, block_width, block_height)
+
+        hazard_values = _aligned_hazard(
+            hazard_raster,
+            hazard_projection,
+            window_geo_transform(window_transform, x, y),
+            projection,
+            block_width,
+            block_height)
+
+        classes = np.zeros(hazard_values.shape, dtype=np.int64)
+        for index, hazard_class in enumerate(hazard_classes, start=1):
+            raster_values = value_map[hazard_class['key']]
+            in_class = np.in1d(hazard_values.ravel(), raster_values)
+            classes[in_class.reshape(hazard_values.shape)] = index
+
+        in_area = zone_values > 0
+        bin_index = zone_values[in_area].astype(np.int64) * class_count
+        bin_index += classes[in_area]
+        sums += np.bincount(
+            bin_index, weights=exposure_values[in_area], minlength=bins)
+        counts += np.bincount(bin_index, minlength=bins)
+
+    zones = None
+    hazard_raster = None
+    exposure_raster = None
+
+    output_field = exposure_count_field['field_name'] % exposure_key
+    fields = [
+        create_field_from_definition(hazard_id_field),
+        create_field_from_definition(hazard_class_field),
+    ]
+    fields.extend(aggregation.fields().toList())
+    fields.append(
+        create_field_from_definition(exposure_count_field, exposure_key))
+
+    layer = create_memory_layer(
+        output_layer_name, QGis.Polygon, aggregation.crs(), fields)
+
+    features = []
+    for feature in aggregation.getFeatures():
+        zone = feature_ids.get(feature.id())
+        if zone is None:
+            continue
+        for index in range(class_count):
+            if not counts[zone * class_count + index]:
+                # This hazard class is not in this aggregation area.
+                continue
+
+            if index:
+                hazard_id = index
+                hazard_value = hazard_classes[index - 1]['key']
+            else:
+                hazard_id = None
+                hazard_value = not_exposed_class['key']
+
+            out_feature = QgsFeature()
+            out_feature.setGeometry(feature.geometry())
+            attributes = [hazard_id, hazard_value]
+            attributes.extend(feature.attributes())
+            attributes.append(float(sums[zone * class_count + index]))
+            out_feature.setAttributes(layer_attributes(layer, attributes))
+            features.append(out_feature)
+
+    layer.dataProvider().addFeatures(features)
+    layer.updateExtents()
+
+    hazard_fields = {
+        hazard_id_field['key']: hazard_id_field['field_name'],
+        hazard_class_field['key']: hazard_class_field['field_name'],
+    }
+    hazard_keywords = hazard.keywords.copy()
+    hazard_keywords['classification'] = classification
+    hazard_keywords['inasafe_fields'] = hazard_fields.copy()
+
+    layer.keywords = exposure.keywords.copy()
+    layer.keywords['inasafe_fields'] = hazard_fields
+    layer.keywords['inasafe_fields'].update(
+        aggregation.keywords['inasafe_fields'])
+    layer.keywords['inasafe_default_values'] = (
+        exposure.keywords['inasafe_default_values'].copy())
+
+    key = exposure_count_field['key'] % exposure_key
+
+    # Special case here, one field is the exposure count and the total.
+    layer.keywords['inasafe_fields'][key] = output_field
+    layer.keywords['inasafe_fields'][total_field['key']] = output_field
+
+    layer.keywords['exposure_keywords'] = exposure.keywords.copy()
+    layer.keywords['hazard_keywords'] = hazard_keywords
+    layer.keywords['aggregation_keywords'] = aggregation.keywords.copy()
+    layer.keywords['layer_purpose'] = (
+        layer_purpose_aggregate_hazard_impacted['key'])
+
+    layer.keywords['title'] = output_layer_name
+
+    check_layer(layer)
+    return layer
+
+
+def _rasterize_aggregation(
+        aggregation, geo_transform, width, height, projection):
+    """Rasterize aggregation areas on a grid.
+
+    The value of a pixel is the position of the aggregation feature, starting
+    at 1. 0 means that the pixel is not in an aggregation area.
+
+    :param aggregation: The aggregation layer.
+    :type aggregation: QgsVectorLayer
+
+    :param geo_transform: The GDAL geotransform of the grid.
+    :type geo_transform: tuple
+
+    :param width: The number of columns of the grid.
+    :type width: int
+
+    :param height: The number of rows of the grid.
+    :type height: int
+
+    :param projection: The WKT projection of the grid.
+    :type projection: basestring
+
+    :return: A tuple with the GDAL raster and a dictionary mapping the
+        feature ID to the value in the raster.
+    :rtype: (gdal.Dataset, dict)
+    """
+    source = ogr.GetDriverByName('Memory').CreateDataSource('aggregation')
+    srs = None
+    if projection:
+        srs = osr.SpatialReference()
+        srs.ImportFromWkt(projection)
+    zones_layer = source.CreateLayer('aggregation', srs, ogr.wkbMultiPolygon)
+    zones_layer.CreateField(ogr.FieldDefn('zone', ogr.OFTInteger))
+
+    feature_ids = {}
+    for feature in aggregation.getFeatures():
+        geometry = feature.geometry()
+        if not geometry:
+            continue
+        zone = len(feature_ids) + 1
+        feature_ids[feature.id()] = zone
+        zone_feature = ogr.Feature(zones_layer.GetLayerDefn())
+        zone_feature.SetGeometry(
+            ogr.CreateGeometryFromWkt(geometry.exportToWkt()))
+        zone_feature.SetField('zone', zone)
+        zones_layer.CreateFeature(zone_feature)
+
+    output_raster = unique_filename(
+        suffix='-zones.tif', dir=temp_dir(sub_dir='pre-process'))
+    zones = gdal.GetDriverByName('GTiff').Create(
+        output_raster,
+        width,
+        height,
+        1,
+        gdal.GDT_Int32,
+        ['TILED=YES', 'COMPRESS=DEFLATE'])
+    zones.SetGeoTransform(geo_transform)
+    if projection:
+        zones.SetProjection(projection)
+    zones.GetRasterBand(1).Fill(0)
+    gdal.RasterizeLayer(zones, [1], zones_layer, options=['ATTRIBUTE=zone'])
+    zones.FlushCache()
+
+    return zones, feature_ids
+
+
+def _aligned_hazard(
+        hazard_raster, hazard_projection, geo_transform, projection,
+        width, height):
+    """Resample a block of the hazard on the exposure grid.
+
+    Pixels which are not covered by the hazard are NaN.
+
+    :param hazard_raster: The hazard raster.
+    :type hazard_raster: gdal.Dataset
+
+    :param hazard_projection: The WKT projection of the hazard.
+    :type hazard_projection: basestring
+
+    :param geo_transform: The GDAL geotransform of the block.
+    :type geo_transform: tuple
+
+    :param projection: The WKT projection of the block.
+    :type projection: basestring
+
+    :param width: The number of columns of the block.
+    :type width: int
+
+    :param height: The number of rows of the block.
+    :type height: int
+
+    :return: The hazard values on the block.
+    :rtype: numpy.ndarray
+    """
+    block = gdal.GetDriverByName('MEM').Create(
+        '', width, height, 1, gdal.GDT_Float64)
+    block.SetGeoTransform(geo_transform)
+    if projection:
+        block.SetProjection(projection)
+    band = block.GetRasterBand(1)
+    band.SetNoDataValue(np.nan)
+    band.Fill(np.nan)
+
+    gdal.ReprojectImage(
+        hazard_raster,
+        block,
+        hazard_projection or None,
+        projection or None,
+        gdal.GRA_NearestNeighbour)
+
+    return band.ReadAsArray()
@@ -5,11 +5,7 @@
 
 from osgeo import gdal, osr, ogr
 
-from qgis.core import (
-    QgsRasterLayer,
-    QgsVectorLayer,
-    QgsFeatureRequest,
-)
+from qgis.core import QgsVectorLayer
 
 from safe.common.utilities import unique_filename, temp_dir
 from safe.definitions.constants import no_data_value
@@ -27,14 +23,21 @@ __revision__ = '$Format:%H$'
 
 
 @profile
-def polygonize(layer, callback=None):
+def polygonize(layer, eight_connectedness=False, callback=None):
     """Polygonize a raster layer into a vector layer using GDAL.
 
     Issue https://github.com/inasafe/inasafe/issues/3183
 
+    No data pixels are masked, GDAL will not create any polygon for them.
+    Polygons are written directly in a GeoPackage.
+
     :param layer: The layer to reproject.
     :type layer: QgsRasterLayer
 
+    :param eight_connectedness: True if diagonal pixels must be considered
+        as connected. Default to False, only the 4 neighbours are used.
+    :type eight_connectedness: bool
+
     :param callback: A function to all to indicate progress. The function
         should accept params 'current' (int) and 'maximum' (int). Defaults to
         None.
@@ -61,35 +64,60 @@ def polygonize(layer, callback=None):
     srs.ImportFromWkt(input_raster.GetProjectionRef())
 
     temporary_dir = temp_dir(sub_dir='pre-process')
-    out_shapefile = unique_filename(
-        suffix='-%s.shp' % output_layer_name, dir=temporary_dir)
+    out_geopackage = unique_filename(
+        suffix='-%s.gpkg' % output_layer_name, dir=temporary_dir)
 
-    driver = ogr.GetDriverByName("ESRI Shapefile")
-    destination = driver.CreateDataSource(out_shapefile)
+    driver = ogr.GetDriverByName('GPKG')
+    destination = driver.CreateDataSource(out_geopackage)
 
-    output_layer = destination.CreateLayer(gdal_layer_name, srs)
+    output_layer = destination.CreateLayer(
+        gdal_layer_name, srs, ogr.wkbPolygon)
 
-    # We have no other way to use a shapefile. We need only the first 10 chars.
-    field_name = output_field['field_name'][0:10]
+    # The GeoPackage is not limited to 10 chars like a shapefile.
+    field_name = output_field['field_name']
     fd = ogr.FieldDefn(field_name, ogr.OFTInteger)
     output_layer.CreateField(fd)
 
     active_band = layer.keywords.get('active_band', 1)
     input_band = input_raster.GetRasterBand(active_band)
-    # Fixme : add our own callback to Polygonize
-    gdal.Polygonize(input_band, None, output_layer, 0, [], callback=None)
-    destination.Destroy()
-
-    vector_layer = QgsVectorLayer(out_shapefile, output_layer_name, 'ogr')
-
-    # Let's remove polygons which were no data
-    request = QgsFeatureRequest()
-    expression = '"%s" = %s' % (field_name, no_data_value)
-    request.setFilterExpression(expression)
-    vector_layer.startEditing()
-    for feature in vector_layer.getFeatures(request):
-        vector_layer.deleteFeature(feature.id())
-    vector_layer.commitChanges()
+
+    # The mask band is taking care of the no data value of the band.
+    mask_band = None
+    if input_band.GetMaskFlags() != gdal.GMF_ALL_VALID:
+        mask_band = input_band.GetMaskBand()
+
+    options = []
+    if eight_connectedness:
+        options.append('8CONNECTED=8')
+
+    progress = None
+    if callback:
+        def progress(complete, message, data):
+            """Forward the GDAL progress to our callback."""
+            callback(int(complete * 100), 100)
+            return 1
+
+    # One transaction for the whole layer, a GeoPackage is slow otherwise.
+    output_layer.StartTransaction()
+    gdal.Polygonize(
+        input_band, mask_band, output_layer, 0, options, callback=progress)
+
+    # Our reclassified rasters are using no_data_value. The value might not
+    # be set as the no data of the band.
+    output_layer.SetAttributeFilter('"%s" = %s' % (field_name, no_data_value))
+    no_data_ids = [feature.GetFID() for feature in output_layer]
+    output_layer.SetAttributeFilter(None)
+    for feature_id in no_data_ids:
+        output_layer.DeleteFeature(feature_id)
+    output_layer.CommitTransaction()
+
+    destination = None
+    input_raster = None
+
+    vector_layer = QgsVectorLayer(
+        '%s|layername=%s' % (out_geopackage, gdal_layer_name),
+        output_layer_name,
+        'ogr')
 
     # We transfer keywords to the output.
     vector_layer.keywords = layer.keywords.copy()
@@ -0,0 +1,235 @@
+# coding=utf-8
+
+"""Statistics on a raster band, computed block by block.
+
+The whole band is never loaded in memory. Results are cached per source,
+band and modification time of the file so the wizard can ask them many times.
+"""
+
+import logging
+from os.path import getmtime
+
+import numpy as np
+from osgeo import gdal
+
+from safe.gis.raster.tools import block_windows
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# Maximum number of unique values we want to list in a raster band.
+unique_values_limit = 1000
+
+# Number of bins in the histogram by default.
+histogram_bins = 100
+
+CACHE = {}
+
+
+def _cache_key(source, band, *args):
+    """Helper to build the key of a result in the cache.
+
+    :param source: The path to the raster.
+    :type source: basestring
+
+    :param band: The band number.
+    :type band: int
+
+    :param args: Extra parameters used to compute the result.
+
+    :return: The key.
+    :rtype: tuple
+    """
+    try:
+        modified = getmtime(source)
+    except OSError:
+        # Not a file, we can't know if the data changed.
+        modified = None
+    return (source, band, modified) + args
+
+
+def _valid_blocks(source, band):
+    """Generator of valid pixel values in a raster band, block by block.
+
+    No data values and NaN are removed.
+
+    :param source: The path to the raster.
+    :type source: basestring
+
+    :param band: The band number.
+    :type band: int
+
+    :return: Flat numpy arrays of valid values.
+    :rtype: generator
+    """
+    dataset = gdal.Open(source, gdal.GA_ReadOnly)
+    raster_band = dataset.GetRasterBand(band)
+    no_data = raster_band.GetNoDataValue()
+
+    for x, y, width, height in block_windows(
+            dataset.RasterXSize, dataset.RasterYSize):
+        values = raster_band.ReadAsArray(x, y, width, height).ravel()
+        valid = np.ones(values.shape, dtype=bool)
+        if no_data is not None:
+            valid &= values != no_data
+        if np.issubdtype(values.dtype, np.floating):
+            valid &= ~np.isnan(values)
+        yield values[valid]
+
+
+def _python_value(value, dtype):
+    """Convert a numpy value to a json serializable python type.
+
+    :param value: The numpy value.
+    :type value: numpy.generic
+
+    :param dtype: The numpy data type of the band.
+    :type dtype: numpy.dtype
+
+    :return: The value as a float or an integer.
+    :rtype: float, int
+    """
+    if np.issubdtype(dtype, np.floating):
+        return float(value)
+    else:
+        return int(value)
+
+
+def band_statistics(source, band=1):
+    """Compute the minimum, maximum, mean and count of a raster band.
+
+    :param source: The path to the raster.
+    :type source: basestring
+
+    :param band: The band number. Default to 1.
+    :type band: int
+
+    :return: A dictionary with keys 'minimum', 'maximum', 'mean' and 'count'.
+        Minimum, maximum and mean are None if the band has no valid pixel.
+    :rtype: dict
+    """
+    key = _cache_key(source, band, 'statistics')
+    if key in CACHE:
+        return CACHE[key]
+
+    minimum = None
+    maximum = None
+    total = 0.0
+    count = 0
+    dtype = None
+    for values in _valid_blocks(source, band):
+        dtype = values.dtype
+        if not values.size:
+            continue
+        block_minimum = values.min()
+        block_maximum = values.max()
+        if minimum is None or block_minimum < minimum:
+            minimum = block_minimum
+        if maximum is None or block_maximum > maximum:
+            maximum = block_maximum
+        total += values.sum(dtype=np.float64)
+        count += values.size
+
+    statistics = {
+        'minimum': None,
+        'maximum': None,
+        'mean': None,
+        'count': count
+    }
+    if count:
+        statistics['minimum'] = _python_value(minimum, dtype)
+        statistics['maximum'] = _python_value(maximum, dtype)
+        statistics['mean'] = total / count
+
+    CACHE[key] = statistics
+    return statistics
+
+
+def band_histogram(source, band=1, bins=histogram_bins):
+    """Compute the histogram of a raster band between its minimum and maximum.
+
+    :param source: The path to the raster.
+    :type source: basestring
+
+    :param band: The band number. Default to 1.
+    :type band: int
+
+    :param bins: The number of bins.
+    :type bins: int
+
+    :return: A tuple with the counts and the bin edges, like numpy.histogram.
+        Both lists are empty if the band has no valid pixel.
+    :rtype: (list, list)
+    """
+    key = _cache_key(source, band, 'histogram', bins)
+    if key in CACHE:
+        return CACHE[key]
+
+    statistics = band_statistics(source, band)
+    if not statistics['count']:
+        return [], []
+
+    edges = np.linspace(statistics['minimum'], statistics['maximum'], bins + 1)
+    counts = np.zeros(bins, dtype=np.int64)
+    for values in _valid_blocks(source, band):
+        if values.size:
+            counts += np.histogram(values, bins=edges)[0]
+
+    histogram = [int(i) for i in counts], [float(i) for i in edges]
+    CACHE[key] = histogram
+    return histogram
+
+
+def band_unique_values(source, band=1, limit=unique_values_limit):
+    """List unique values of a raster band.
+
+    The scan stops as soon as there are more unique values than the limit.
+    It's likely that the band is continuous in this case.
+
+    :param source: The path to the raster.
+    :type source: basestring
+
+    :param band: The band number. Default to 1.
+    :type band: int
+
+    :param limit: The maximum number of unique values.
+    :type limit: int
+
+    :return: The sorted list of unique values, or None if there are more
+        unique values than the limit.
+    :rtype: list, None
+    """
+    key = _cache_key(source, band, 'unique', limit)
+    if key in CACHE:
+        return CACHE[key]
+
+    unique_values = None
+    dtype = None
+    for values in _valid_blocks(source, band):
+        dtype = values.dtype
+        if unique_values is None:
+            unique_values = np.unique(values)
+        else:
+            unique_values = np.union1d(unique_values, values)
+        if unique_values.size > limit:
+            LOGGER.info(
+                'More than {limit} unique values in band {band} of '
+                '{source}.'.format(limit=limit, band=band, source=source))
+            CACHE[key] = None
+            return None
+
+    if unique_values is None:
+        result = []
+    else:
+        result = [_python_value(value, dtype) for value in unique_values]
+    CACHE[key] = result
+    return result
+
+
+def clear_statistics_cache():
+    """Remove every statistics from the cache."""
+    CACHE.clear()
@@ -30,3 +30,19 @@ class TestClipRaster(unittest.TestCase):
         self.assertAlmostEqual(expected.xMaximum(), extent.xMaximum(), 0)
         self.assertAlmostEqual(expected.yMinimum(), extent.yMinimum(), 0)
         self.assertAlmostEqual(expected.yMaximum(), extent.yMaximum(), 0)
+
+    def test_clip_raster_virtual(self):
+        """Test the clipped raster is a window over the source raster."""
+        layer = load_test_raster_layer('gisv4', 'hazard', 'earthquake.asc')
+        extent = QgsRectangle(106.75, -6.2, 106.80, -6.1)
+        new_layer = clip_by_extent(layer, extent)
+
+        self.assertTrue(new_layer.source().endswith('.vrt'))
+        self.assertEqual(new_layer.keywords['title'], 'hazard_clipped_bbox')
+
+        # Pixels are read from the source, the size is not changing.
+        self.assertAlmostEqual(
+            layer.rasterUnitsPerPixelX(), new_layer.rasterUnitsPerPixelX())
+        self.assertAlmostEqual(
+            layer.rasterUnitsPerPixelY(), new_layer.rasterUnitsPerPixelY())
+        self.assertLess(new_layer.width(), layer.width())
@@ -0,0 +1,114 @@
+# coding=utf-8
+"""Test Cross Tabulation."""
+
+import unittest
+
+from safe.test.utilities import (
+    get_qgis_app,
+    load_test_raster_layer,
+    load_test_vector_layer
+)
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from qgis.core import QGis
+
+from safe.definitions.constants import ANALYSIS_SUCCESS, PREPARE_SUCCESS
+from safe.definitions.fields import (
+    exposure_count_field, hazard_class_field)
+from safe.definitions.hazard_classifications import (
+    generic_hazard_classes, not_exposed_class)
+from safe.gis.raster.cross_tabulation import cross_tabulate
+from safe.gis.raster.zonal_statistics import zonal_stats
+from safe.impact_function.impact_function import ImpactFunction
+from safe.utilities.settings import delete_setting, set_setting
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+def set_wizard_keywords(hazard):
+    """Set hazard keywords like the wizard, with value maps only."""
+    hazard.keywords.pop('classification', None)
+    hazard.keywords.pop('value_map', None)
+    hazard.keywords['value_maps'] = {
+        'population': {
+            generic_hazard_classes['key']: {
+                'active': True,
+                'classes': {
+                    'high': [3.0],
+                    'medium': [2.0],
+                    'low': [1.0]
+                }
+            }
+        }
+    }
+
+
+class TestCrossTabulation(unittest.TestCase):
+
+    """Test Cross Tabulation."""
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_cross_tabulate(self):
+        """Test we can cross tabulate a raster exposure with a raster hazard.
+        """
+        exposure = load_test_raster_layer(
+            'exposure', 'pop_binary_raster_20_20.asc')
+        exposure.keywords['inasafe_default_values'] = {}
+        hazard = load_test_raster_layer(
+            'hazard', 'classified_flood_20_20.asc')
+        set_wizard_keywords(hazard)
+        aggregation = load_test_vector_layer(
+            'aggregation', 'grid_jakarta_4326.geojson')
+
+        number_fields = aggregation.fields().count()
+        layer = cross_tabulate(exposure, hazard, aggregation)
+
+        # hazard_id, hazard_class and the exposure count.
+        self.assertEqual(layer.fields().count(), number_fields + 3)
+        self.assertEqual(layer.geometryType(), QGis.Polygon)
+
+        expected_classes = ['high', 'medium', 'low', not_exposed_class['key']]
+        output_field = exposure_count_field['field_name'] % 'population'
+        total = 0
+        for feature in layer.getFeatures():
+            self.assertIn(
+                feature[hazard_class_field['field_name']], expected_classes)
+            total += feature[output_field]
+
+        # The exposure must be the same as with the zonal statistics.
+        aggregation.keywords['hazard_keywords'] = {}
+        aggregation.keywords['aggregation_keywords'] = {}
+        zonal = zonal_stats(exposure, aggregation)
+        expected_total = sum(
+            feature[output_field] for feature in zonal.getFeatures())
+        self.assertAlmostEqual(total, expected_total)
+
+    def test_impact_function(self):
+        """Test a raster on raster analysis with keywords from the wizard.
+        """
+        set_setting('raster_on_raster_analysis', True)
+        try:
+            impact_function = ImpactFunction()
+            impact_function.exposure = load_test_raster_layer(
+                'exposure', 'pop_binary_raster_20_20.asc')
+            impact_function.hazard = load_test_raster_layer(
+                'hazard', 'classified_flood_20_20.asc')
+            set_wizard_keywords(impact_function.hazard)
+            status, message = impact_function.prepare()
+            self.assertEqual(PREPARE_SUCCESS, status, message)
+            status, message = impact_function.run()
+            self.assertEqual(ANALYSIS_SUCCESS, status, message)
+        finally:
+            delete_setting('raster_on_raster_analysis')
+
+        self.assertTrue(
+            impact_function.state['impact function']['info'].get(
+                'raster_on_raster'))
@@ -41,7 +41,7 @@ class TestPolygonizeRaster(unittest.TestCase):
         expected_keywords['title'] = title
 
         expected_keywords['inasafe_fields'] = {
-            hazard_value_field['key']: hazard_value_field['field_name'][0:10]}
+            hazard_value_field['key']: hazard_value_field['field_name']}
 
         polygonized = polygonize(layer)
 
@@ -63,3 +63,21 @@ class TestPolygonizeRaster(unittest.TestCase):
             request = QgsFeatureRequest().setFilterExpression(expression)
             self.assertEqual(
                 sum(1 for _ in polygonized.getFeatures(request)), count)
+
+    def test_polygonize_eight_connectedness(self):
+        """Test we can polygonize a raster layer with 8 connectedness."""
+        layer = load_test_raster_layer('hazard', 'classified_flood_20_20.asc')
+
+        progress = []
+
+        def callback(current, maximum):
+            progress.append((current, maximum))
+
+        four_connected = polygonize(layer)
+        eight_connected = polygonize(
+            layer, eight_connectedness=True, callback=callback)
+
+        # Diagonal pixels are merged.
+        self.assertLessEqual(
+            eight_connected.featureCount(), four_connected.featureCount())
+        self.assertEqual(progress[-1], (100, 100))
@@ -0,0 +1,54 @@
+# coding=utf-8
+"""Test Raster Statistics."""
+
+import unittest
+
+from safe.test.utilities import standard_data_path
+from safe.gis.raster.statistics import (
+    band_statistics,
+    band_histogram,
+    band_unique_values,
+    clear_statistics_cache,
+)
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+class TestRasterStatistics(unittest.TestCase):
+
+    """Test Raster Statistics."""
+
+    def setUp(self):
+        clear_statistics_cache()
+
+    def tearDown(self):
+        clear_statistics_cache()
+
+    def test_band_statistics(self):
+        """Test we can compute statistics on a raster band."""
+        source = standard_data_path('hazard', 'continuous_flood_20_20.asc')
+        statistics = band_statistics(source)
+        self.assertEqual(statistics['count'], 400)
+        self.assertAlmostEqual(statistics['minimum'], 0.0)
+        self.assertAlmostEqual(statistics['maximum'], 1.9)
+
+        # The second call is coming from the cache.
+        self.assertIs(statistics, band_statistics(source))
+
+        counts, edges = band_histogram(source, bins=4)
+        self.assertEqual(len(counts), 4)
+        self.assertEqual(len(edges), 5)
+        self.assertEqual(sum(counts), 400)
+
+    def test_band_unique_values(self):
+        """Test we can list unique values in a raster band."""
+        source = standard_data_path('hazard', 'classified_flood_20_20.asc')
+        self.assertListEqual(band_unique_values(source), [1, 2, 3])
+
+        # Too many unique values.
+        source = standard_data_path('hazard', 'continuous_flood_20_20.asc')
+        self.assertIsNone(band_unique_values(source, limit=10))
+        self.assertEqual(len(band_unique_values(source)), 20)
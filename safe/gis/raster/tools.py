@@ -0,0 +1,103 @@
+# coding=utf-8
+
+"""Tools for raster layers."""
+
+from math import floor, ceil
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+# Size in pixels of the side of a window when we read a raster block by block.
+BLOCK_SIZE = 512
+
+
+def pixel_window(geo_transform, x_size, y_size, extent):
+    """Compute the pixel window of a raster covering an extent.
+
+    The window is clipped to the raster size. The geotransform can be Y
+    inverted, the window is always given from the first row of the raster.
+
+    :param geo_transform: The GDAL geotransform of the raster.
+    :type geo_transform: list
+
+    :param x_size: The number of columns in the raster.
+    :type x_size: int
+
+    :param y_size: The number of rows in the raster.
+    :type y_size: int
+
+    :param extent: The extent in the raster CRS.
+    :type extent: QgsRectangle
+
+    :return: A tuple (x offset, y offset, width, height). Width or height
+        can be 0 if the extent does not overlap the raster.
+    :rtype: tuple
+    """
+    x_origin, pixel_width, _, y_origin, _, pixel_height = geo_transform
+
+    columns = [
+        (extent.xMinimum() - x_origin) / pixel_width,
+        (extent.xMaximum() - x_origin) / pixel_width]
+    rows = [
+        (extent.yMinimum() - y_origin) / pixel_height,
+        (extent.yMaximum() - y_origin) / pixel_height]
+
+    x_min = max(0, int(floor(min(columns))))
+    x_max = min(x_size, int(ceil(max(columns))))
+    y_min = max(0, int(floor(min(rows))))
+    y_max = min(y_size, int(ceil(max(rows))))
+
+    return x_min, y_min, max(0, x_max - x_min), max(0, y_max - y_min)
+
+
+def window_geo_transform(geo_transform, x_offset, y_offset):
+    """Compute the geotransform of a pixel window in a raster.
+
+    :param geo_transform: The GDAL geotransform of the raster.
+    :type geo_transform: list
+
+    :param x_offset: The column of the first pixel of the window.
+    :type x_offset: int
+
+    :param y_offset: The row of the first pixel of the window.
+    :type y_offset: int
+
+    :return: The GDAL geotransform of the window.
+    :rtype: tuple
+    """
+    return (
+        geo_transform[0]
+        + x_offset * geo_transform[1]
+        + y_offset * geo_transform[2],
+        geo_transform[1],
+        geo_transform[2],
+        geo_transform[3]
+        + x_offset * geo_transform[4]
+        + y_offset * geo_transform[5],
+        geo_transform[4],
+        geo_transform[5],
+    )
+
+
+def block_windows(x_size, y_size, block_size=BLOCK_SIZE):
+    """Generator to iterate over a raster block by block.
+
+    :param x_size: The number of columns to iterate over.
+    :type x_size: int
+
+    :param y_size: The number of rows to iterate over.
+    :type y_size: int
+
+    :param block_size: The size in pixels of a block side.
+    :type block_size: int
+
+    :return: Tuples (x offset, y offset, width, height) for each block.
+    :rtype: generator
+    """
+    for y_offset in range(0, y_size, block_size):
+        height = min(block_size, y_size - y_offset)
+        for x_offset in range(0, x_size, block_size):
+            width = min(block_size, x_size - x_offset)
+            yield x_offset, y_offset, width, height
@@ -3,10 +3,12 @@
 """Assign the highest value to an exposure according to a hazard layer."""
 
 import logging
+import numpy as np
 from qgis.core import (
     QGis,
     QgsFeatureRequest,
     QgsGeometry,
+    QgsPointV2,
     QgsWKBTypes,
 )
 
@@ -16,6 +18,7 @@ from safe.definitions.fields import hazard_class_field
 from safe.definitions.hazard_classifications import (
     hazard_classification, not_exposed_class)
 from safe.definitions.processing_steps import assign_highest_value_steps
+from safe.gis.vector.statistics import clear_field_statistics_cache
 from safe.gis.vector.tools import create_spatial_index
 from safe.gis.sanity_check import check_layer
 from safe.utilities.profiling import profile
@@ -75,17 +78,6 @@ def assign_highest_value(exposure, hazard, callback=None):
         exposure.addAttribute(field)
         indices.append(exposure.fieldNameIndex(field.name()))
     exposure.commitChanges()
-    provider = exposure.dataProvider()
-
-    spatial_index = create_spatial_index(exposure)
-
-    # cache features from exposure layer for faster retrieval
-    exposure_features = {}
-    for f in exposure.getFeatures():
-        exposure_features[f.id()] = f
-
-    # Todo callback
-    # total = 100.0 / len(selectionA)
 
     hazard_field = hazard_inasafe_fields[hazard_class_field['key']]
 
@@ -99,6 +91,62 @@ def assign_highest_value(exposure, hazard, callback=None):
     levels = [key['key'] for key in layer_classification['classes']]
     levels.append(not_exposed_class['key'])
 
+    if exposure.wkbType() in (QGis.WKBPoint, QGis.WKBPoint25D):
+        _assign_highest_value_points(
+            exposure, hazard, hazard_field, levels, indices)
+    else:
+        _assign_highest_value_features(
+            exposure, hazard, hazard_field, levels, indices)
+
+    exposure.updateExtents()
+    exposure.updateFields()
+
+    exposure.keywords['inasafe_fields'].update(
+        hazard.keywords['inasafe_fields'])
+    exposure.keywords['layer_purpose'] = layer_purpose_exposure_summary['key']
+
+    exposure.keywords['exposure_keywords'] = exposure.keywords.copy()
+    exposure.keywords['aggregation_keywords'] = (
+        hazard.keywords['aggregation_keywords'].copy())
+    exposure.keywords['hazard_keywords'] = (
+        hazard.keywords['hazard_keywords'].copy())
+
+    exposure.keywords['title'] = output_layer_name
+
+    check_layer(exposure)
+    return exposure
+
+
+def _assign_highest_value_features(
+        exposure, hazard, hazard_field, levels, indices):
+    """Assign the highest hazard value to any kind of exposure features.
+
+    :param exposure: The exposure vector layer.
+    :type exposure: QgsVectorLayer
+
+    :param hazard: The vector layer to use for hazard.
+    :type hazard: QgsVectorLayer
+
+    :param hazard_field: The name of the hazard class field.
+    :type hazard_field: basestring
+
+    :param levels: The hazard classes, from high to low.
+    :type levels: list
+
+    :param indices: Index of each hazard field in the exposure layer.
+    :type indices: list
+    """
+    provider = exposure.dataProvider()
+    spatial_index = create_spatial_index(exposure)
+
+    # cache features from exposure layer for faster retrieval
+    exposure_features = {}
+    for f in exposure.getFeatures():
+        exposure_features[f.id()] = f
+
+    # Todo callback
+    # total = 100.0 / len(selectionA)
+
     # Let's loop over the hazard layer, from high to low hazard zone.
     for hazard_value in levels:
         expression = '"%s" = \'%s\'' % (hazard_field, hazard_value)
@@ -128,21 +176,168 @@ def assign_highest_value(exposure, hazard, callback=None):
                     spatial_index.deleteFeature(building)
 
         provider.changeAttributeValues(update_map)
+        # The data provider doesn't notify the layer.
+        clear_field_statistics_cache(exposure.id())
 
-    exposure.updateExtents()
-    exposure.updateFields()
 
-    exposure.keywords['inasafe_fields'].update(
-        hazard.keywords['inasafe_fields'])
-    exposure.keywords['layer_purpose'] = layer_purpose_exposure_summary['key']
+def _assign_highest_value_points(
+        exposure, hazard, hazard_field, levels, indices):
+    """Assign the highest hazard value to single point exposure features.
 
-    exposure.keywords['exposure_keywords'] = exposure.keywords.copy()
-    exposure.keywords['aggregation_keywords'] = (
-        hazard.keywords['aggregation_keywords'].copy())
-    exposure.keywords['hazard_keywords'] = (
-        hazard.keywords['hazard_keywords'].copy())
+    Coordinates are loaded in arrays and binned in a uniform grid, so for
+    each hazard polygon we only look at points in the cells covered by its
+    bounding box. The hazard layer is read only once: each point keeps the
+    rank of the highest class found so far and a point is tested only if
+    the polygon has a higher class.
 
-    exposure.keywords['title'] = output_layer_name
+    :param exposure: The exposure point layer.
+    :type exposure: QgsVectorLayer
 
-    check_layer(exposure)
-    return exposure
+    :param hazard: The vector layer to use for hazard.
+    :type hazard: QgsVectorLayer
+
+    :param hazard_field: The name of the hazard class field.
+    :type hazard_field: basestring
+
+    :param levels: The hazard classes, from high to low.
+    :type levels: list
+
+    :param indices: Index of each hazard field in the exposure layer.
+    :type indices: list
+    """
+    request = QgsFeatureRequest().setSubsetOfAttributes([])
+    feature_ids = []
+    coordinates = []
+    for feature in exposure.getFeatures(request):
+        geometry = feature.geometry()
+        if not geometry:
+            continue
+        point = geometry.asPoint()
+        feature_ids.append(feature.id())
+        coordinates.append((point.x(), point.y()))
+
+    if not feature_ids:
+        return
+
+    coordinates = np.array(coordinates, dtype=np.float64)
+    x = coordinates[:, 0]
+    y = coordinates[:, 1]
+    grid = _PointGrid(x, y)
+
+    # The rank of the hazard class of each point, 0 is the highest class.
+    not_assigned = len(levels)
+    ranks = np.full(len(feature_ids), not_assigned, dtype=np.int32)
+    # The hazard feature of each point, as an index in hazard_attributes.
+    hazard_indexes = np.full(len(feature_ids), -1, dtype=np.int64)
+    hazard_attributes = []
+
+    rank_per_class = dict((level, rank) for rank, level in enumerate(levels))
+    hazard_field_index = hazard.fieldNameIndex(hazard_field)
+
+    for area in hazard.getFeatures():
+        attributes = area.attributes()
+        rank = rank_per_class.get(attributes[hazard_field_index])
+        if rank is None:
+            continue
+
+        geometry = area.geometry()
+        box = geometry.boundingBox()
+        candidates = grid.candidates(
+            box.xMinimum(), box.yMinimum(), box.xMaximum(), box.yMaximum())
+        # We don't need to test points which already have this class or a
+        # higher one.
+        candidates = candidates[ranks[candidates] > rank]
+        if not len(candidates):
+            continue
+
+        # use prepared geometry: makes multiple intersection tests faster
+        geometry_prepared = QgsGeometry.createGeometryEngine(
+            geometry.geometry())
+        geometry_prepared.prepareGeometry()
+
+        matches = [
+            i for i in candidates
+            if geometry_prepared.intersects(QgsPointV2(x[i], y[i]))]
+        if not matches:
+            continue
+
+        ranks[matches] = rank
+        hazard_indexes[matches] = len(hazard_attributes)
+        hazard_attributes.append(dict(zip(indices, attributes)))
+
+    update_map = {}
+    for i in np.flatnonzero(hazard_indexes >= 0):
+        update_map[feature_ids[i]] = hazard_attributes[hazard_indexes[i]]
+    exposure.dataProvider().changeAttributeValues(update_map)
+    # The data provider doesn't notify the layer.
+    clear_field_statistics_cache(exposure.id())
+
+
+class _PointGrid(object):
+
+    """Uniform grid hash of points, to find points in a rectangle quickly."""
+
+    # Average number of points per cell.
+    points_per_cell = 16
+
+    def __init__(self, x, y):
+        """Bin points in the grid.
+
+        :param x: X coordinates of points.
+        :type x: numpy.ndarray
+
+        :param y: Y coordinates of points.
+        :type y: numpy.ndarray
+        """
+        self.x = x
+        self.y = y
+        self.size = max(1, int(np.sqrt(len(x) / self.points_per_cell)))
+        self.x_minimum = x.min()
+        self.y_minimum = y.min()
+        # Avoid a null cell size if every point is aligned.
+        self.cell_width = max(
+            (x.max() - self.x_minimum) / self.size, np.finfo(float).eps)
+        self.cell_height = max(
+            (y.max() - self.y_minimum) / self.size, np.finfo(float).eps)
+
+        cells = (
+            self._rows(y) * self.size + self._columns(x))
+        # Point indexes sorted by cell, and where each cell starts.
+        self.order = np.argsort(cells, kind='mergesort')
+        self.starts = np.searchsorted(
+            cells[self.order], np.arange(self.size * self.size + 1))
+
+    def _columns(self, x):
+        """Column of X coordinates in the grid, clipped to the grid."""
+        columns = np.floor((x - self.x_minimum) / self.cell_width)
+        return np.clip(columns, 0, self.size - 1).astype(np.int64)
+
+    def _rows(self, y):
+        """Row of Y coordinates in the grid, clipped to the grid."""
+        rows = np.floor((y - self.y_minimum) / self.cell_height)
+        return np.clip(rows, 0, self.size - 1).astype(np.int64)
+
+    def candidates(self, x_minimum, y_minimum, x_maximum, y_maximum):
+        """Points inside a rectangle.
+
+        :return: Indexes of points in the rectangle, boundary included.
+        :rtype: numpy.ndarray
+        """
+        first_column, last_column = self._columns(
+            np.array([x_minimum, x_maximum]))
+        first_row, last_row = self._rows(np.array([y_minimum, y_maximum]))
+
+        slices = []
+        for row in range(first_row, last_row + 1):
+            first_cell = row * self.size + first_column
+            last_cell = row * self.size + last_column
+            slices.append(self.order[
+                self.starts[first_cell]:self.starts[last_cell + 1]])
+        points = np.concatenate(slices)
+
+        x = self.x[points]
+        y = self.y[points]
+        inside = (
+            (x >= x_minimum) & (x <= x_maximum) &
+            (y >= y_minimum) & (y <= y_maximum))
+        return points[inside]
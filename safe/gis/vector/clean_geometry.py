@@ -2,20 +2,43 @@
 
 """Try to make a layer valid."""
 
+import hashlib
+
+from qgis.core import QGis, QgsFeatureRequest, QgsGeometry
+
 from safe.definitions.processing_steps import clean_geometry_steps
 from safe.gis.sanity_check import check_layer
-from safe.utilities.profiling import profile
+from safe.gis.vector.spatial_index import clear_spatial_index_cache
+from safe.gis.vector.statistics import clear_field_statistics_cache
+from safe.utilities.parallel import parallel_map
+from safe.utilities.profiling import profile, profiling_count
+from safe.utilities.settings import setting
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
 __license__ = "GPL version 3"
 __email__ = "info@inasafe.org"
 __revision__ = '$Format:%H$'
 
+# Digests of WKB geometries already known as valid. It's shared between
+# processing steps, so a geometry copied from a layer to another one is not
+# checked again.
+VALID_GEOMETRIES = set()
+
+# Maximum number of digests kept in memory.
+validity_cache_limit = 1000000
+
+# Minimum number of geometries to check before using many processes.
+parallel_minimum = 1000
+
 
 @profile
-def clean_layer(layer, callback=None):
+def clean_layer(layer, callback=None, processes=None):
     """Clean a vector layer.
 
+    Features without geometry are removed. Invalid polygons are repaired with
+    a buffer of 0 and removed if nothing is left. Geometries of other types
+    are not modified. Changes are applied in bulk with the data provider.
+
     :param layer: The vector layer.
     :type layer: QgsVectorLayer
 
@@ -24,6 +47,10 @@ def clean_layer(layer, callback=None):
         'step' (str). Defaults to None.
     :type callback: function
 
+    :param processes: The number of processes to check and repair geometries.
+        Default to the geometryRepairProcesses setting.
+    :type processes: int
+
     :return: The buffered vector layer.
     :rtype: QgsVectorLayer
     """
@@ -31,20 +58,48 @@ def clean_layer(layer, callback=None):
     processing_step = clean_geometry_steps['step_name']
     output_layer_name = output_layer_name % layer.keywords['layer_purpose']
 
-    # start editing
-    layer.startEditing()
-
-    # iterate through all features
-    for feature in layer.getFeatures():
-        geom = feature.geometry()
-        geometry_cleaned = geometry_checker(geom)
-        if geometry_cleaned:
-            feature.setGeometry(geometry_cleaned)
+    if processes is None:
+        processes = setting('geometryRepairProcesses', expected_type=int)
+
+    # Only polygons which are not already known as valid are checked.
+    repair = layer.geometryType() == QGis.Polygon
+    deleted = []
+    geometries = []
+    request = QgsFeatureRequest().setSubsetOfAttributes([])
+    for feature in layer.getFeatures(request):
+        geometry = feature.geometry()
+        if not geometry:
+            deleted.append(feature.id())
+            continue
+        if repair:
+            wkb = geometry.asWkb()
+            if _digest(wkb) not in VALID_GEOMETRIES:
+                geometries.append((feature.id(), wkb))
+
+    changed = {}
+    for (feature_id, wkb), result in zip(
+            geometries, _check_geometries(geometries, processes)):
+        if result is None:
+            _set_valid(wkb)
+        elif result:
+            _set_valid(result)
+            changed[feature_id] = _geometry_from_wkb(result)
         else:
-            layer.deleteFeature(feature.id())
-
-    # save changes
-    layer.commitChanges()
+            deleted.append(feature_id)
+
+    provider = layer.dataProvider()
+    if changed:
+        provider.changeGeometryValues(changed)
+    if deleted:
+        provider.deleteFeatures(deleted)
+    if changed or deleted:
+        layer.updateExtents()
+        # The data provider doesn't notify the layer.
+        clear_spatial_index_cache(layer.id())
+        clear_field_statistics_cache(layer.id())
+
+    profiling_count('repaired', len(changed))
+    profiling_count('dropped', len(deleted))
 
     layer.keywords['title'] = output_layer_name
 
@@ -65,8 +120,93 @@ def geometry_checker(geometry):
         # The geometry can be None.
         return None
 
+    wkb = geometry.asWkb()
+    if _digest(wkb) in VALID_GEOMETRIES:
+        return geometry
+
     if geometry.isGeosValid():
+        _set_valid(wkb)
         return geometry
     else:
         new_geom = geometry.buffer(0, 5)
         return new_geom
+
+
+def clear_validity_cache():
+    """Forget every geometry known as valid."""
+    VALID_GEOMETRIES.clear()
+
+
+def _digest(wkb):
+    """Digest of a WKB geometry, used in the validity cache.
+
+    :param wkb: The WKB geometry.
+    :type wkb: str
+
+    :return: The digest.
+    :rtype: str
+    """
+    return hashlib.md5(wkb).digest()
+
+
+def _set_valid(wkb):
+    """Remember a WKB geometry as valid.
+
+    :param wkb: The WKB geometry.
+    :type wkb: str
+    """
+    if len(VALID_GEOMETRIES) >= validity_cache_limit:
+        VALID_GEOMETRIES.clear()
+    VALID_GEOMETRIES.add(_digest(wkb))
+
+
+def _geometry_from_wkb(wkb):
+    """Create a geometry from WKB.
+
+    :param wkb: The WKB geometry.
+    :type wkb: str
+
+    :return: The geometry.
+    :rtype: QgsGeometry
+    """
+    geometry = QgsGeometry()
+    geometry.fromWkb(wkb)
+    return geometry
+
+
+def _check_geometry(wkb):
+    """Check and repair a single WKB polygon.
+
+    It's a function at the module level so it can be used in other processes.
+
+    :param wkb: The WKB geometry.
+    :type wkb: str
+
+    :return: None if the geometry is valid, the repaired WKB geometry, or an
+        empty string if nothing is left.
+    :rtype: str
+    """
+    geometry = _geometry_from_wkb(wkb)
+    if geometry.isGeosValid():
+        return None
+
+    new_geometry = geometry.buffer(0, 5)
+    if not new_geometry or new_geometry.isGeosEmpty():
+        return ''
+    return new_geometry.asWkb()
+
+
+def _check_geometries(geometries, processes):
+    """Check and repair WKB polygons, using many processes if possible.
+
+    :param geometries: List of tuples (feature ID, WKB geometry).
+    :type geometries: list
+
+    :param processes: The number of processes.
+    :type processes: int
+
+    :return: The result of _check_geometry for each geometry.
+    :rtype: list
+    """
+    items = [wkb for _, wkb in geometries]
+    return parallel_map(_check_geometry, items, processes, parallel_minimum)
@@ -13,6 +13,7 @@ from qgis.core import (
 
 from safe.utilities.i18n import tr
 from safe.definitions.processing_steps import clip_steps
+from safe.gis.vector.feature_writer import FeatureWriter
 from safe.gis.vector.tools import create_memory_layer
 from safe.gis.sanity_check import check_layer
 from safe.utilities.profiling import profile
@@ -63,7 +64,7 @@ def clip(layer_to_clip, mask_layer, callback=None):
         layer_to_clip.crs(),
         layer_to_clip.fields()
     )
-    writer.startEditing()
+    feature_writer = FeatureWriter(writer)
 
     # Begin copy/paste from Processing plugin.
     # Please follow their code as their code is optimized.
@@ -150,7 +151,7 @@ def clip(layer_to_clip, mask_layer, callback=None):
                 out_feat.setGeometry(new_geom)
                 out_feat.setAttributes(in_feat.attributes())
                 if new_geom.type() == layer_to_clip.geometryType():
-                    writer.addFeature(out_feat)
+                    feature_writer.addFeature(out_feat)
             except:
                 LOGGER.debug(
                     tr('Feature geometry error: One or more output features '
@@ -168,7 +169,7 @@ def clip(layer_to_clip, mask_layer, callback=None):
             pass
 
     # End copy/paste from Processing plugin.
-    writer.commitChanges()
+    feature_writer.close()
 
     writer.keywords = layer_to_clip.keywords.copy()
     writer.keywords['title'] = output_layer_name
@@ -9,8 +9,8 @@ from safe.common.exceptions import (
     InvalidKeywordsForProcessingAlgorithm)
 from safe.definitions.processing_steps import assign_default_values_steps
 from safe.definitions.utilities import definition
+from safe.gis.vector.feature_frame import feature_frame, frame_output
 from safe.gis.vector.tools import create_field_from_definition
-from safe.gis.sanity_check import check_layer
 from safe.utilities.i18n import tr
 from safe.utilities.profiling import profile
 
@@ -35,16 +35,17 @@ def add_default_values(layer, callback=None):
     4. It has inasafe_field and it has inasafe_default_value
         --> Replace the null value with the default one.
 
-    :param layer: The vector layer.
-    :type layer: QgsVectorLayer
+    :param layer: The vector layer or a feature frame.
+    :type layer: QgsVectorLayer, FeatureFrame
 
     :param callback: A function to all to indicate progress. The function
         should accept params 'current' (int), 'maximum' (int) and 'step' (str).
         Defaults to None.
     :type callback: function
 
-    :return: The vector layer with the default values.
-    :rtype: QgsVectorLayer
+    :return: The vector layer with the default values, or the frame if a
+        frame is given.
+    :rtype: QgsVectorLayer, FeatureFrame
 
     .. versionadded:: 4.0
     """
@@ -52,12 +53,13 @@ def add_default_values(layer, callback=None):
     output_layer_name = output_layer_name % layer.keywords['layer_purpose']
     processing_step = assign_default_values_steps['step_name']
 
-    fields = layer.keywords.get('inasafe_fields')
+    frame = feature_frame(layer)
+    fields = frame.keywords.get('inasafe_fields')
     if not isinstance(fields, dict):
-        msg = 'inasafe_fields is missing in keywords from %s' % layer.name()
+        msg = 'inasafe_fields is missing in keywords from %s' % frame.name()
         raise InvalidKeywordsForProcessingAlgorithm(msg)
 
-    defaults = layer.keywords.get('inasafe_default_values')
+    defaults = frame.keywords.get('inasafe_default_values')
 
     if not defaults:
         # Case 1 and 2.
@@ -70,7 +72,6 @@ def add_default_values(layer, callback=None):
 
         field = fields.get(default)
         target_field = definition(default)
-        layer.startEditing()
 
         if not field:
             # Case 3
@@ -84,15 +85,10 @@ def add_default_values(layer, callback=None):
 
             new_field = create_field_from_definition(target_field)
 
-            layer.addAttribute(new_field)
+            frame.add_column(
+                new_field, [defaults[default]] * frame.featureCount())
 
-            new_index = layer.fieldNameIndex(new_field.name())
-
-            for feature in layer.getFeatures():
-                layer.changeAttributeValue(
-                    feature.id(), new_index, defaults[default])
-
-            layer.keywords['inasafe_fields'][target_field['key']] = (
+            frame.keywords['inasafe_fields'][target_field['key']] = (
                 target_field['field_name'])
 
         else:
@@ -102,20 +98,13 @@ def add_default_values(layer, callback=None):
                 'default for {field}, we MUST do nothing.'.format(
                     field=target_field['key'], value=defaults[default]))
 
-            index = layer.fieldNameIndex(field)
-
-            for feature in layer.getFeatures():
-                if isinstance(feature.attributes()[index], QPyNullVariant):
-                    layer.changeAttributeValue(
-                        feature.id(), index, defaults[default])
-                    continue
-                if feature.attributes()[index] == '':
-                    layer.changeAttributeValue(
-                        feature.id(), index, defaults[default])
-                    continue
+            values = []
+            for value in frame.column(field):
+                if isinstance(value, QPyNullVariant) or value == '':
+                    value = defaults[default]
+                values.append(value)
+            frame.set_column(field, values)
 
-        layer.commitChanges()
-        layer.keywords['title'] = output_layer_name
+        frame.keywords['title'] = output_layer_name
 
-    check_layer(layer)
-    return layer
+    return frame_output(frame, layer)
@@ -0,0 +1,271 @@
+# coding=utf-8
+
+"""Columnar view of a vector layer, used between attribute only steps.
+
+Many steps of the analysis only add or rewrite attributes. Doing it with an
+edit session on the layer goes through the edit buffer for every value. A
+feature frame reads the attribute table once as columns. Adding a derived
+column is a new list in the frame and the layer is updated in bulk, only
+when the result is needed as a layer.
+
+Geometries are not copied: they stay in the layer and are read as WKB only
+if a step needs them.
+"""
+
+from qgis.core import QgsFeatureRequest, QgsField, QgsFields, QgsGeometry
+
+from safe.gis.sanity_check import check_layer
+from safe.gis.vector.statistics import clear_field_statistics_cache
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+class FeatureFrame(object):
+
+    """Attribute table of a vector layer stored as columns.
+
+    The frame shares the keywords of the layer. Changes to columns are
+    written to the layer by to_layer.
+
+    .. versionadded:: 4.2
+    """
+
+    def __init__(self, layer):
+        """Read the attribute table of the layer.
+
+        :param layer: The vector layer. It must not be in editing mode.
+        :type layer: QgsVectorLayer
+        """
+        self._layer = layer
+        self.keywords = layer.keywords
+
+        self._fields = [QgsField(field) for field in layer.fields().toList()]
+        self._columns = [[] for _ in self._fields]
+        self.ids = []
+
+        request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry)
+        for feature in layer.getFeatures(request):
+            self.ids.append(feature.id())
+            for column, value in zip(self._columns, feature.attributes()):
+                column.append(value)
+
+        # Names of the columns with new values since the last update.
+        self._changed = set()
+        self._wkb = None
+
+    def name(self):
+        """Name of the layer."""
+        return self._layer.name()
+
+    def title(self):
+        """Title of the layer."""
+        return self._layer.title()
+
+    def crs(self):
+        """CRS of the layer."""
+        return self._layer.crs()
+
+    def geometryType(self):
+        """Geometry type of the layer."""
+        return self._layer.geometryType()
+
+    def featureCount(self):
+        """Number of features in the frame."""
+        return len(self.ids)
+
+    def fields(self):
+        """Fields of the frame, like QgsVectorLayer.fields.
+
+        :return: The fields.
+        :rtype: QgsFields
+        """
+        fields = QgsFields()
+        for field in self._fields:
+            fields.append(field)
+        return fields
+
+    def column_names(self):
+        """Names of the columns, in the order of the fields.
+
+        :return: List of names.
+        :rtype: list
+        """
+        return [field.name() for field in self._fields]
+
+    def column(self, name):
+        """Values of a column, in the order of the features.
+
+        The list must not be modified, use set_column instead.
+
+        :param name: The name of the column.
+        :type name: basestring
+
+        :return: The values.
+        :rtype: list
+
+        :raises: KeyError if the column doesn't exist.
+        """
+        return self._columns[self._index(name)]
+
+    def add_column(self, field, values):
+        """Add a column, or replace its values if it already exists.
+
+        :param field: The field of the new column.
+        :type field: QgsField
+
+        :param values: One value per feature.
+        :type values: list
+        """
+        if len(values) != len(self.ids):
+            raise ValueError(
+                'The column %s has %s values but there are %s features.' % (
+                    field.name(), len(values), len(self.ids)))
+
+        name = field.name()
+        if name in self.column_names():
+            self._columns[self._index(name)] = list(values)
+        else:
+            self._fields.append(QgsField(field))
+            self._columns.append(list(values))
+        self._changed.add(name)
+
+    def set_column(self, name, values):
+        """Replace the values of a column.
+
+        :param name: The name of the column.
+        :type name: basestring
+
+        :param values: One value per feature.
+        :type values: list
+
+        :raises: KeyError if the column doesn't exist.
+        """
+        self.add_column(self._fields[self._index(name)], values)
+
+    def remove_columns(self, names):
+        """Remove columns, names which are not in the frame are ignored.
+
+        :param names: List of column names.
+        :type names: list
+        """
+        for name in names:
+            if name in self.column_names():
+                index = self._index(name)
+                del self._fields[index]
+                del self._columns[index]
+                self._changed.discard(name)
+
+    def geometries(self):
+        """Geometries of the features, in the order of the features.
+
+        Geometries are read from the layer the first time as WKB.
+
+        :return: Iterator of geometries.
+        :rtype: iterator
+        """
+        if self._wkb is None:
+            request = QgsFeatureRequest().setSubsetOfAttributes([])
+            wkb = {}
+            for feature in self._layer.getFeatures(request):
+                geometry = feature.geometry()
+                wkb[feature.id()] = geometry.asWkb() if geometry else None
+            self._wkb = [wkb[feature_id] for feature_id in self.ids]
+
+        for wkb in self._wkb:
+            geometry = QgsGeometry()
+            if wkb is not None:
+                geometry.fromWkb(wkb)
+            yield geometry
+
+    def to_layer(self):
+        """Write the changes to the layer in bulk and return the layer.
+
+        Removed columns are deleted, new columns are added and new values are
+        written with a single call to the data provider. The frame can still
+        be used after.
+
+        :return: The updated layer, with the keywords of the frame.
+        :rtype: QgsVectorLayer
+        """
+        layer = self._layer
+        provider = layer.dataProvider()
+        names = self.column_names()
+        layer_names = [field.name() for field in layer.fields().toList()]
+
+        removed = [
+            index for index, name in enumerate(layer_names)
+            if name not in names]
+        if removed:
+            provider.deleteAttributes(removed)
+            layer.updateFields()
+
+        added = [
+            field for field in self._fields if field.name() not in layer_names]
+        if added:
+            provider.addAttributes(added)
+            layer.updateFields()
+
+        if self._changed:
+            columns = [
+                (layer.fieldNameIndex(name), self.column(name))
+                for name in self._changed]
+            attribute_map = {}
+            for row, feature_id in enumerate(self.ids):
+                attribute_map[feature_id] = dict(
+                    (index, values[row]) for index, values in columns)
+            provider.changeAttributeValues(attribute_map)
+            self._changed = set()
+
+        # The data provider doesn't notify the layer.
+        clear_field_statistics_cache(layer.id())
+
+        layer.keywords = self.keywords
+        return layer
+
+    def _index(self, name):
+        """Index of a column.
+
+        :raises: KeyError if the column doesn't exist.
+        """
+        try:
+            return self.column_names().index(name)
+        except ValueError:
+            raise KeyError(name)
+
+
+def feature_frame(layer):
+    """Frame of a layer, or the frame itself if a frame is given.
+
+    :param layer: The vector layer or a frame.
+    :type layer: QgsVectorLayer, FeatureFrame
+
+    :return: The frame.
+    :rtype: FeatureFrame
+    """
+    if isinstance(layer, FeatureFrame):
+        return layer
+    return FeatureFrame(layer)
+
+
+def frame_output(frame, layer):
+    """Output of a step working on a frame, of the same kind as its input.
+
+    If the step received a layer, the layer is updated and checked.
+
+    :param frame: The frame used by the step.
+    :type frame: FeatureFrame
+
+    :param layer: The input of the step.
+    :type layer: QgsVectorLayer, FeatureFrame
+
+    :return: The frame or the updated layer.
+    :rtype: QgsVectorLayer, FeatureFrame
+    """
+    if isinstance(layer, FeatureFrame):
+        return frame
+    layer = frame.to_layer()
+    check_layer(layer)
+    return layer
@@ -0,0 +1,222 @@
+# coding=utf-8
+
+"""Write features in a vector layer by batches.
+
+Adding features one by one to a layer in editing mode goes through the edit
+buffer and the undo stack, and every feature is copied again when changes are
+committed. The feature writer keeps features in a list and adds them directly
+to the data provider when the batch is full.
+
+Attributes are written in the order of the fields given to
+create_memory_layer, see layer_attributes.
+
+The execution plan of an analysis can change how the layers of a step are
+written with write_options. The options only apply to the thread running the
+step, not to the background writer or to the user interface.
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+
+from qgis.core import QgsFeature
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# Default number of features in a batch.
+batch_size = 1000
+
+# Default size in bytes of the geometries in a batch.
+memory_limit = 64 * 1024 * 1024
+
+# Options set by write_options, for each thread.
+_OPTIONS = threading.local()
+
+
+@contextmanager
+def write_options(
+        batch_size=None, memory_limit=None, scratch_directory=None):
+    """Change how layers are written by the current thread, in a block.
+
+        with write_options(scratch_directory=path):
+            layer = create_memory_layer('output', QGis.Polygon)
+
+    .. versionadded:: 4.2
+
+    :param batch_size: The default number of features in a batch of the
+        FeatureWriter.
+    :type batch_size: int
+
+    :param memory_limit: The default size in bytes of the geometries in a
+        batch of the FeatureWriter.
+    :type memory_limit: int
+
+    :param scratch_directory: If set, create_memory_layer creates GeoPackage
+        layers in this directory instead of memory layers.
+    :type scratch_directory: str
+    """
+    previous = getattr(_OPTIONS, 'options', {})
+    options = dict(previous)
+    options.update(
+        (key, value) for key, value in (
+            ('batch_size', batch_size),
+            ('memory_limit', memory_limit),
+            ('scratch_directory', scratch_directory))
+        if value is not None)
+    _OPTIONS.options = options
+    try:
+        yield
+    finally:
+        _OPTIONS.options = previous
+
+
+def write_option(key):
+    """An option set by write_options in the current thread.
+
+    :param key: The name of the option.
+    :type key: str
+
+    :return: The value of the option, None if it's not set.
+    """
+    return getattr(_OPTIONS, 'options', {}).get(key)
+
+
+# Name of the FID column of the GeoPackages created by create_memory_layer in
+# a scratch directory. The OGR provider exposes it as the first field of the
+# layer, but it's not an attribute of the analysis.
+scratch_fid = 'scratchfid'
+
+
+def is_scratch_layer(layer):
+    """Check if the first field of a layer is the FID of a scratch layer.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :rtype: bool
+    """
+    return layer.fields().indexFromName(scratch_fid) == 0
+
+
+def layer_attributes(layer, attributes):
+    """Align attributes with the fields of a layer from create_memory_layer.
+
+    Algorithms build attributes in the order of the fields they give to
+    create_memory_layer, followed by the fields they add after. The FID
+    fields of scratch layers in these fields are not created, and a scratch
+    layer has its own FID as first field, set by the data provider.
+
+    :param layer: The layer to write to.
+    :type layer: QgsVectorLayer
+
+    :param attributes: The attributes, in the order of the fields given to
+        create_memory_layer.
+    :type attributes: list
+
+    :return: The attributes, in the order of the fields of the layer.
+    :rtype: list
+    """
+    dropped = getattr(layer, 'dropped_attributes', None)
+    if dropped:
+        attributes = [
+            value for index, value in enumerate(attributes)
+            if index not in dropped]
+    if is_scratch_layer(layer):
+        attributes = [None] + list(attributes)
+    return attributes
+
+
+class FeatureWriter(object):
+
+    """Add features to the data provider of a layer by batches.
+
+    It can be used as a context manager, the last batch is written at the end:
+
+        with FeatureWriter(layer) as writer:
+            for feature in features:
+                writer.addFeature(feature)
+
+    .. versionadded:: 4.2
+    """
+
+    def __init__(self, layer, size=None, memory=None):
+        """Constructor.
+
+        :param layer: The vector layer to write to. It must not be in editing
+            mode.
+        :type layer: QgsVectorLayer
+
+        :param size: The maximum number of features in a batch. Default to
+            the batch_size of write_options, then of the module.
+        :type size: int
+
+        :param memory: The maximum size in bytes of the geometries in a batch.
+            Default to the memory_limit of write_options, then of the
+            module.
+        :type memory: int
+        """
+        self.layer = layer
+        self.size = size or write_option('batch_size') or batch_size
+        self.memory = memory or write_option('memory_limit') or memory_limit
+        self._provider = layer.dataProvider()
+        self._align = bool(
+            getattr(layer, 'dropped_attributes', None) or
+            is_scratch_layer(layer))
+        self._features = []
+        self._bytes = 0
+        self.count = 0
+
+    def addFeature(self, feature):
+        """Add a feature, the batch is written if it's full.
+
+        The feature is copied, so the same QgsFeature can be reused by the
+        caller.
+
+        :param feature: The feature to add.
+        :type feature: QgsFeature
+
+        :return: True, like QgsVectorLayer.addFeature.
+        :rtype: bool
+        """
+        feature = QgsFeature(feature)
+        if self._align:
+            feature.setAttributes(
+                layer_attributes(self.layer, feature.attributes()))
+        self._features.append(feature)
+        geometry = feature.geometry()
+        if geometry:
+            self._bytes += geometry.wkbSize()
+
+        if len(self._features) >= self.size or self._bytes >= self.memory:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Write the current batch to the data provider."""
+        if not self._features:
+            return
+
+        result, _ = self._provider.addFeatures(self._features)
+        if not result:
+            LOGGER.debug(
+                'Error while adding %s features to %s' % (
+                    len(self._features), self.layer.name()))
+        self.count += len(self._features)
+        self._features = []
+        self._bytes = 0
+
+    def close(self):
+        """Write the last batch and update the layer."""
+        self.flush()
+        self.layer.updateExtents()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -10,8 +10,8 @@ from safe.definitions.processing_steps import (
     recompute_counts_steps)
 from safe.definitions.layer_purposes import layer_purpose_exposure
 from safe.utilities.profiling import profile
+from safe.gis.vector.feature_frame import feature_frame, frame_output
 from safe.gis.vector.tools import create_field_from_definition
-from safe.gis.sanity_check import check_layer
 
 LOGGER = logging.getLogger('InaSAFE')
 
@@ -27,26 +27,27 @@ def from_counts_to_ratios(layer, callback=None):
 
     Formula: ratio = subset count / total count
 
-    :param layer: The vector layer.
-    :type layer: QgsVectorLayer
+    :param layer: The vector layer or a feature frame.
+    :type layer: QgsVectorLayer, FeatureFrame
 
     :param callback: A function to all to indicate progress. The function
         should accept params 'current' (int), 'maximum' (int) and 'step' (str).
         Defaults to None.
     :type callback: function
 
-    :return: The layer with new ratios.
-    :rtype: QgsVectorLayer
+    :return: The layer with new ratios, or the frame if a frame is given.
+    :rtype: QgsVectorLayer, FeatureFrame
 
     .. versionadded:: 4.0
     """
     output_layer_name = recompute_counts_steps['output_layer_name']
     processing_step = recompute_counts_steps['step_name']
 
-    exposure = definition(layer.keywords['exposure'])
-    inasafe_fields = layer.keywords['inasafe_fields']
+    frame = feature_frame(layer)
+    exposure = definition(frame.keywords['exposure'])
+    inasafe_fields = frame.keywords['inasafe_fields']
 
-    layer.keywords['title'] = output_layer_name
+    frame.keywords['title'] = output_layer_name
 
     if not population_count_field['key'] in inasafe_fields:
         # There is not a population count field. Let's skip this layer.
@@ -58,9 +59,8 @@ def from_counts_to_ratios(layer, callback=None):
                 population_count_field=population_count_field['key']))
         return layer
 
-    layer.startEditing()
+    total_counts = frame.column(inasafe_fields[population_count_field['key']])
 
-    mapping = {}
     non_compulsory_fields = get_non_compulsory_fields(
         layer_purpose_exposure['key'], exposure['key'])
     for count_field in non_compulsory_fields:
@@ -68,11 +68,18 @@ def from_counts_to_ratios(layer, callback=None):
         if count_field['key'] in count_ratio_mapping.keys() and exists:
             ratio_field = definition(count_ratio_mapping[count_field['key']])
 
+            ratios = []
+            counts = frame.column(count_field['field_name'])
+            for count, total_count in zip(counts, total_counts):
+                try:
+                    ratios.append(count / total_count)
+                except TypeError:
+                    ratios.append('')
+
             field = create_field_from_definition(ratio_field)
-            layer.addAttribute(field)
+            frame.add_column(field, ratios)
             name = ratio_field['field_name']
-            layer.keywords['inasafe_fields'][ratio_field['key']] = name
-            mapping[count_field['field_name']] = layer.fieldNameIndex(name)
+            frame.keywords['inasafe_fields'][ratio_field['key']] = name
             LOGGER.info(
                 'Count field {count_field} detected in the exposure, we are '
                 'going to create a equivalent field {ratio_field} in the '
@@ -85,22 +92,4 @@ def from_counts_to_ratios(layer, callback=None):
                 'will not compute a ratio from this field.'.format(
                     count_field=count_field['key']))
 
-    if len(mapping) == 0:
-        # There is not a subset count field. Let's skip this layer.
-        layer.commitChanges()
-        return layer
-
-    for feature in layer.getFeatures():
-        total_count = feature[inasafe_fields[population_count_field['key']]]
-
-        for count_field, index in mapping.iteritems():
-            count = feature[count_field]
-            try:
-                new_value = count / total_count
-            except TypeError:
-                new_value = ''
-            layer.changeAttributeValue(feature.id(), index, new_value)
-
-    layer.commitChanges()
-    check_layer(layer)
-    return layer
+    return frame_output(frame, layer)
@@ -14,6 +14,7 @@ from qgis.core import (
 from safe.utilities.i18n import tr
 from safe.definitions.layer_purposes import layer_purpose_exposure_summary
 from safe.definitions.processing_steps import intersection_steps
+from safe.gis.vector.feature_writer import FeatureWriter
 from safe.gis.vector.tools import (
     create_memory_layer, wkb_type_groups, create_spatial_index)
 from safe.gis.sanity_check import check_layer
@@ -59,8 +60,9 @@ def intersection(source, mask, callback=None):
         source.keywords['layer_purpose'])
     processing_step = intersection_steps['step_name']
 
-    fields = source.fields()
-    fields.extend(mask.fields())
+    # A list, so both FID fields of scratch layers are kept, in the same order
+    # as the attributes.
+    fields = source.fields().toList() + mask.fields().toList()
 
     writer = create_memory_layer(
         output_layer_name,
@@ -69,7 +71,7 @@ def intersection(source, mask, callback=None):
         fields
     )
 
-    writer.startEditing()
+    feature_writer = FeatureWriter(writer)
 
     # Begin copy/paste from Processing plugin.
     # Please follow their code as their code is optimized.
@@ -120,7 +122,7 @@ def intersection(source, mask, callback=None):
                             attrs.extend(attributes)
                             attrs.extend(mask_attributes)
                             out_feature.setAttributes(attrs)
-                            writer.addFeature(out_feature)
+                            feature_writer.addFeature(out_feature)
                 except:
                     LOGGER.debug(
                         tr('Feature geometry error: One or more output '
@@ -128,7 +130,7 @@ def intersection(source, mask, callback=None):
                     continue
 
     # End copy/paste from Processing plugin.
-    writer.commitChanges()
+    feature_writer.close()
 
     writer.keywords = dict(source.keywords)
     writer.keywords['title'] = output_layer_name
@@ -3,7 +3,6 @@
 """Buffer a vector layer using many buffers (for volcanoes or rivers)."""
 
 from qgis.core import (
-    QgsVectorLayer,
     QgsCoordinateReferenceSystem,
     QgsCoordinateTransform,
     QgsGeometry,
@@ -12,6 +11,7 @@ from qgis.core import (
 )
 
 from safe.common.utilities import get_utm_epsg
+from safe.gis.vector.feature_writer import FeatureWriter
 from safe.gis.vector.tools import (
     create_memory_layer,
     create_field_from_definition)
@@ -19,16 +19,24 @@ from safe.gis.sanity_check import check_layer
 from safe.definitions.fields import hazard_class_field, buffer_distance_field
 from safe.definitions.layer_purposes import layer_purpose_hazard
 from safe.definitions.processing_steps import buffer_steps
+from safe.utilities.parallel import parallel_map
 from safe.utilities.profiling import profile
+from safe.utilities.settings import setting
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
 __license__ = "GPL version 3"
 __email__ = "info@inasafe.org"
 __revision__ = '$Format:%H$'
 
+# Number of segments used to approximate a quarter circle.
+buffer_segments = 30
+
+# Minimum number of features to buffer before using many processes.
+parallel_minimum = 100
+
 
 @profile
-def multi_buffering(layer, radii, callback=None):
+def multi_buffering(layer, radii, callback=None, processes=None):
     """Buffer a vector layer using many buffers (for volcanoes or rivers).
 
     This processing algorithm will keep the original attribute table and
@@ -40,6 +48,11 @@ def multi_buffering(layer, radii, callback=None):
     radii[1000] = 'medium'
     radii[2000] = 'low'
 
+    Each zone is the difference between the buffer of its radius and the
+    buffer of the previous radius. Buffers are computed in batches, by many
+    processes if needed. If the layer is in EPSG:4326, each feature is
+    buffered in the UTM zone of its own centre.
+
     Issue https://github.com/inasafe/inasafe/issues/3185
 
     :param layer: The layer to polygonize.
@@ -53,6 +66,10 @@ def multi_buffering(layer, radii, callback=None):
         Defaults to None.
     :type callback: function
 
+    :param processes: The number of processes to buffer features. Default to
+        the bufferProcesses setting.
+    :type processes: int
+
     :return: The buffered vector layer.
     :rtype: QgsVectorLayer
     """
@@ -63,6 +80,9 @@ def multi_buffering(layer, radii, callback=None):
     input_crs = layer.crs()
     feature_count = layer.featureCount()
 
+    if processes is None:
+        processes = setting('bufferProcesses', expected_type=int)
+
     fields = layer.fields()
     # Set the new hazard class field.
     new_field = create_field_from_definition(hazard_class_field)
@@ -73,54 +93,55 @@ def multi_buffering(layer, radii, callback=None):
 
     buffered = create_memory_layer(
         output_layer_name, QGis.Polygon, input_crs, fields)
-    data_provider = buffered.dataProvider()
 
     # Reproject features if needed into UTM if the layer is in 4326.
-    if layer.crs().authid() == 'EPSG:4326':
-        center = layer.extent().center()
-        utm = QgsCoordinateReferenceSystem(
-            get_utm_epsg(center.x(), center.y(), input_crs))
-        transform = QgsCoordinateTransform(layer.crs(), utm)
-        reverse_transform = QgsCoordinateTransform(utm, layer.crs())
-    else:
-        transform = None
-        reverse_transform = None
-
-    for i, feature in enumerate(layer.getFeatures()):
-        geom = QgsGeometry(feature.geometry())
-
-        if transform:
-            geom.transform(transform)
-
-        inner_ring = None
-
-        for radius in radii:
-            attributes = feature.attributes()
-
-            # We add the hazard value name to the attribute table.
-            attributes.append(radii[radius])
-            # We add the value of buffer distance to the attribute table.
-            attributes.append(radius)
-
-            circle = geom.buffer(radius, 30)
-
-            if inner_ring:
-                circle.addRing(inner_ring)
-
-            inner_ring = circle.asPolygon()[0]
+    to_utm = input_crs.authid() == 'EPSG:4326'
+    transforms = {}
 
+    attributes = []
+    zones = []
+    items = []
+    for feature in layer.getFeatures():
+        geom = QgsGeometry(feature.geometry())
+        zone = None
+        if to_utm and not geom.isEmpty():
+            center = geom.boundingBox().center()
+            zone = get_utm_epsg(center.x(), center.y(), input_crs)
+            geom.transform(_transforms(transforms, input_crs, zone)[0])
+
+        attributes.append(feature.attributes())
+        zones.append(zone)
+        items.append((geom.asWkb(), list(radii)))
+
+    results = parallel_map(
+        _buffer_geometry, items, processes, parallel_minimum)
+
+    writer = FeatureWriter(buffered)
+    for i, rings in enumerate(results):
+        for radius, wkb in zip(radii, rings):
+            if not wkb:
+                continue
+
+            circle = QgsGeometry()
+            circle.fromWkb(wkb)
+            if zones[i] is not None:
+                circle.transform(
+                    _transforms(transforms, input_crs, zones[i])[1])
+
+            # We add the hazard value name and the value of buffer distance
+            # to the attribute table.
             new_feature = QgsFeature()
-            if reverse_transform:
-                circle.transform(reverse_transform)
-
             new_feature.setGeometry(circle)
-            new_feature.setAttributes(attributes)
+            new_feature.setAttributes(
+                attributes[i] + [radii[radius], radius])
 
-            data_provider.addFeatures([new_feature])
+            writer.addFeature(new_feature)
 
         if callback:
             callback(current=i, maximum=feature_count, step=processing_step)
 
+    writer.close()
+
     # We transfer keywords to the output.
     buffered.keywords = layer.keywords
     buffered.keywords['layer_geometry'] = 'polygon'
@@ -130,3 +151,62 @@ def multi_buffering(layer, radii, callback=None):
 
     check_layer(buffered)
     return buffered
+
+
+def _buffer_geometry(item):
+    """Buffer a WKB geometry with each radius and make the zones.
+
+    It's a function at the module level so it can be used in other processes.
+
+    :param item: Tuple (WKB geometry, list of radii).
+    :type item: tuple
+
+    :return: The WKB zone for each radius, an empty string if the zone is
+        empty.
+    :rtype: list
+    """
+    wkb, radii = item
+    if not wkb:
+        return [''] * len(radii)
+
+    geometry = QgsGeometry()
+    geometry.fromWkb(wkb)
+
+    zones = []
+    previous = None
+    for radius in radii:
+        circle = geometry.buffer(radius, buffer_segments)
+        if previous is None:
+            zone = circle
+        else:
+            zone = circle.difference(previous)
+        previous = circle
+
+        if zone and not zone.isGeosEmpty():
+            zones.append(zone.asWkb())
+        else:
+            zones.append('')
+    return zones
+
+
+def _transforms(transforms, crs, epsg):
+    """Transforms between a CRS and a UTM zone, created once per zone.
+
+    :param transforms: The transforms already created, by EPSG code.
+    :type transforms: dict
+
+    :param crs: The CRS of the layer.
+    :type crs: QgsCoordinateReferenceSystem
+
+    :param epsg: The EPSG code of the UTM zone.
+    :type epsg: int
+
+    :return: Tuple (transform to UTM, transform from UTM).
+    :rtype: tuple
+    """
+    if epsg not in transforms:
+        utm = QgsCoordinateReferenceSystem(epsg)
+        transforms[epsg] = (
+            QgsCoordinateTransform(crs, utm),
+            QgsCoordinateTransform(utm, crs))
+    return transforms[epsg]
@@ -22,6 +22,7 @@ from safe.gis.vector.tools import (
     copy_layer,
     create_field_from_definition
 )
+from safe.gis.vector.statistics import unique_values
 from safe.gis.sanity_check import check_layer
 from safe.definitions.processing_steps import prepare_vector_steps
 from safe.definitions.fields import (
@@ -144,7 +145,7 @@ def _check_value_mapping(layer, exposure_key=None):
     :type exposure_key: str
     """
     index = layer.fieldNameIndex(exposure_type_field['field_name'])
-    unique_exposure = layer.uniqueValues(index)
+    unique_exposure = unique_values(layer, index)
     if layer.keywords['layer_purpose'] == layer_purpose_hazard['key']:
         if not exposure_key:
             message = tr('Hazard value mapping missing exposure key.')
@@ -13,8 +13,8 @@ from safe.definitions.post_processors import size
 from safe.definitions.processing_steps import (
     recompute_counts_steps)
 from safe.utilities.profiling import profile
+from safe.gis.vector.feature_frame import feature_frame, frame_output
 from safe.gis.vector.tools import SizeCalculator
-from safe.gis.sanity_check import check_layer
 
 LOGGER = logging.getLogger('InaSAFE')
 
@@ -31,73 +31,71 @@ def recompute_counts(layer, callback=None):
     This function will also take care of updating the size field. The size
     post processor won't run after this function again.
 
-    :param layer: The vector layer.
-    :type layer: QgsVectorLayer
+    :param layer: The vector layer or a feature frame.
+    :type layer: QgsVectorLayer, FeatureFrame
 
     :param callback: A function to all to indicate progress. The function
         should accept params 'current' (int), 'maximum' (int) and 'step' (str).
         Defaults to None.
     :type callback: function
 
-    :return: The layer with updated counts.
-    :rtype: QgsVectorLayer
+    :return: The layer with updated counts, or the frame if a frame is
+        given.
+    :rtype: QgsVectorLayer, FeatureFrame
 
     .. versionadded:: 4.0
     """
     output_layer_name = recompute_counts_steps['output_layer_name']
     processing_step = recompute_counts_steps['step_name']
 
-    fields = layer.keywords['inasafe_fields']
+    frame = feature_frame(layer)
+    fields = frame.keywords['inasafe_fields']
 
     if size_field['key'] not in fields:
         # noinspection PyTypeChecker
         msg = '%s not found in %s' % (
-            size_field['key'], layer.keywords['title'])
+            size_field['key'], frame.keywords['title'])
         raise InvalidKeywordsForProcessingAlgorithm(msg)
 
-    indexes = []
+    count_names = []
     absolute_field_keys = [f['key'] for f in count_fields]
     for field, field_name in fields.iteritems():
         if field in absolute_field_keys and field != size_field['key']:
-            indexes.append(layer.fieldNameIndex(field_name))
+            count_names.append(field_name)
             LOGGER.info(
                 'We detected the count {field_name}, we will recompute the '
                 'count according to the new size.'.format(
                     field_name=field_name))
 
-    if not len(indexes):
+    if not len(count_names):
         msg = 'Absolute field not found in the layer %s' % (
-            layer.keywords['title'])
+            frame.keywords['title'])
         raise InvalidKeywordsForProcessingAlgorithm(msg)
 
     size_field_name = fields[size_field['key']]
-    size_field_index = layer.fieldNameIndex(size_field_name)
 
-    layer.startEditing()
-
-    exposure_key = layer.keywords['exposure_keywords']['exposure']
+    exposure_key = frame.keywords['exposure_keywords']['exposure']
     size_calculator = SizeCalculator(
-        layer.crs(), layer.geometryType(), exposure_key)
-
-    for feature in layer.getFeatures():
-        old_size = feature[size_field_name]
-        new_size = size(
-            size_calculator=size_calculator, geometry=feature.geometry())
-
-        layer.changeAttributeValue(feature.id(), size_field_index, new_size)
-
-        # Cross multiplication for each field
-        for index in indexes:
-            old_count = feature[index]
+        frame.crs(), frame.geometryType(), exposure_key)
+
+    old_sizes = frame.column(size_field_name)
+    new_sizes = [
+        size(size_calculator=size_calculator, geometry=geometry)
+        for geometry in frame.geometries()]
+
+    # Cross multiplication for each field
+    for name in count_names:
+        new_counts = []
+        for old_count, old_size, new_size in zip(
+                frame.column(name), old_sizes, new_sizes):
             try:
-                new_value = new_size * old_count / old_size
+                new_counts.append(new_size * old_count / old_size)
             except TypeError:
-                new_value = ''
-            layer.changeAttributeValue(feature.id(), index, new_value)
+                new_counts.append('')
+        frame.set_column(name, new_counts)
 
-    layer.commitChanges()
+    frame.set_column(size_field_name, new_sizes)
 
-    layer.keywords['title'] = output_layer_name
+    frame.keywords['title'] = output_layer_name
 
-    check_layer(layer)
-    return layer
+    return frame_output(frame, layer)
@@ -9,6 +9,7 @@ from qgis.core import (
     QgsFeature,
 )
 
+from safe.gis.vector.feature_writer import FeatureWriter
 from safe.gis.vector.tools import create_memory_layer
 from safe.gis.sanity_check import check_layer
 from safe.definitions.processing_steps import reproject_steps
@@ -53,7 +54,7 @@ def reproject(layer, output_crs, callback=None):
 
     reprojected = create_memory_layer(
         output_layer_name, layer.geometryType(), output_crs, input_fields)
-    reprojected.startEditing()
+    writer = FeatureWriter(reprojected)
 
     crs_transform = QgsCoordinateTransform(input_crs, output_crs)
 
@@ -64,12 +65,12 @@ def reproject(layer, output_crs, callback=None):
         geom.transform(crs_transform)
         out_feature.setGeometry(geom)
         out_feature.setAttributes(feature.attributes())
-        reprojected.addFeature(out_feature)
+        writer.addFeature(out_feature)
 
         if callback:
             callback(current=i, maximum=feature_count, step=processing_step)
 
-    reprojected.commitChanges()
+    writer.close()
 
     # We transfer keywords to the output.
     # We don't need to update keywords as the CRS is dynamic.
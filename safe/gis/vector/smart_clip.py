@@ -12,6 +12,7 @@ from qgis.core import (
 )
 
 from safe.definitions.processing_steps import smart_clip_steps
+from safe.gis.vector.feature_writer import FeatureWriter
 from safe.gis.vector.tools import create_memory_layer
 from safe.gis.sanity_check import check_layer
 from safe.utilities.profiling import profile
@@ -56,7 +57,7 @@ def smart_clip(layer_to_clip, mask_layer, callback=None):
         layer_to_clip.crs(),
         layer_to_clip.fields()
     )
-    writer.startEditing()
+    feature_writer = FeatureWriter(writer)
 
     # first build up a list of clip geometries
     request = QgsFeatureRequest().setSubsetOfAttributes([])
@@ -77,9 +78,9 @@ def smart_clip(layer_to_clip, mask_layer, callback=None):
             out_feat = QgsFeature()
             out_feat.setGeometry(feature.geometry())
             out_feat.setAttributes(feature.attributes())
-            writer.addFeature(out_feat)
+            feature_writer.addFeature(out_feat)
 
-    writer.commitChanges()
+    feature_writer.close()
 
     writer.keywords = layer_to_clip.keywords.copy()
     writer.keywords['title'] = output_layer_name
@@ -0,0 +1,229 @@
+# coding=utf-8
+
+"""Spatial indexes shared between processing steps.
+
+The same layer is often indexed many times during an analysis, for instance
+the aggregate hazard layer in the union and in the intersection. The index of
+a layer is built only once, with the bulk loading of QgsSpatialIndex (STR
+packing), and kept until the geometries of the layer change or until the
+layer is deleted.
+
+For layers stored in a file, the bounding boxes can be saved on disk too, in
+a GeoPackage with the same feature IDs, so the next analysis can bulk load the
+index without reading every geometry.
+"""
+
+import hashlib
+import logging
+import os
+from os.path import exists, join
+from uuid import uuid4
+
+from osgeo import ogr
+from qgis.core import (
+    QgsFeatureRequest,
+    QgsSpatialIndex,
+    QgsVectorLayer,
+)
+
+from safe.utilities.settings import setting
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# Spatial index per layer ID, with the feature count when it was built.
+CACHE = {}
+
+# Layer IDs we are listening to.
+CONNECTED_LAYERS = set()
+
+
+def layer_spatial_index(layer, persistent=None):
+    """Get the spatial index of a vector layer, built only once.
+
+    The layer is not cached while it's in editing mode because the edit buffer
+    can change at any time.
+
+    A copy of the index is returned, sharing the data with the cache until the
+    copy is modified. The caller can delete features from its copy.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :param persistent: If the index of a file based layer should be saved on
+        disk. Default to the persistentSpatialIndex setting.
+    :type persistent: bool
+
+    :return: The spatial index.
+    :rtype: QgsSpatialIndex
+    """
+    if layer.isEditable():
+        return _build_spatial_index(layer)
+
+    feature_count = layer.featureCount()
+    cached = CACHE.get(layer.id())
+    if cached is not None and cached[0] == feature_count:
+        return QgsSpatialIndex(cached[1])
+
+    if persistent is None:
+        persistent = setting('persistentSpatialIndex', expected_type=bool)
+
+    index_path = _index_path(layer) if persistent else None
+    if index_path and exists(index_path):
+        spatial_index = _read_spatial_index(index_path)
+    elif index_path:
+        spatial_index = _write_spatial_index(layer, index_path)
+    else:
+        spatial_index = _build_spatial_index(layer)
+
+    if layer.id() not in CONNECTED_LAYERS:
+        _connect_invalidation(layer)
+    CACHE[layer.id()] = (feature_count, spatial_index)
+
+    return QgsSpatialIndex(spatial_index)
+
+
+def clear_spatial_index_cache(layer_id=None):
+    """Remove spatial indexes from the cache in memory.
+
+    :param layer_id: The layer ID to remove. Default to None, every layer.
+    :type layer_id: basestring
+    """
+    if layer_id is None:
+        CACHE.clear()
+    else:
+        CACHE.pop(layer_id, None)
+
+
+def _build_spatial_index(layer):
+    """Build a spatial index in one go, without reading attributes.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :return: The spatial index.
+    :rtype: QgsSpatialIndex
+    """
+    request = QgsFeatureRequest().setSubsetOfAttributes([])
+    return QgsSpatialIndex(layer.getFeatures(request))
+
+
+def _index_path(layer):
+    """Path to the index on disk of a file based layer.
+
+    The path is changing when the file is modified.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :return: The path or None if the layer is not stored in a file.
+    :rtype: str
+    """
+    if layer.providerType() != 'ogr':
+        return None
+
+    path = layer.source().split('|')[0]
+    if not os.path.isfile(path):
+        return None
+
+    key = '%s %s %s %s' % (
+        layer.source(),
+        os.path.getmtime(path),
+        os.path.getsize(path),
+        layer.featureCount())
+    directory = setting('spatialIndexCachePath', expected_type=str)
+    if not exists(directory):
+        os.makedirs(directory)
+    return join(
+        directory, hashlib.md5(key.encode('utf-8')).hexdigest() + '.gpkg')
+
+
+def _write_spatial_index(layer, index_path):
+    """Save the bounding boxes of a layer on disk and load the index.
+
+    The boxes are written in a GeoPackage, with the feature IDs of the layer
+    as FID. The file is written next to its path and renamed at the end, so
+    an interrupted write is not used.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :param index_path: The path of the file to write.
+    :type index_path: str
+
+    :return: The spatial index.
+    :rtype: QgsSpatialIndex
+    """
+    temporary_path = '%s.%s.gpkg' % (index_path, uuid4().hex)
+    data_source = ogr.GetDriverByName('GPKG').CreateDataSource(
+        temporary_path)
+    boxes = data_source.CreateLayer(
+        'boxes', None, ogr.wkbPolygon, ['SPATIAL_INDEX=NO'])
+    definition = boxes.GetLayerDefn()
+
+    boxes.StartTransaction()
+    request = QgsFeatureRequest().setSubsetOfAttributes([])
+    for feature in layer.getFeatures(request):
+        if not feature.geometry():
+            continue
+        box = ogr.Feature(definition)
+        box.SetFID(feature.id())
+        box.SetGeometry(ogr.CreateGeometryFromWkt(
+            feature.geometry().boundingBox().asWktPolygon()))
+        boxes.CreateFeature(box)
+    boxes.CommitTransaction()
+    data_source = None
+
+    try:
+        os.rename(temporary_path, index_path)
+    except OSError:
+        # Another analysis has written the same index in the meantime.
+        os.remove(temporary_path)
+    return _read_spatial_index(index_path)
+
+
+def _read_spatial_index(index_path):
+    """Bulk load a spatial index saved with _write_spatial_index.
+
+    :param index_path: The path of the file to read.
+    :type index_path: str
+
+    :return: The spatial index.
+    :rtype: QgsSpatialIndex
+    """
+    boxes = QgsVectorLayer(index_path, 'boxes', 'ogr')
+    return _build_spatial_index(boxes)
+
+
+def _connect_invalidation(layer):
+    """Clear the index of a layer when geometries are committed or deleted.
+
+    Changes made directly with the data provider are not notified, but adding
+    or deleting features is detected with the feature count.
+
+    The slot must not keep a reference to the layer, otherwise the layer will
+    never be deleted.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+    """
+    layer_id = layer.id()
+
+    def geometries_changed(*args):
+        """Forget the index."""
+        clear_spatial_index_cache(layer_id)
+
+    def layer_destroyed():
+        """Forget the layer."""
+        clear_spatial_index_cache(layer_id)
+        CONNECTED_LAYERS.discard(layer_id)
+
+    layer.committedFeaturesAdded.connect(geometries_changed)
+    layer.committedFeaturesRemoved.connect(geometries_changed)
+    layer.committedGeometriesChanges.connect(geometries_changed)
+    layer.destroyed.connect(layer_destroyed)
+    CONNECTED_LAYERS.add(layer_id)
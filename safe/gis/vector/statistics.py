@@ -0,0 +1,163 @@
+# coding=utf-8
+
+"""Statistics on a vector field, computed in a single scan.
+
+Unique values, count per value, minimum and maximum of a field are computed
+together and cached per layer, so the analysis and the wizard don't scan the
+same layer many times. The cache of a layer is invalidated when its edits are
+committed or when the layer is deleted. Algorithms writing directly to the
+data provider must clear the cache of the layer, the provider doesn't notify
+the layer.
+"""
+
+import logging
+from collections import OrderedDict
+from PyQt4.QtCore import QPyNullVariant
+from qgis.core import QgsFeatureRequest
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# Statistics per layer ID, then per field name and feature count.
+CACHE = {}
+
+# Layer IDs we are listening to.
+CONNECTED_LAYERS = set()
+
+
+def field_statistics(layer, field_index):
+    """Compute statistics about a field of a vector layer.
+
+    The layer is not cached while it's in editing mode because the edit buffer
+    can change at any time.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :param field_index: The index of the field.
+    :type field_index: int
+
+    :return: A dictionary with keys 'unique_values' (list in order of first
+        appearance, NULL included), 'counts' (dictionary value -> number of
+        features), 'minimum' and 'maximum' (None if every value is NULL).
+    :rtype: dict
+    """
+    field_name = layer.fields().at(field_index).name()
+    key = (field_name, layer.featureCount())
+
+    if not layer.isEditable():
+        statistics = CACHE.get(layer.id(), {}).get(key)
+        if statistics is not None:
+            return statistics
+
+    counts = OrderedDict()
+    null_value = None
+    request = QgsFeatureRequest()
+    request.setFlags(QgsFeatureRequest.NoGeometry)
+    request.setSubsetOfAttributes([field_index])
+    for feature in layer.getFeatures(request):
+        value = feature.attributes()[field_index]
+        if value is None or isinstance(value, QPyNullVariant):
+            # Each NULL is a different object, we keep the first one.
+            if null_value is None:
+                null_value = value
+            value = null_value
+        counts[value] = counts.get(value, 0) + 1
+
+    values = [
+        item for item in counts
+        if not (item is None or isinstance(item, QPyNullVariant))]
+    statistics = {
+        'unique_values': list(counts.keys()),
+        'counts': counts,
+        'minimum': min(values) if values else None,
+        'maximum': max(values) if values else None,
+    }
+
+    if not layer.isEditable():
+        if layer.id() not in CONNECTED_LAYERS:
+            _connect_invalidation(layer)
+        CACHE.setdefault(layer.id(), {})[key] = statistics
+
+    return statistics
+
+
+def unique_values(layer, field_index):
+    """Unique values of a field, like QgsVectorLayer.uniqueValues but cached.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :param field_index: The index of the field.
+    :type field_index: int
+
+    :return: The list of unique values.
+    :rtype: list
+    """
+    return field_statistics(layer, field_index)['unique_values']
+
+
+def minimum_value(layer, field_index):
+    """Minimum of a field, like QgsVectorLayer.minimumValue but cached.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :param field_index: The index of the field.
+    :type field_index: int
+
+    :return: The minimum or None if every value is NULL.
+    """
+    return field_statistics(layer, field_index)['minimum']
+
+
+def maximum_value(layer, field_index):
+    """Maximum of a field, like QgsVectorLayer.maximumValue but cached.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :param field_index: The index of the field.
+    :type field_index: int
+
+    :return: The maximum or None if every value is NULL.
+    """
+    return field_statistics(layer, field_index)['maximum']
+
+
+def clear_field_statistics_cache(layer_id=None):
+    """Remove statistics from the cache.
+
+    :param layer_id: The layer ID to remove. Default to None, every layer.
+    :type layer_id: basestring
+    """
+    if layer_id is None:
+        CACHE.clear()
+    else:
+        CACHE.pop(layer_id, None)
+
+
+def _connect_invalidation(layer):
+    """Clear the cache of a layer when it's committed or deleted.
+
+    The slot must not keep a reference to the layer, otherwise the layer will
+    never be deleted.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+    """
+    layer_id = layer.id()
+
+    def layer_destroyed():
+        """Forget the layer."""
+        clear_field_statistics_cache(layer_id)
+        CONNECTED_LAYERS.discard(layer_id)
+
+    layer.editingStopped.connect(
+        lambda: clear_field_statistics_cache(layer_id))
+    layer.destroyed.connect(layer_destroyed)
+    CONNECTED_LAYERS.add(layer_id)
@@ -27,6 +27,7 @@ from safe.definitions.utilities import definition
 from safe.definitions.hazard_classifications import not_exposed_class
 from safe.gis.vector.summary_tools import (
     check_inputs, create_absolute_values_structure, add_fields)
+from safe.gis.vector.statistics import unique_values
 from safe.gis.sanity_check import check_layer
 from safe.utilities.gis import qgis_version
 from safe.utilities.profiling import profile
@@ -103,7 +104,7 @@ def aggregate_hazard_summary(impact, aggregate_hazard, callback=None):
 
     exposure_class = source_fields[exposure_class_field['key']]
     exposure_class_index = impact.fieldNameIndex(exposure_class)
-    unique_exposure = impact.uniqueValues(exposure_class_index)
+    unique_exposure = unique_values(impact, exposure_class_index)
 
     fields = ['aggregation_id', 'hazard_id']
     absolute_values = create_absolute_values_structure(impact, fields)
@@ -26,6 +26,7 @@ from safe.definitions.layer_purposes import layer_purpose_analysis_impacted
 from safe.definitions.post_processors import post_processor_affected_function
 from safe.gis.vector.summary_tools import (
     check_inputs, create_absolute_values_structure, add_fields)
+from safe.gis.vector.statistics import unique_values
 from safe.gis.sanity_check import check_layer
 from safe.utilities.gis import qgis_version
 from safe.utilities.profiling import profile
@@ -92,7 +93,7 @@ def analysis_summary(aggregate_hazard, analysis, callback=None):
 
     hazard_class = source_fields[hazard_class_field['key']]
     hazard_class_index = aggregate_hazard.fieldNameIndex(hazard_class)
-    unique_hazard = aggregate_hazard.uniqueValues(hazard_class_index)
+    unique_hazard = unique_values(aggregate_hazard, hazard_class_index)
 
     hazard_keywords = aggregate_hazard.keywords['hazard_keywords']
     classification = hazard_keywords['classification']
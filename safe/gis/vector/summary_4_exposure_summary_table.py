@@ -31,10 +31,12 @@ from safe.definitions.post_processors import post_processor_affected_function
 from safe.definitions.layer_purposes import \
     layer_purpose_exposure_summary_table
 from safe.definitions.hazard_classifications import not_exposed_class
+from safe.gis.vector.feature_writer import layer_attributes
 from safe.gis.vector.tools import (
     create_field_from_definition,
     read_dynamic_inasafe_field,
     create_memory_layer)
+from safe.gis.vector.statistics import unique_values
 from safe.gis.sanity_check import check_layer
 from safe.gis.vector.summary_tools import (
     check_inputs, create_absolute_values_structure)
@@ -96,7 +98,7 @@ def exposure_summary_table(
 
     hazard_class = source_fields[hazard_class_field['key']]
     hazard_class_index = aggregate_hazard.fieldNameIndex(hazard_class)
-    unique_hazard = aggregate_hazard.uniqueValues(hazard_class_index)
+    unique_hazard = unique_values(aggregate_hazard, hazard_class_index)
 
     unique_exposure = read_dynamic_inasafe_field(
         source_fields, exposure_count_field)
@@ -242,7 +244,7 @@ def exposure_summary_table(
             )
             attributes.append(value)
 
-        feature.setAttributes(attributes)
+        feature.setAttributes(layer_attributes(tabular, attributes))
         tabular.addFeature(feature)
 
         # Sanity check ± 1 to the result. Disabled for now as it seems ± 1 is
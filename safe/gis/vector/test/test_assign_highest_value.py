@@ -10,7 +10,11 @@ QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
 from qgis.core import QgsFeatureRequest
 
 from safe.definitions.fields import hazard_class_field
-from safe.gis.vector.assign_highest_value import assign_highest_value
+from safe.definitions.hazard_classifications import not_exposed_class
+from safe.gis.vector.assign_highest_value import (
+    assign_highest_value,
+    _assign_highest_value_features,
+    _assign_highest_value_points)
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
 __license__ = "GPL version 3"
@@ -66,3 +70,35 @@ class TestAssignHighestValueVector(unittest.TestCase):
             request = QgsFeatureRequest().setFilterExpression(expression)
             self.assertEqual(
                 sum(1 for _ in layer.getFeatures(request)), count)
+
+    def test_assign_highest_value_points(self):
+        """Test the point path gives the same result as the generic one."""
+        aggregate_hazard = load_test_vector_layer(
+            'gisv4', 'intermediate', 'aggregate_classified_hazard.geojson')
+        aggregate_hazard.keywords['classification'] = 'generic_hazard_classes'
+        aggregate_hazard.keywords['aggregation_keywords'] = {}
+        aggregate_hazard.keywords['hazard_keywords'] = {}
+        hazard_field = aggregate_hazard.keywords['inasafe_fields'][
+            hazard_class_field['key']]
+        levels = ['high', 'medium', 'low', not_exposed_class['key']]
+
+        results = []
+        for function in [
+                _assign_highest_value_points, _assign_highest_value_features]:
+            exposure = load_test_vector_layer(
+                'gisv4', 'exposure', 'building-points.geojson',
+                clone_to_memory=True)
+            indices = []
+            exposure.startEditing()
+            for field in aggregate_hazard.fields():
+                exposure.addAttribute(field)
+                indices.append(exposure.fieldNameIndex(field.name()))
+            exposure.commitChanges()
+
+            function(exposure, aggregate_hazard, hazard_field, levels, indices)
+            index = exposure.fieldNameIndex(hazard_field)
+            results.append(dict(
+                (feature.id(), feature[index])
+                for feature in exposure.getFeatures()))
+
+        self.assertDictEqual(results[0], results[1])
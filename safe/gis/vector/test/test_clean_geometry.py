@@ -0,0 +1,63 @@
+# coding=utf-8
+"""Test Clean Geometry."""
+
+import unittest
+
+from safe.test.utilities import (
+    get_qgis_app,
+    load_test_vector_layer)
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from qgis.core import QgsFeature, QgsGeometry
+
+from safe.gis.vector import clean_geometry
+from safe.gis.vector.clean_geometry import (
+    clean_layer,
+    clear_validity_cache,
+)
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+class TestCleanGeometry(unittest.TestCase):
+
+    """Test Clean Geometry."""
+
+    def setUp(self):
+        clear_validity_cache()
+        self.parallel_minimum = clean_geometry.parallel_minimum
+        # Use many processes even with a few features.
+        clean_geometry.parallel_minimum = 1
+
+    def tearDown(self):
+        clear_validity_cache()
+        clean_geometry.parallel_minimum = self.parallel_minimum
+
+    def test_clean_layer(self):
+        """Test we can repair invalid polygons, with many processes too."""
+        for processes in [1, 2]:
+            layer = load_test_vector_layer(
+                'gisv4', 'aggregation', 'small_grid.geojson',
+                clone_to_memory=True)
+            extent = layer.extent()
+
+            # A bow tie polygon is not valid.
+            feature = QgsFeature(layer.fields())
+            feature.setGeometry(QgsGeometry.fromWkt(
+                'POLYGON(({x0} {y0}, {x1} {y1}, {x1} {y0}, {x0} {y1}, '
+                '{x0} {y0}))'.format(
+                    x0=extent.xMinimum(),
+                    y0=extent.yMinimum(),
+                    x1=extent.xMaximum(),
+                    y1=extent.yMaximum())))
+            layer.dataProvider().addFeatures([feature])
+            count = layer.featureCount()
+
+            clean_layer(layer, processes=processes)
+
+            self.assertEqual(layer.featureCount(), count)
+            for feature in layer.getFeatures():
+                self.assertTrue(feature.geometry().isGeosValid())
@@ -0,0 +1,75 @@
+# coding=utf-8
+"""Test Feature Frame."""
+
+import unittest
+
+from safe.test.utilities import (
+    get_qgis_app,
+    load_test_vector_layer)
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from safe.definitions.fields import (
+    female_count_field,
+    female_ratio_field,
+    population_count_field,
+)
+from safe.gis.vector.feature_frame import FeatureFrame
+from safe.gis.vector.from_counts_to_ratios import from_counts_to_ratios
+from safe.gis.vector.prepare_vector_layer import prepare_vector_layer
+from safe.gis.vector.tools import create_field_from_definition
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+class TestFeatureFrame(unittest.TestCase):
+
+    """Test Feature Frame."""
+
+    def test_feature_frame(self):
+        """Test columns of a frame are written to the layer in bulk."""
+        layer = load_test_vector_layer(
+            'gisv4', 'aggregation', 'small_grid.geojson',
+            clone_to_memory=True)
+        names = [field.name() for field in layer.fields().toList()]
+
+        frame = FeatureFrame(layer)
+        self.assertEqual(frame.featureCount(), layer.featureCount())
+        self.assertListEqual(frame.column_names(), names)
+
+        field = create_field_from_definition(female_ratio_field)
+        frame.add_column(field, range(frame.featureCount()))
+        frame.remove_columns([names[0]])
+
+        # Nothing is written before we ask for the layer.
+        self.assertEqual(layer.fieldNameIndex(field.name()), -1)
+        self.assertNotEqual(layer.fieldNameIndex(names[0]), -1)
+
+        self.assertIs(frame.to_layer(), layer)
+        self.assertEqual(layer.fieldNameIndex(names[0]), -1)
+        for feature in layer.getFeatures():
+            self.assertEqual(
+                feature[field.name()], frame.ids.index(feature.id()))
+
+        self.assertRaises(ValueError, frame.add_column, field, [])
+        self.assertRaises(KeyError, frame.column, names[0])
+
+    def test_steps_on_frame(self):
+        """Test a step gives the same result with a layer or a frame."""
+        layer = load_test_vector_layer(
+            'gisv4', 'exposure', 'population.geojson', clone=True)
+        layer = prepare_vector_layer(layer)
+        frame = from_counts_to_ratios(FeatureFrame(layer))
+        self.assertIsInstance(frame, FeatureFrame)
+        self.assertIn(
+            female_ratio_field['key'], frame.keywords['inasafe_fields'])
+
+        layer = frame.to_layer()
+        for feature in layer.getFeatures():
+            manual_ratio = feature[female_count_field['field_name']] / feature[
+                population_count_field['field_name']]
+            diff = abs(
+                manual_ratio - feature[female_ratio_field['field_name']])
+            self.assertTrue(diff < 10 ** -2, diff)
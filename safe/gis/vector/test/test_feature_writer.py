@@ -0,0 +1,88 @@
+# coding=utf-8
+"""Test Feature Writer."""
+
+import unittest
+
+from safe.test.utilities import (
+    get_qgis_app,
+    load_test_vector_layer)
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from qgis.core import QgsFeature
+
+from safe.common.utilities import temp_dir
+from safe.gis.vector.feature_writer import (
+    FeatureWriter, is_scratch_layer, scratch_fid, write_options)
+from safe.gis.vector.tools import copy_layer, create_memory_layer
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+class TestFeatureWriter(unittest.TestCase):
+
+    """Test Feature Writer."""
+
+    def test_feature_writer(self):
+        """Test we can write features by batches."""
+        layer = load_test_vector_layer(
+            'gisv4', 'aggregation', 'small_grid.geojson')
+        output = create_memory_layer(
+            'output', layer.geometryType(), layer.crs(), layer.fields())
+
+        # The same feature is reused, every feature must be copied.
+        out_feature = QgsFeature()
+        with FeatureWriter(output, size=2) as writer:
+            for feature in layer.getFeatures():
+                out_feature.setGeometry(feature.geometry())
+                out_feature.setAttributes(feature.attributes())
+                writer.addFeature(out_feature)
+                # Only full batches are written.
+                self.assertEqual(output.featureCount() % 2, 0)
+
+        self.assertEqual(writer.count, layer.featureCount())
+        self.assertEqual(output.featureCount(), layer.featureCount())
+        self.assertFalse(output.isEditable())
+
+        expected = sorted(
+            f.geometry().exportToWkt() for f in layer.getFeatures())
+        written = sorted(
+            f.geometry().exportToWkt() for f in output.getFeatures())
+        self.assertEqual(written, expected)
+
+    def test_scratch_layer(self):
+        """Test attributes are written to the right fields on disk."""
+        layer = load_test_vector_layer(
+            'gisv4', 'aggregation', 'small_grid.geojson')
+        names = [field.name() for field in layer.fields().toList()]
+        expected = sorted(f.attributes() for f in layer.getFeatures())
+
+        with write_options(scratch_directory=temp_dir('test_scratch_layer')):
+            scratch = create_memory_layer(
+                'scratch', layer.geometryType(), layer.crs(), layer.fields())
+            copy_layer(layer, scratch)
+            # A copy of a scratch layer, also on disk.
+            copy = create_memory_layer(
+                'copy', layer.geometryType(), layer.crs(), scratch.fields())
+            copy_layer(scratch, copy)
+
+        for output in (scratch, copy):
+            self.assertTrue(is_scratch_layer(output))
+            self.assertEqual(
+                [field.name() for field in output.fields().toList()],
+                [scratch_fid] + names)
+            self.assertEqual(
+                sorted(f.attributes()[1:] for f in output.getFeatures()),
+                expected)
+
+        # The FID is not copied to a memory layer.
+        memory = create_memory_layer(
+            'memory', layer.geometryType(), layer.crs(), copy.fields())
+        copy_layer(copy, memory)
+        self.assertFalse(is_scratch_layer(memory))
+        self.assertEqual(
+            [field.name() for field in memory.fields().toList()], names)
+        self.assertEqual(
+            sorted(f.attributes() for f in memory.getFeatures()), expected)
@@ -9,6 +9,7 @@ from safe.test.utilities import (
 QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
 
 from qgis.core import QGis
+from safe.gis.vector import multi_buffering as multi_buffering_module
 from safe.gis.vector.multi_buffering import multi_buffering
 from safe.definitions.fields import hazard_class_field, buffer_distance_field
 
@@ -67,3 +68,29 @@ class TestMultiBuffering(unittest.TestCase):
         new_field_names = actual_field_names[-2:]
 
         self.assertEqual(expected_fields_name, new_field_names)
+
+    def test_multi_buffer_processes(self):
+        """Test buffering with many processes gives the same zones."""
+        radii = OrderedDict()
+        radii[500] = 'high'
+        radii[1000] = 'medium'
+        radii[2000] = 'low'
+
+        parallel_minimum = multi_buffering_module.parallel_minimum
+        # Use many processes even with a few features.
+        multi_buffering_module.parallel_minimum = 1
+        try:
+            zones = []
+            for processes in [1, 2]:
+                layer = load_test_vector_layer(
+                    'hazard', 'volcano_point.geojson')
+                result = multi_buffering(
+                    layer=layer, radii=radii, processes=processes)
+                zones.append(sorted(
+                    (f[buffer_distance_field['field_name']],
+                     round(f.geometry().area(), 6))
+                    for f in result.getFeatures()))
+        finally:
+            multi_buffering_module.parallel_minimum = parallel_minimum
+
+        self.assertEqual(zones[0], zones[1])
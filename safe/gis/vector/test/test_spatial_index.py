@@ -0,0 +1,91 @@
+# coding=utf-8
+"""Test Spatial Index."""
+
+import unittest
+
+from safe.test.utilities import (
+    get_qgis_app,
+    load_test_vector_layer)
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from qgis.core import QgsFeature, QgsGeometry, QgsPoint
+
+from safe.common.utilities import temp_dir
+from safe.gis.vector.spatial_index import (
+    layer_spatial_index,
+    clear_spatial_index_cache,
+    CACHE,
+)
+from safe.utilities.settings import delete_setting, set_setting
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    """Test Spatial Index."""
+
+    def setUp(self):
+        clear_spatial_index_cache()
+
+    def tearDown(self):
+        clear_spatial_index_cache()
+
+    def test_layer_spatial_index(self):
+        """Test the spatial index is built once per layer version."""
+        layer = load_test_vector_layer(
+            'gisv4', 'aggregation', 'small_grid.geojson',
+            clone_to_memory=True)
+        rectangle = layer.extent()
+
+        spatial_index = layer_spatial_index(layer)
+        self.assertEqual(
+            len(spatial_index.intersects(rectangle)), layer.featureCount())
+        self.assertIn(layer.id(), CACHE)
+        cached_index = CACHE[layer.id()][1]
+
+        # Deleting from our copy doesn't change the cache.
+        spatial_index.deleteFeature(next(layer.getFeatures()))
+        spatial_index = layer_spatial_index(layer)
+        self.assertIs(cached_index, CACHE[layer.id()][1])
+        self.assertEqual(
+            len(spatial_index.intersects(rectangle)), layer.featureCount())
+
+        # The index is invalidated when we commit a new geometry.
+        layer.startEditing()
+        feature = QgsFeature(layer.fields())
+        feature.setGeometry(QgsGeometry.fromPoint(QgsPoint(
+            rectangle.center().x(), rectangle.center().y())).buffer(1, 5))
+        layer.addFeature(feature)
+        layer.commitChanges()
+        self.assertNotIn(layer.id(), CACHE)
+        spatial_index = layer_spatial_index(layer)
+        self.assertEqual(
+            len(spatial_index.intersects(layer.extent())),
+            layer.featureCount())
+
+    def test_persistent_spatial_index(self):
+        """Test the spatial index of a file can be saved on disk."""
+        set_setting('spatialIndexCachePath', temp_dir('test_spatial_index'))
+        try:
+            layer = load_test_vector_layer(
+                'gisv4', 'aggregation', 'small_grid.geojson', clone=True)
+            built = layer_spatial_index(layer, persistent=True)
+
+            # The second time, the index is read from the disk.
+            clear_spatial_index_cache()
+            loaded = layer_spatial_index(layer, persistent=True)
+
+            rectangle = layer.extent()
+            self.assertEqual(
+                sorted(built.intersects(rectangle)),
+                sorted(loaded.intersects(rectangle)))
+            # With the IDs of the features of the layer.
+            self.assertEqual(
+                sorted(loaded.intersects(rectangle)),
+                sorted(feature.id() for feature in layer.getFeatures()))
+        finally:
+            delete_setting('spatialIndexCachePath')
@@ -0,0 +1,74 @@
+# coding=utf-8
+"""Test Field Statistics."""
+
+import unittest
+
+from safe.test.utilities import (
+    get_qgis_app,
+    load_test_vector_layer)
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from safe.gis.vector.feature_frame import FeatureFrame
+from safe.gis.vector.statistics import (
+    field_statistics,
+    unique_values,
+    clear_field_statistics_cache,
+)
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+class TestFieldStatistics(unittest.TestCase):
+
+    """Test Field Statistics."""
+
+    def setUp(self):
+        clear_field_statistics_cache()
+
+    def tearDown(self):
+        clear_field_statistics_cache()
+
+    def test_field_statistics(self):
+        """Test we can compute statistics about a field in a single scan."""
+        layer = load_test_vector_layer(
+            'gisv4', 'aggregation', 'small_grid.geojson',
+            clone_to_memory=True)
+
+        index = layer.fieldNameIndex('area_id')
+        statistics = field_statistics(layer, index)
+        self.assertListEqual(
+            sorted(statistics['unique_values']),
+            sorted(layer.uniqueValues(index)))
+        self.assertEqual(statistics['minimum'], 10)
+        self.assertEqual(statistics['maximum'], 30)
+
+        index = layer.fieldNameIndex('fake_field')
+        statistics = field_statistics(layer, index)
+        self.assertDictEqual(dict(statistics['counts']), {666: 3})
+
+        # The second call is coming from the cache.
+        self.assertIs(statistics, field_statistics(layer, index))
+
+        # The cache is invalidated when we commit a change.
+        layer.startEditing()
+        feature = next(layer.getFeatures())
+        layer.changeAttributeValue(feature.id(), index, 667)
+        layer.commitChanges()
+        self.assertListEqual(
+            sorted(unique_values(layer, index)), [666, 667])
+
+    def test_provider_writes(self):
+        """Test the cache is invalidated when the provider is written."""
+        layer = load_test_vector_layer(
+            'gisv4', 'aggregation', 'small_grid.geojson',
+            clone_to_memory=True)
+        index = layer.fieldNameIndex('fake_field')
+        self.assertListEqual(unique_values(layer, index), [666])
+
+        frame = FeatureFrame(layer)
+        frame.set_column('fake_field', [667] * frame.featureCount())
+        frame.to_layer()
+        self.assertListEqual(unique_values(layer, index), [667])
@@ -9,21 +9,27 @@ from PyQt4.QtCore import QPyNullVariant
 from qgis.core import (
     QgsGeometry,
     QgsVectorLayer,
-    QgsSpatialIndex,
     QgsFeatureRequest,
     QgsCoordinateReferenceSystem,
     QGis,
     QgsFeature,
     QgsField,
+    QgsFields,
     QgsDistanceArea,
     QgsUnitTypes,
+    QgsVectorFileWriter,
     QgsWKBTypes
 )
 
 from safe.common.exceptions import MemoryLayerCreationError
+from safe.common.utilities import unique_filename
 from safe.definitions.utilities import definition
 from safe.definitions.units import unit_metres, unit_square_metres
 from safe.gis.vector.clean_geometry import geometry_checker
+from safe.gis.vector.feature_writer import (
+    FeatureWriter, scratch_fid, write_option)
+from safe.gis.vector.spatial_index import layer_spatial_index
+from safe.gis.vector.statistics import clear_field_statistics_cache
 from safe.utilities.profiling import profile
 from safe.utilities.rounding import convert_unit
 
@@ -87,6 +93,14 @@ def create_memory_layer(
         layer_name, geometry, coordinate_reference_system=None, fields=None):
     """Create a vector memory layer.
 
+    If the scratch_directory of write_options is set, the layer is a
+    GeoPackage in this directory instead, so the features are not kept in
+    memory. The FID of the GeoPackage is its first field.
+
+    The FID fields of scratch layers in the fields are not created. Features
+    written by the FeatureWriter can have their attributes in the order of the
+    fields given here, see layer_attributes.
+
     :param layer_name: The name of the layer.
     :type layer_name: str
 
@@ -97,7 +111,7 @@ def create_memory_layer(
     :type coordinate_reference_system: QgsCoordinateReferenceSystem
 
     :param fields: Fields of the vector layer. Default to None.
-    :type fields: QgsFields
+    :type fields: QgsFields, list
 
     :return: The memory layer.
     :rtype: QgsVectorLayer
@@ -115,6 +129,25 @@ def create_memory_layer(
         raise MemoryLayerCreationError(
             'Layer is whether Point nor Line nor Polygon, I got %s' % geometry)
 
+    if isinstance(fields, QgsFields):
+        fields = fields.toList()
+    fields = list(fields or [])
+    dropped_attributes = [
+        index for index, field in enumerate(fields)
+        if field.name() == scratch_fid]
+    fields = [field for field in fields if field.name() != scratch_fid]
+
+    scratch_directory = write_option('scratch_directory')
+    if scratch_directory:
+        layer = _create_scratch_layer(
+            scratch_directory,
+            layer_name,
+            geometry,
+            coordinate_reference_system,
+            fields)
+        layer.dropped_attributes = dropped_attributes
+        return layer
+
     uri = '%s?index=yes&uuid=%s' % (type_string, str(uuid4()))
     if coordinate_reference_system:
         crs = coordinate_reference_system.authid().lower()
@@ -129,9 +162,69 @@ def create_memory_layer(
         data_provider.addAttributes(fields)
         memory_layer.updateFields()
 
+    memory_layer.dropped_attributes = dropped_attributes
     return memory_layer
 
 
+def _create_scratch_layer(
+        scratch_directory,
+        layer_name,
+        geometry,
+        coordinate_reference_system=None,
+        fields=None):
+    """Create an empty GeoPackage layer in a scratch directory.
+
+    Its FID column is named scratch_fid.
+
+    :param scratch_directory: The directory of the GeoPackage.
+    :type scratch_directory: str
+
+    :param layer_name: The name of the layer.
+    :type layer_name: str
+
+    :param geometry: The geometry of the layer.
+    :rtype geometry: QGis.GeometryType
+
+    :param coordinate_reference_system: The CRS of the layer.
+    :type coordinate_reference_system: QgsCoordinateReferenceSystem
+
+    :param fields: Fields of the vector layer. Default to None.
+    :type fields: list
+
+    :return: The layer.
+    :rtype: QgsVectorLayer
+    """
+    layer_fields = QgsFields()
+    for field in fields or []:
+        layer_fields.append(field)
+
+    wkb_types = {
+        QGis.Point: QGis.WKBMultiPoint,
+        QGis.Line: QGis.WKBMultiLineString,
+        QGis.Polygon: QGis.WKBMultiPolygon,
+        QGis.NoGeometry: QGis.WKBNoGeometry,
+    }
+    path = unique_filename(suffix='.gpkg', dir=scratch_directory)
+    writer = QgsVectorFileWriter(
+        path,
+        'utf-8',
+        layer_fields,
+        wkb_types[geometry],
+        coordinate_reference_system or QgsCoordinateReferenceSystem(),
+        'GPKG',
+        [],
+        ['FID=%s' % scratch_fid])
+    if writer.hasError() != QgsVectorFileWriter.NoError:
+        raise MemoryLayerCreationError(writer.errorMessage())
+    del writer
+
+    layer = QgsVectorLayer(path, layer_name, 'ogr')
+    layer.keywords = {
+        'inasafe_fields': {}
+    }
+    return layer
+
+
 @profile
 def copy_layer(source, target):
     """Copy a vector layer to another one.
@@ -143,7 +236,7 @@ def copy_layer(source, target):
     :type source: QgsVectorLayer
     """
     out_feature = QgsFeature()
-    target.startEditing()
+    writer = FeatureWriter(target)
 
     request = QgsFeatureRequest()
 
@@ -174,9 +267,76 @@ def copy_layer(source, target):
                     'after cleaning.')
         out_feature.setGeometry(QgsGeometry(geom))
         out_feature.setAttributes(feature.attributes())
-        target.addFeature(out_feature)
+        writer.addFeature(out_feature)
+
+    writer.close()
+
+
+def serialize_layer(layer):
+    """Serialize a vector layer, so it can be sent to another process.
+
+    Geometries are serialized as WKB and NULL values as None. The features
+    are kept in the same order.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :return: The layer as a picklable dictionary.
+    :rtype: dict
+    """
+    crs = layer.crs()
+    fields = [
+        (field.name(), field.type(), field.typeName(), field.length(),
+         field.precision())
+        for field in layer.fields().toList()]
+    features = []
+    for feature in layer.getFeatures():
+        geometry = feature.geometry()
+        attributes = [
+            None if isinstance(value, QPyNullVariant) else value
+            for value in feature.attributes()]
+        features.append(
+            (geometry.asWkb() if geometry else None, attributes))
+    return {
+        'name': layer.name(),
+        'geometry': layer.geometryType(),
+        'crs': crs.authid() or crs.toWkt(),
+        'fields': fields,
+        'features': features,
+        'keywords': layer.keywords,
+    }
+
 
-    target.commitChanges()
+def deserialize_layer(data):
+    """Create a memory layer from a serialized layer.
+
+    :param data: The layer serialized with serialize_layer.
+    :type data: dict
+
+    :return: The memory layer, with its keywords.
+    :rtype: QgsVectorLayer
+    """
+    fields = QgsFields()
+    for name, field_type, type_name, length, precision in data['fields']:
+        fields.append(QgsField(name, field_type, type_name, length, precision))
+    layer = create_memory_layer(
+        data['name'],
+        data['geometry'],
+        QgsCoordinateReferenceSystem(data['crs']),
+        fields)
+
+    with FeatureWriter(layer) as writer:
+        for wkb, attributes in data['features']:
+            feature = QgsFeature()
+            if wkb is not None:
+                geometry = QgsGeometry()
+                geometry.fromWkb(wkb)
+                feature.setGeometry(geometry)
+            feature.setAttributes(attributes)
+            writer.addFeature(feature)
+
+    layer.keywords = data['keywords']
+    return layer
 
 
 @profile
@@ -228,12 +388,17 @@ def remove_fields(layer, fields_to_remove):
     data_provider = layer.dataProvider()
 
     for field in fields_to_remove:
+        if field == scratch_fid:
+            # The FID of a scratch layer can't be removed.
+            continue
         index = layer.fieldNameIndex(field)
         if index != -1:
             index_to_remove.append(index)
 
     data_provider.deleteAttributes(index_to_remove)
     layer.updateFields()
+    # The data provider doesn't notify the layer.
+    clear_field_statistics_cache(layer.id())
 
 
 @profile
@@ -241,6 +406,8 @@ def create_spatial_index(layer):
     """Helper function to create the spatial index on a vector layer.
 
     This function is mainly used to see the processing time with the decorator.
+    The index is built once per layer and shared, see
+    safe.gis.vector.spatial_index.
 
     :param layer: The vector layer.
     :type layer: QgsVectorLayer
@@ -248,7 +415,7 @@ def create_spatial_index(layer):
     :return: The index.
     :rtype: QgsSpatialIndex
     """
-    spatial_index = QgsSpatialIndex(layer.getFeatures())
+    spatial_index = layer_spatial_index(layer)
     return spatial_index
 
 
@@ -16,6 +16,7 @@ from safe.utilities.i18n import tr
 from safe.definitions.processing_steps import union_steps
 from safe.definitions.fields import hazard_class_field, aggregation_id_field
 from safe.definitions.hazard_classifications import not_exposed_class
+from safe.gis.vector.feature_writer import FeatureWriter
 from safe.gis.vector.tools import (
     create_memory_layer, wkb_type_groups, create_spatial_index)
 from safe.gis.vector.clean_geometry import geometry_checker
@@ -64,8 +65,9 @@ def union(union_a, union_b, callback=None):
         union_b.keywords['layer_purpose']
     )
 
-    fields = union_a.fields()
-    fields.extend(union_b.fields())
+    # A list, so both FID fields of scratch layers are kept, in the same order
+    # as the attributes.
+    fields = union_a.fields().toList() + union_b.fields().toList()
 
     writer = create_memory_layer(
         output_layer_name,
@@ -88,9 +90,10 @@ def union(union_a, union_b, callback=None):
     writer.keywords['hazard_keywords'] = keywords_union_1.copy()
     writer.keywords['aggregation_keywords'] = keywords_union_2.copy()
     skip_field = inasafe_fields_union_2[aggregation_id_field['key']]
-    not_null_field_index = writer.fieldNameIndex(skip_field)
+    not_null_field_index = [field.name() for field in fields].index(
+        skip_field)
 
-    writer.startEditing()
+    feature_writer = FeatureWriter(writer)
 
     # Begin copy/paste from Processing plugin.
     # Please follow their code as their code is optimized.
@@ -113,7 +116,8 @@ def union(union_a, union_b, callback=None):
         intersects = index_a.intersects(geom.boundingBox())
         if len(intersects) < 1:
             try:
-                _write_feature(at_map_a, geom, writer, not_null_field_index)
+                _write_feature(
+                    at_map_a, geom, feature_writer, not_null_field_index)
             except:
                 # This really shouldn't happen, as we haven't
                 # edited the input geom at all
@@ -159,7 +163,7 @@ def union(union_a, union_b, callback=None):
                                     _write_feature(
                                         at_map_a + at_map_b,
                                         int_geom,
-                                        writer,
+                                        feature_writer,
                                         not_null_field_index,
                                     )
                                 except:
@@ -178,7 +182,7 @@ def union(union_a, union_b, callback=None):
                                 _write_feature(
                                     at_map_a + at_map_b,
                                     int_geom,
-                                    writer,
+                                    feature_writer,
                                     not_null_field_index)
                             except:
                                 LOGGER.debug(
@@ -212,7 +216,7 @@ def union(union_a, union_b, callback=None):
                 _write_feature(
                     at_map_a,
                     diff_geom,
-                    writer,
+                    feature_writer,
                     not_null_field_index)
             except:
                 LOGGER.debug(
@@ -260,7 +264,8 @@ def union(union_a, union_b, callback=None):
                 pass
 
         try:
-            _write_feature(atMap, res_geom, writer, not_null_field_index)
+            _write_feature(
+                atMap, res_geom, feature_writer, not_null_field_index)
         except:
             # LOGGER.debug(
             #     tr('Feature geometry error: One or more output features '
@@ -271,7 +276,7 @@ def union(union_a, union_b, callback=None):
 
     # End of copy/paste from processing
 
-    writer.commitChanges()
+    feature_writer.close()
 
     fill_hazard_class(writer)
 
@@ -289,14 +294,14 @@ def _write_feature(attributes, geometry, writer, not_null_field_index):
     :param geometry: The geometry to write to the output.
     :type geometry: QgsGeometry
 
-    :param writer: A vector layer in editing mode.
-    :type: QgsVectorLayer
+    :param writer: The writer of the output layer.
+    :type: FeatureWriter
 
     :param not_null_field_index: The index in the attribute table which should
         not be null.
     :type not_null_field_index: int
     """
-    if writer.geometryType() != geometry.type():
+    if writer.layer.geometryType() != geometry.type():
         # We don't write the feature if it's not the same geometry type.
         return
 
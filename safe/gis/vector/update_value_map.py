@@ -14,8 +14,7 @@ from safe.definitions.fields import (
 from safe.definitions.layer_purposes import (
     layer_purpose_hazard, layer_purpose_exposure)
 from safe.definitions.processing_steps import assign_inasafe_values_steps
-from safe.gis.vector.tools import remove_fields
-from safe.gis.sanity_check import check_layer
+from safe.gis.vector.feature_frame import feature_frame, frame_output
 from safe.utilities.metadata import (
     active_thresholds_value_maps, active_classification)
 from safe.utilities.profiling import profile
@@ -30,8 +29,8 @@ __revision__ = '$Format:%H$'
 def update_value_map(layer, exposure_key=None, callback=None):
     """Assign inasafe values according to definitions for a vector layer.
 
-    :param layer: The vector layer.
-    :type layer: QgsVectorLayer
+    :param layer: The vector layer or a feature frame.
+    :type layer: QgsVectorLayer, FeatureFrame
 
     :param exposure_key: The exposure key.
     :type exposure_key: str
@@ -41,8 +40,8 @@ def update_value_map(layer, exposure_key=None, callback=None):
         Defaults to None.
     :type callback: function
 
-    :return: The classified vector layer.
-    :rtype: QgsVectorLayer
+    :return: The classified vector layer, or the frame if a frame is given.
+    :rtype: QgsVectorLayer, FeatureFrame
 
     .. versionadded:: 4.0
     """
@@ -50,7 +49,8 @@ def update_value_map(layer, exposure_key=None, callback=None):
     processing_step = assign_inasafe_values_steps['step_name']
     output_layer_name = output_layer_name % layer.keywords['layer_purpose']
 
-    keywords = layer.keywords
+    frame = feature_frame(layer)
+    keywords = frame.keywords
     inasafe_fields = keywords['inasafe_fields']
 
     classification = None
@@ -59,7 +59,7 @@ def update_value_map(layer, exposure_key=None, callback=None):
             raise InvalidKeywordsForProcessingAlgorithm
         old_field = hazard_value_field
         new_field = hazard_class_field
-        classification = active_classification(layer.keywords, exposure_key)
+        classification = active_classification(keywords, exposure_key)
 
     elif keywords['layer_purpose'] == layer_purpose_exposure['key']:
         if not inasafe_fields.get(exposure_type_field['key']):
@@ -81,7 +81,6 @@ def update_value_map(layer, exposure_key=None, callback=None):
         value_map = keywords.get('value_map')
 
     unclassified_column = inasafe_fields[old_field['key']]
-    unclassified_index = layer.fieldNameIndex(unclassified_column)
 
     reversed_value_map = {}
     for inasafe_class, values in value_map.iteritems():
@@ -94,25 +93,17 @@ def update_value_map(layer, exposure_key=None, callback=None):
     classified_field.setLength(new_field['length'])
     classified_field.setPrecision(new_field['precision'])
 
-    layer.startEditing()
-    layer.addAttribute(classified_field)
-
-    classified_field_index = layer.fieldNameIndex(classified_field.name())
-
-    for feature in layer.getFeatures():
-        attributes = feature.attributes()
-        source_value = attributes[unclassified_index]
+    classified_values = []
+    for source_value in frame.column(unclassified_column):
         classified_value = reversed_value_map.get(source_value)
 
         if not classified_value:
             classified_value = ''
 
-        layer.changeAttributeValue(
-            feature.id(), classified_field_index, classified_value)
-
-    layer.commitChanges()
+        classified_values.append(classified_value)
 
-    remove_fields(layer, [unclassified_column])
+    frame.add_column(classified_field, classified_values)
+    frame.remove_columns([unclassified_column])
 
     # We transfer keywords to the output.
     # We add new class field
@@ -121,17 +112,16 @@ def update_value_map(layer, exposure_key=None, callback=None):
     # and we remove hazard value field
     inasafe_fields.pop(old_field['key'])
 
-    layer.keywords = keywords
-    layer.keywords['inasafe_fields'] = inasafe_fields
+    frame.keywords = keywords
+    frame.keywords['inasafe_fields'] = inasafe_fields
     if exposure_key:
         value_map_key = 'value_maps'
     else:
         value_map_key = 'value_map'
-    if value_map_key in layer.keywords.keys():
-        layer.keywords.pop(value_map_key)
-    layer.keywords['title'] = output_layer_name
+    if value_map_key in frame.keywords.keys():
+        frame.keywords.pop(value_map_key)
+    frame.keywords['title'] = output_layer_name
     if classification:
-        layer.keywords['classification'] = classification
+        frame.keywords['classification'] = classification
 
-    check_layer(layer)
-    return layer
+    return frame_output(frame, layer)
@@ -25,8 +25,8 @@ __email__ = "info@inasafe.org"
 __revision__ = '$Format:%H$'
 
 
-def generate_impact_report(impact_function, iface):
-    """Generate the impact report from an impact function.
+def create_impact_report(impact_function, iface):
+    """Create the impact report from an impact function.
 
     :param impact_function: The impact function used.
     :type impact_function: ImpactFunction
@@ -34,6 +34,11 @@ def generate_impact_report(impact_function, iface):
     :param iface: QGIS QGisAppInterface instance.
     :type iface: QGisAppInterface
 
+    :return: The impact report with its output folder, or None if the
+        datastore is not a folder.
+    :rtype: ImpactReport
+
+    .. versionadded:: 4.2
     """
     # get the extra layers that we need
     extra_layers = []
@@ -62,17 +67,41 @@ def generate_impact_report(impact_function, iface):
     # We will generate it on the fly without storing it after datastore
     # supports
     impact_report.output_folder = os.path.join(layer_dir, 'output')
+    return impact_report
+
+
+def generate_impact_report(impact_function, iface):
+    """Generate the impact report from an impact function.
+
+    :param impact_function: The impact function used.
+    :type impact_function: ImpactFunction
+
+    :param iface: QGIS QGisAppInterface instance.
+    :type iface: QGisAppInterface
+
+    :return: Tuple of error code and message.
+    :rtype: tuple
+    """
+    impact_report = create_impact_report(impact_function, iface)
+    if impact_report is None:
+        return
     return impact_report.process_components()
 
 
-def generate_impact_map_report(impact_function, iface):
-    """Generate impact map pdf from impact function.
+def create_impact_map_report(impact_function, iface):
+    """Create the impact map report from an impact function.
 
     :param impact_function: The impact function used.
     :type impact_function: ImpactFunction
 
     :param iface: QGIS QGisAppInterface instance.
     :type iface: QGisAppInterface
+
+    :return: The impact report with its output folder, or None if the
+        datastore is not a folder.
+    :rtype: ImpactReport
+
+    .. versionadded:: 4.2
     """
     # get the extra layers that we need
     extra_layers = []
@@ -115,17 +144,41 @@ def generate_impact_map_report(impact_function, iface):
     # We will generate it on the fly without storing it after datastore
     # supports
     impact_report.output_folder = os.path.join(layer_dir, 'output')
+    return impact_report
+
+
+def generate_impact_map_report(impact_function, iface):
+    """Generate the impact map report from an impact function.
+
+    :param impact_function: The impact function used.
+    :type impact_function: ImpactFunction
+
+    :param iface: QGIS QGisAppInterface instance.
+    :type iface: QGisAppInterface
+
+    :return: Tuple of error code and message.
+    :rtype: tuple
+    """
+    impact_report = create_impact_map_report(impact_function, iface)
+    if impact_report is None:
+        return
     return impact_report.process_components()
 
 
-def generate_infographic_report(impact_function, iface):
-    """Generate impact map pdf from impact function.
+def create_infographic_report(impact_function, iface):
+    """Create the infographic report from an impact function.
 
     :param impact_function: The impact function used.
     :type impact_function: ImpactFunction
 
     :param iface: QGIS QGisAppInterface instance.
     :type iface: QGisAppInterface
+
+    :return: The impact report with its output folder, or None if the
+        datastore is not a folder.
+    :rtype: ImpactReport
+
+    .. versionadded:: 4.2
     """
     # get the extra layers that we need
     extra_layers = []
@@ -158,6 +211,24 @@ def generate_infographic_report(impact_function, iface):
     # We will generate it on the fly without storing it after datastore
     # supports
     impact_report.output_folder = os.path.join(layer_dir, 'output')
+    return impact_report
+
+
+def generate_infographic_report(impact_function, iface):
+    """Generate the infographic report from an impact function.
+
+    :param impact_function: The impact function used.
+    :type impact_function: ImpactFunction
+
+    :param iface: QGIS QGisAppInterface instance.
+    :type iface: QGisAppInterface
+
+    :return: Tuple of error code and message.
+    :rtype: tuple
+    """
+    impact_report = create_infographic_report(impact_function, iface)
+    if impact_report is None:
+        return
     return impact_report.process_components()
 
 
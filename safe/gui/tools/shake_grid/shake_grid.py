@@ -41,13 +41,14 @@ from qgis.core import (
     QgsFeatureRequest,
     QgsRectangle,
     QgsRasterLayer)
-from safe.common.utilities import which, romanise
+from safe.common.utilities import which, romanise, temp_dir
 from safe.common.exceptions import (
     GridXmlFileNotFoundError,
     GridXmlParseError,
     ContourCreationError,
     InvalidLayerError)
 from safe.utilities.styling import mmi_colour
+from safe.utilities.scratch import scratch_workspace
 from safe.utilities.keyword_io import KeywordIO
 from safe.utilities.i18n import tr
 from safe.common.exceptions import CallGDALError
@@ -350,7 +351,7 @@ class ShakeGrid(object):
             delimited_text += '%s,%s,%s\n' % (row[0], row[1], row[2])
         return delimited_text
 
-    def mmi_to_delimited_file(self, force_flag=True):
+    def mmi_to_delimited_file(self, force_flag=True, output_dir=None):
         """Save mmi_data to delimited text file suitable for gdal_grid.
 
         The output file will be of the same format as strings returned from
@@ -360,6 +361,10 @@ class ShakeGrid(object):
             file. Defaults to False.
         :type force_flag: bool
 
+        :param output_dir: The directory of the file. Defaults to the output
+            directory of the converter.
+        :type output_dir: str
+
         :returns: The absolute file system path to the delimited text file.
         :rtype: str
 
@@ -372,8 +377,9 @@ class ShakeGrid(object):
         """
         LOGGER.debug('mmi_to_delimited_text requested.')
 
-        csv_path = os.path.join(
-            self.output_dir, 'mmi.csv')
+        if output_dir is None:
+            output_dir = self.output_dir
+        csv_path = os.path.join(output_dir, 'mmi.csv')
         # short circuit if the csv is already created.
         if os.path.exists(csv_path) and force_flag is not True:
             return csv_path
@@ -383,20 +389,24 @@ class ShakeGrid(object):
 
         # Also write the .csvt which contains metadata about field types
         csvt_path = os.path.join(
-            self.output_dir, self.output_basename + '.csvt')
+            output_dir, self.output_basename + '.csvt')
         csvt_file = file(csvt_path, 'w')
         csvt_file.write('"Real","Real","Real"')
         csvt_file.close()
 
         return csv_path
 
-    def mmi_to_vrt(self, force_flag=True):
+    def mmi_to_vrt(self, force_flag=True, output_dir=None):
         """Save the mmi_data to an ogr vrt text file.
 
         :param force_flag: Whether to force the regeneration of the output
             file. Defaults to False.
         :type force_flag: bool
 
+        :param output_dir: The directory of the file and of the delimited
+            text file. Defaults to the output directory of the converter.
+        :type output_dir: str
+
         :returns: The absolute file system path to the .vrt text file.
         :rtype: str
 
@@ -405,15 +415,17 @@ class ShakeGrid(object):
         # Ensure the delimited mmi file exists
         LOGGER.debug('mmi_to_vrt requested.')
 
+        if output_dir is None:
+            output_dir = self.output_dir
         vrt_path = os.path.join(
-            self.output_dir,
+            output_dir,
             self.output_basename + '.vrt')
 
         # short circuit if the vrt is already created.
         if os.path.exists(vrt_path) and force_flag is not True:
             return vrt_path
 
-        csv_path = self.mmi_to_delimited_file(True)
+        csv_path = self.mmi_to_delimited_file(True, output_dir)
 
         vrt_string = (
             '<OGRVRTDataSource>'
@@ -516,9 +528,6 @@ class ShakeGrid(object):
         if os.path.exists(tif_path) and force_flag is not True:
             return tif_path
 
-        # Ensure the vrt mmi file exists (it will generate csv too if needed)
-        vrt_path = self.mmi_to_vrt(force_flag)
-
         # now generate the tif using default nearest neighbour interpolation
         # options. This gives us the same output as the mi.grd generated by
         # the earthquake server.
@@ -526,29 +535,35 @@ class ShakeGrid(object):
         if 'invdist' in algorithm:
             algorithm = 'invdist:power=2.0:smoothing=1.0'
 
-        # (Sunni): I'm not sure how this 'mmi' will work
-        # (Tim): Its the mapping to which field in the CSV contains the data
-        #    to be gridded.
-        command = ((
-            '%(gdal_grid)s -a %(alg)s -zfield "mmi" -txe %(xMin)s '
-            '%(xMax)s -tye %(yMin)s %(yMax)s -outsize %(dimX)i '
-            '%(dimY)i -of GTiff -ot Float16 -a_srs EPSG:4326 -l mmi '
-            '"%(vrt)s" "%(tif)s"') % {
-                'gdal_grid': which('gdal_grid')[0],
-                'alg': algorithm,
-                'xMin': self.x_minimum,
-                'xMax': self.x_maximum,
-                'yMin': self.y_minimum,
-                'yMax': self.y_maximum,
-                'dimX': self.columns,
-                'dimY': self.rows,
-                'vrt': vrt_path,
-                'tif': tif_path
-            })
-
-        LOGGER.info('Created this gdal command:\n%s' % command)
-        # Now run GDAL warp scottie...
-        self._run_command(command)
+        # The csv and vrt files are only needed by gdal_grid, they are
+        # written in a scratch workspace, the tif is in the output directory.
+        with scratch_workspace('shake_grid'):
+            # Generate the vrt mmi file (it will generate csv too)
+            vrt_path = self.mmi_to_vrt(True, temp_dir('shake_grid'))
+
+            # (Sunni): I'm not sure how this 'mmi' will work
+            # (Tim): Its the mapping to which field in the CSV contains the
+            #    data to be gridded.
+            command = ((
+                '%(gdal_grid)s -a %(alg)s -zfield "mmi" -txe %(xMin)s '
+                '%(xMax)s -tye %(yMin)s %(yMax)s -outsize %(dimX)i '
+                '%(dimY)i -of GTiff -ot Float16 -a_srs EPSG:4326 -l mmi '
+                '"%(vrt)s" "%(tif)s"') % {
+                    'gdal_grid': which('gdal_grid')[0],
+                    'alg': algorithm,
+                    'xMin': self.x_minimum,
+                    'xMax': self.x_maximum,
+                    'yMin': self.y_minimum,
+                    'yMax': self.y_maximum,
+                    'dimX': self.columns,
+                    'dimY': self.rows,
+                    'vrt': vrt_path,
+                    'tif': tif_path
+                })
+
+            LOGGER.info('Created this gdal command:\n%s' % command)
+            # Now run GDAL warp scottie...
+            self._run_command(command)
 
         # We will use keywords file name with simple algorithm name since it
         # will raise an error in windows related to having double colon in path
@@ -595,11 +610,6 @@ class ShakeGrid(object):
         if os.path.exists(shp_path) and force_flag is not True:
             return shp_path
 
-        # Ensure the vrt mmi file exists (it will generate csv too if needed)
-        vrt_path = self.mmi_to_vrt(force_flag)
-
-        # now generate the tif using default interpolation options
-
         binary_list = which('ogr2ogr')
         LOGGER.debug('Path for ogr2ogr: %s' % binary_list)
         if len(binary_list) < 1:
@@ -607,17 +617,23 @@ class ShakeGrid(object):
                     tr('ogr2ogr could not be found on your computer'))
         # Use the first matching gdalwarp found
         binary = binary_list[0]
-        command = (
-            ('%(ogr2ogr)s -overwrite -select mmi -a_srs EPSG:4326 '
-             '%(shp)s %(vrt)s mmi') % {
-                'ogr2ogr': binary,
-                'shp': shp_path,
-                'vrt': vrt_path})
-
-        LOGGER.info('Created this ogr command:\n%s' % command)
-        # Now run ogr2ogr ...
-        # noinspection PyProtectedMember
-        self._run_command(command)
+
+        # The csv and vrt files are only needed by ogr2ogr.
+        with scratch_workspace('shake_grid'):
+            # Generate the vrt mmi file (it will generate csv too)
+            vrt_path = self.mmi_to_vrt(True, temp_dir('shake_grid'))
+
+            command = (
+                ('%(ogr2ogr)s -overwrite -select mmi -a_srs EPSG:4326 '
+                 '%(shp)s %(vrt)s mmi') % {
+                    'ogr2ogr': binary,
+                    'shp': shp_path,
+                    'vrt': vrt_path})
+
+            LOGGER.info('Created this ogr command:\n%s' % command)
+            # Now run ogr2ogr ...
+            # noinspection PyProtectedMember
+            self._run_command(command)
 
         # Lastly copy over the standard qml (QGIS Style file) for the mmi.tif
         qml_path = os.path.join(
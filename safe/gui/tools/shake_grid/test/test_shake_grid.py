@@ -27,6 +27,7 @@ from safe.test.utilities import standard_data_path, get_qgis_app
 from safe.gui.tools.shake_grid.shake_grid import (
     ShakeGrid,
     convert_mmi_data)
+from safe.utilities.scratch import ScratchWorkspace
 
 QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
 # Parse the grid once and use it for all tests to fasten the tests
@@ -231,6 +232,32 @@ class ShakeGridTest(unittest.TestCase):
             exists,
             'File result : %s does not exist' % result[:-3] + 'qml')
 
+    @unittest.skipIf(
+        os.environ.get('ON_TRAVIS', False), 'Slow test, skipped on travis')
+    def test_convert_in_scratch_workspace(self):
+        """Test intermediate files of conversions are not left behind."""
+        output_dir = temp_dir('test_shake_grid_scratch')
+        root = ScratchWorkspace(ram_disk=False).root
+        prefix = '%s_' % os.getpid()
+        for _ in range(3):
+            result = convert_mmi_data(
+                GRID_PATH,
+                'Earthquake',
+                'USGS',
+                os.path.join(output_dir, 'mmi.tif'),
+                algorithm_filename_flag=False)
+            self.assertTrue(os.path.exists(result))
+            workspaces = [
+                name for name in os.listdir(root) if name.startswith(prefix)]
+            self.assertEqual(workspaces, [])
+
+        # Only the outputs are in the output directory.
+        for name in ['mmi.tif', 'mmi.qml', 'mmi.xml']:
+            self.assertIn(name, os.listdir(output_dir))
+        for name in ['mmi.csv', 'mmi.csvt', 'mmi.vrt']:
+            self.assertNotIn(name, os.listdir(output_dir))
+        shutil.rmtree(output_dir)
+
 
 if __name__ == '__main__':
     suite = unittest.makeSuite(ShakeGridTest)
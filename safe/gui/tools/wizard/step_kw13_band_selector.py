@@ -5,8 +5,7 @@
 from PyQt4 import QtCore
 from PyQt4.QtGui import QListWidgetItem
 
-from qgis.core import QgsRasterBandStats
-
+from safe.gis.raster.statistics import band_statistics
 from safe.utilities.i18n import tr
 from safe.gui.tools.wizard.wizard_step import (
     get_wizard_step_ui_class, WizardStep)
@@ -59,15 +58,12 @@ class StepKwBandSelector(WizardStep, FORM_CLASS):
         self.clear_further_steps()
         # Set widgets
         selected_band = self.selected_band()
-        statistics = self.parent.layer.dataProvider().bandStatistics(
-            selected_band,
-            QgsRasterBandStats.All,
-            self.parent.layer.extent(),
-            0)
+        statistics = band_statistics(
+            self.parent.layer.source(), selected_band)
         band_description = tr(
             'This band contains data from {min_value} to {max_value}').format(
-            min_value=statistics.minimumValue,
-            max_value=statistics.maximumValue
+            min_value=statistics['minimum'],
+            max_value=statistics['maximum']
         )
         self.lblDescribeBandSelector.setText(band_description)
 
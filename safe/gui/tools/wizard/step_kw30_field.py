@@ -23,6 +23,7 @@ from safe.gui.tools.wizard.utilities import (
 from safe.definitions.utilities import (
     get_fields, get_non_compulsory_fields, get_field_groups)
 from safe.definitions.fields import population_count_field
+from safe.gis.vector.statistics import field_statistics
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
 __license__ = "GPL version 3"
@@ -135,7 +136,8 @@ class StepKwField(WizardStep, FORM_CLASS):
             # Generate description for the field.
             field_type = layer_fields.field(field_name).typeName()
             field_index = layer_fields.indexFromName(field_name)
-            unique_values = self.parent.layer.uniqueValues(field_index)
+            unique_values = field_statistics(
+                self.parent.layer, field_index)['unique_values']
             unique_values_str = [
                 i is not None and unicode(i) or 'NULL'
                 for i in unique_values[0:48]]
@@ -4,7 +4,6 @@
 import logging
 from functools import partial
 from collections import OrderedDict
-import numpy
 
 from PyQt4.QtGui import (
     QLabel, QHBoxLayout, QComboBox, QPushButton,
@@ -13,10 +12,6 @@ from PyQt4.QtGui import (
 from PyQt4.QtCore import Qt, QPyNullVariant
 from PyQt4.QtWebKit import QWebView
 
-from osgeo import gdal
-from osgeo.gdalconst import GA_ReadOnly
-from qgis.core import QgsRasterBandStats
-
 import safe.messaging as m
 from safe.messaging import styles
 from safe.utilities.i18n import tr
@@ -27,6 +22,9 @@ from safe.definitions.font import big_font
 from safe.definitions.layer_purposes import layer_purpose_aggregation
 from safe.gui.tools.wizard.wizard_step import (
     WizardStep, get_wizard_step_ui_class)
+from safe.gis.raster.statistics import (
+    band_statistics, band_unique_values, unique_values_limit)
+from safe.gis.vector.statistics import field_statistics
 from safe.utilities.gis import is_raster_layer
 from safe.definitions.utilities import (
     definition,
@@ -49,6 +47,7 @@ from safe.gui.tools.wizard.wizard_strings import (
     continuous_raster_question,
     continuous_vector_question,
     classify_raster_question,
+    classify_raster_too_many_values,
     classify_vector_question)
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
@@ -563,19 +562,19 @@ class StepKwMultiClassifications(WizardStep, FORM_CLASS):
             selected_subcategory()
 
         if is_raster_layer(self.parent.layer):
-            statistics = self.parent.layer.dataProvider().bandStatistics(
-                1, QgsRasterBandStats.All, self.parent.layer.extent(), 0)
+            statistics = band_statistics(self.parent.layer.source(), 1)
             description_text = continuous_raster_question % (
                 layer_purpose['name'],
                 layer_subcategory['name'],
                 classification['name'],
-                statistics.minimumValue,
-                statistics.maximumValue)
+                statistics['minimum'],
+                statistics['maximum'])
         else:
             field_name = self.parent.step_kw_field.selected_fields()
             field_index = self.parent.layer.fieldNameIndex(field_name)
-            min_value_layer = self.parent.layer.minimumValue(field_index)
-            max_value_layer = self.parent.layer.maximumValue(field_index)
+            statistics = field_statistics(self.parent.layer, field_index)
+            min_value_layer = statistics['minimum']
+            max_value_layer = statistics['maximum']
             description_text = continuous_vector_question % (
                 layer_purpose['name'],
                 layer_subcategory['name'],
@@ -784,16 +783,15 @@ class StepKwMultiClassifications(WizardStep, FORM_CLASS):
                 layer_purpose['name'],
                 classification['name'])
 
-            dataset = gdal.Open(self.parent.layer.source(), GA_ReadOnly)
             active_band = self.parent.step_kw_band_selector.selected_band()
-            unique_values = numpy.unique(numpy.array(
-                dataset.GetRasterBand(active_band).ReadAsArray()))
+            # Values are already converted to a json serializable type.
+            unique_values = band_unique_values(
+                self.parent.layer.source(), active_band)
+            if unique_values is None:
+                description_text = (
+                    classify_raster_too_many_values % unique_values_limit)
+                unique_values = []
             field_type = 0
-            # Convert datatype to a json serializable type
-            if numpy.issubdtype(unique_values.dtype, float):
-                unique_values = [float(i) for i in unique_values]
-            else:
-                unique_values = [int(i) for i in unique_values]
         else:
             field = self.parent.step_kw_field.selected_fields()
             field_index = self.parent.layer.dataProvider().fields(). \
@@ -805,7 +803,8 @@ class StepKwMultiClassifications(WizardStep, FORM_CLASS):
                 layer_purpose['name'],
                 classification['name'],
                 field.upper())
-            unique_values = self.parent.layer.uniqueValues(field_index)
+            unique_values = field_statistics(
+                self.parent.layer, field_index)['unique_values']
 
         # Set description
         description_label = QLabel(description_text)
@@ -3,11 +3,8 @@
 
 import json
 
-import numpy
 from PyQt4 import QtCore, QtGui
 from PyQt4.QtCore import QPyNullVariant
-from osgeo import gdal
-from osgeo.gdalconst import GA_ReadOnly
 
 from safe.utilities.i18n import tr
 from safe import messaging as m
@@ -15,10 +12,15 @@ from safe import messaging as m
 from safe.definitions.layer_purposes import layer_purpose_aggregation
 from safe.definitions.layer_geometry import layer_geometry_raster
 from safe.definitions.utilities import get_fields, get_compulsory_fields
+from safe.gis.raster.statistics import (
+    band_unique_values, unique_values_limit)
+from safe.gis.vector.statistics import field_statistics
 from safe.gui.tools.wizard.wizard_step import WizardStep
 from safe.gui.tools.wizard.wizard_step import get_wizard_step_ui_class
 from safe.gui.tools.wizard.wizard_strings import (
-    classify_raster_question, classify_vector_question)
+    classify_raster_question,
+    classify_raster_too_many_values,
+    classify_vector_question)
 from safe.gui.tools.wizard.utilities import skip_inasafe_field
 from safe.utilities.gis import is_raster_layer
 
@@ -43,6 +45,8 @@ class StepKwClassify(WizardStep, FORM_CLASS):
         """
         WizardStep.__init__(self, parent)
         self.treeClasses.itemChanged.connect(self.update_dragged_item_flags)
+        # If the raster band has too many unique values to be classified.
+        self.too_many_values = False
 
     def is_ready_to_next_step(self):
         """Check if the step is complete. If so, there is
@@ -51,7 +55,7 @@ class StepKwClassify(WizardStep, FORM_CLASS):
         :returns: True if new step may be enabled.
         :rtype: bool
         """
-        return True
+        return not self.too_many_values
 
     def get_next_step(self):
         """Find the proper step when user clicks the Next button.
@@ -148,20 +152,23 @@ class StepKwClassify(WizardStep, FORM_CLASS):
         classification = self.parent.step_kw_classification.\
             selected_classification()
         classification_name = classification['name']
+        self.too_many_values = False
 
         if is_raster_layer(self.parent.layer):
             self.lblClassify.setText(classify_raster_question % (
                 subcategory['name'], purpose['name'], classification_name))
-            dataset = gdal.Open(self.parent.layer.source(), GA_ReadOnly)
             active_band = self.parent.step_kw_band_selector.selected_band()
-            unique_values = numpy.unique(numpy.array(
-                dataset.GetRasterBand(active_band).ReadAsArray()))
+            # Values are already converted to a json serializable type.
+            unique_values = band_unique_values(
+                self.parent.layer.source(), active_band)
+            if unique_values is None:
+                self.too_many_values = True
+                self.lblClassify.setText(
+                    classify_raster_too_many_values % unique_values_limit)
+                self.lstUniqueValues.clear()
+                self.treeClasses.clear()
+                return
             field_type = 0
-            # Convert datatype to a json serializable type
-            if numpy.issubdtype(unique_values.dtype, float):
-                unique_values = [float(i) for i in unique_values]
-            else:
-                unique_values = [int(i) for i in unique_values]
         else:
             field = self.parent.step_kw_field.selected_fields()
             field_index = self.parent.layer.dataProvider().fields().\
@@ -171,7 +178,8 @@ class StepKwClassify(WizardStep, FORM_CLASS):
             self.lblClassify.setText(classify_vector_question % (
                     subcategory['name'], purpose['name'],
                     classification_name, field.upper()))
-            unique_values = self.parent.layer.uniqueValues(field_index)
+            unique_values = field_statistics(
+                self.parent.layer, field_index)['unique_values']
 
         clean_unique_values = []
         for unique_value in unique_values:
@@ -5,7 +5,6 @@ from collections import OrderedDict
 from functools import partial
 import logging
 from PyQt4.QtGui import QDoubleSpinBox, QHBoxLayout, QLabel
-from qgis.core import QgsRasterBandStats
 
 from safe.utilities.i18n import tr
 from safe import messaging as m
@@ -18,6 +17,8 @@ from safe.gui.tools.wizard.wizard_step import (
 from safe.gui.tools.wizard.utilities import clear_layout, skip_inasafe_field
 from safe.gui.tools.wizard.wizard_strings import (
     continuous_raster_question, continuous_vector_question)
+from safe.gis.raster.statistics import band_statistics
+from safe.gis.vector.statistics import field_statistics
 from safe.utilities.gis import is_raster_layer
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
@@ -102,19 +103,19 @@ class StepKwThreshold(WizardStep, FORM_CLASS):
             selected_classification()
 
         if is_raster_layer(self.parent.layer):
-            statistics = self.parent.layer.dataProvider().bandStatistics(
-                1, QgsRasterBandStats.All, self.parent.layer.extent(), 0)
+            statistics = band_statistics(self.parent.layer.source(), 1)
             text = continuous_raster_question % (
                 layer_purpose['name'],
                 layer_subcategory['name'],
                 classification['name'],
-                statistics.minimumValue,
-                statistics.maximumValue)
+                statistics['minimum'],
+                statistics['maximum'])
         else:
             field_name = self.parent.step_kw_field.selected_fields()
             field_index = self.parent.layer.fieldNameIndex(field_name)
-            min_value_layer = self.parent.layer.minimumValue(field_index)
-            max_value_layer = self.parent.layer.maximumValue(field_index)
+            statistics = field_statistics(self.parent.layer, field_index)
+            min_value_layer = statistics['minimum']
+            max_value_layer = statistics['maximum']
             text = continuous_vector_question % (
                 layer_purpose['name'],
                 layer_subcategory['name'],
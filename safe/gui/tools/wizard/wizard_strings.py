@@ -135,6 +135,12 @@ classify_raster_question = tr(
     'Please drag unique values from the list on the left '
     'into the panel on the right and place them in the appropriate categories.'
 )  # (subcategory, layer purpose, classification)
+classify_raster_too_many_values = tr(
+    'The band of this raster layer has more than <b>%s</b> unique values, '
+    'so they can not be classified one by one. The raster is likely '
+    'continuous. Please go back and select the continuous layer mode or '
+    'another band.'
+)  # (limit of unique values)
 continuous_vector_question = tr(
     'You have selected <b>%s %s</b> as a <b>continuous</b> layer and the '
     'attribute is <b>%s</b> with <b>%s</b>. '
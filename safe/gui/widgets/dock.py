@@ -56,6 +56,7 @@ from safe.definitions.reports.components import (
 from safe.report.extractors.util import layer_definition_type
 from safe.report.impact_report import ImpactReport
 from safe.report.report_metadata import ReportMetadata
+from safe.report.report_orchestrator import ReportOrchestrator
 from safe.test.utilities import load_layer
 from safe.utilities.gis import wkt_to_rectangle, qgis_version
 from safe.utilities.i18n import tr
@@ -95,11 +96,11 @@ from safe.gui.widgets.message import (
     ready_message,
     enable_messaging)
 from safe.gui.analysis_utilities import (
-    generate_impact_report,
-    generate_impact_map_report,
+    create_impact_report,
+    create_impact_map_report,
     add_impact_layers_to_canvas,
     add_debug_layers_to_canvas,
-    generate_infographic_report,
+    create_infographic_report,
     add_layer_to_canvas,
     remove_layer_from_canvas)
 
@@ -1220,32 +1221,14 @@ class Dock(QtGui.QDockWidget, FORM_CLASS):
             legend.setLayerVisible(qgis_exposure, False)
 
         if setting('generate_report', True, bool):
-            # Generate impact report
-            error_code, message = generate_impact_report(
-                self.impact_function, self.iface)
-
-            if error_code == ImpactReport.REPORT_GENERATION_FAILED:
-                self.hide_busy()
-                LOGGER.info(tr(
-                    'The impact report could not be generated.'))
-                send_error_message(self, message)
-                LOGGER.info(message.to_text())
-                return ANALYSIS_FAILED_BAD_CODE, message
-
-            error_code, message = generate_impact_map_report(
-                self.impact_function, self.iface)
-
-            if error_code == ImpactReport.REPORT_GENERATION_FAILED:
-                self.hide_busy()
-                LOGGER.info(tr(
-                    'The impact report could not be generated.'))
-                send_error_message(self, message)
-                LOGGER.info(message.to_text())
-                return ANALYSIS_FAILED_BAD_CODE, message
+            impact_reports = [
+                create_impact_report(self.impact_function, self.iface),
+                create_impact_map_report(self.impact_function, self.iface)]
 
             # generate infographic if exposure is population
             exposure_type = layer_definition_type(
                 self.impact_function.exposure)
+            map_overview_layer = None
             if exposure_type == exposure_population:
                 map_overview_layer, _ = load_layer(map_overview['path'])
                 add_layer_to_canvas(
@@ -1253,13 +1236,26 @@ class Dock(QtGui.QDockWidget, FORM_CLASS):
                     map_overview['id'],
                     self.impact_function
                 )
+                impact_reports.append(create_infographic_report(
+                    self.impact_function, self.iface))
 
-                error_code, message = generate_infographic_report(
-                    self.impact_function, self.iface)
+            # Reports are generated concurrently, they only read the layers.
+            orchestrator = ReportOrchestrator(
+                [report for report in impact_reports if report])
+            results = orchestrator.process()
 
+            if map_overview_layer:
                 remove_layer_from_canvas(
                     map_overview_layer, self.impact_function)
 
+            for report_key, timings in orchestrator.timings.items():
+                for component_key, duration in timings.items():
+                    LOGGER.info('%s %s: %.2f s' % (
+                        report_key, component_key, duration))
+            LOGGER.info(
+                'Reports generated in %.2f s.' % orchestrator.duration)
+
+            for error_code, message in results:
                 if error_code == ImpactReport.REPORT_GENERATION_FAILED:
                     self.hide_busy()
                     LOGGER.info(tr(
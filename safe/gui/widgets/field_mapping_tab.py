@@ -38,6 +38,7 @@ from safe.common.exceptions import KeywordNotFoundError
 from parameters.parameter_exceptions import (
     InvalidValidationException as OriginalValidationException)
 
+from safe.gis.vector.statistics import field_statistics
 from safe.utilities.i18n import tr
 from safe.common.parameters.group_select_parameter import (
     GroupSelectParameter)
@@ -348,7 +349,7 @@ class FieldMappingTab(QWidget, object):
         field = self.layer.fields().field(field_name)
 
         index = self.layer.fieldNameIndex(field_name)
-        unique_values = self.layer.uniqueValues(index)
+        unique_values = field_statistics(self.layer, index)['unique_values']
         pretty_unique_values = ', '.join([str(v) for v in unique_values[:10]])
 
         footer_text = tr('Field type: {0}\n').format(field.typeName())
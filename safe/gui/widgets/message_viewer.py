@@ -36,6 +36,8 @@ DYNAMIC_MESSAGE_SIGNAL = 'ImpactFunctionMessage'
 STATIC_MESSAGE_SIGNAL = 'ApplicationMessage'
 HTML_FILE_MODE = 1
 HTML_STR_MODE = 2
+# Minimum time in seconds between two updates of the page.
+RENDERING_INTERVAL = 0.25
 LOGGER = logging.getLogger('InaSAFE')
 
 
@@ -70,6 +72,19 @@ class MessageViewer(QtWebKit.QWebView):
         self.dynamic_messages_log = []
         # self.show()
 
+        # HTML of dynamic messages, rendered only once per message.
+        self._html_cache = {}
+        # Dynamic messages which are not displayed yet.
+        self._pending_messages = []
+        # If the page has been generated by show_messages, so we can append
+        # dynamic messages at the end of the body.
+        self._page_appendable = False
+        self._last_rendering = 0
+        self._rendering_timer = QtCore.QTimer(self)
+        self._rendering_timer.setSingleShot(True)
+        # noinspection PyUnresolvedReferences
+        self._rendering_timer.timeout.connect(self.render_pending_messages)
+
         self.action_show_log = QtGui.QAction(self.tr('Show log'), None)
         self.action_show_log.setEnabled(False)
         # noinspection PyUnresolvedReferences
@@ -195,6 +210,8 @@ class MessageViewer(QtWebKit.QWebView):
         # LOGGER.debug('Static message event %i' % self.static_message_count)
         _ = sender  # we arent using it
         self.dynamic_messages = []
+        self._html_cache = {}
+        self.last_id = 0
         self.static_message = message
         self.show_messages()
 
@@ -228,23 +245,66 @@ class MessageViewer(QtWebKit.QWebView):
         _ = sender  # we arent using it
         self.dynamic_messages.append(message)
         self.dynamic_messages_log.append(message)
-        # Old way (works but causes full page refresh)
-        self.show_messages()
-        return
-
-        # New way add html snippet to end of page, not currently working
-        # self.last_id += 1
-        # message.element_id = str(self.last_id)
-        # # TODO probably we should do some escaping of quotes etc in message
-        # html = message.to_html(in_div_flag=True)
-        # html = html.replace('\'', '\\\'')
-        # # We could run into side effect still if messages contain single
-        # # quotes
-        # LOGGER.debug('HTML: %s' % html)
-        # js = 'document.body.innerHTML += \'%s\'' % html
-        # LOGGER.debug('JAVASCRIPT: %s' % js)
-        # self.page().mainFrame().evaluateJavaScript(js)
-        # self.scrollToDiv()
+        self._pending_messages.append(message)
+
+        # Messages are appended to the page, at most every RENDERING_INTERVAL.
+        elapsed = time.time() - self._last_rendering
+        if elapsed >= RENDERING_INTERVAL:
+            self.render_pending_messages()
+        elif not self._rendering_timer.isActive():
+            self._rendering_timer.start(
+                int((RENDERING_INTERVAL - elapsed) * 1000))
+
+    def render_pending_messages(self):
+        """Append dynamic messages which are not displayed yet to the page.
+
+        The page is fully reloaded only if it was not generated from messages,
+        like a report or a log.
+        """
+        self._rendering_timer.stop()
+        if not self._pending_messages:
+            return
+
+        frame = self.page().mainFrame()
+        body = frame.findFirstElement('body')
+        if (not self._page_appendable or not self._html_loaded_flag or
+                body.isNull()):
+            self.show_messages()
+            return
+
+        html = ''
+        for message in self._pending_messages:
+            message_html = self.message_html(message)
+            if message_html is not None:
+                html += message_html
+        self._pending_messages = []
+        self._last_rendering = time.time()
+
+        body.appendInside(html)
+        frame.setScrollBarValue(
+            QtCore.Qt.Vertical, frame.scrollBarMaximum(QtCore.Qt.Vertical))
+        # noinspection PyArgumentList
+        QtCore.QCoreApplication.processEvents()
+
+    def message_html(self, message):
+        """Get the HTML of a dynamic message, generated only once.
+
+        :param message: A dynamic message.
+        :type message: safe.messaging.Message
+
+        :returns: The HTML in a div.
+        :rtype: str
+        """
+        # We keep the message in the cache so its id can't be reused.
+        cached = self._html_cache.get(id(message))
+        if cached is None:
+            # Keep track of the last ID we had so we can scroll to it
+            if message.element_id is None:
+                self.last_id += 1
+                message.element_id = str(self.last_id)
+            cached = message, message.to_html(in_div_flag=True)
+            self._html_cache[id(message)] = cached
+        return cached[1]
 
     def clear_dynamic_messages_log(self):
         """Clear dynamic message log."""
@@ -252,20 +312,21 @@ class MessageViewer(QtWebKit.QWebView):
 
     def show_messages(self):
         """Show all messages."""
+        self._rendering_timer.stop()
+        self._pending_messages = []
+        self._last_rendering = time.time()
+        # Raw HTML can't be completed with dynamic messages.
+        self._page_appendable = not isinstance(
+            self.static_message, basestring)
+
         if isinstance(self.static_message, MessageElement):
             # Handle sent Message instance
             string = html_header()
             if self.static_message is not None:
                 string += self.static_message.to_html()
 
-            # Keep track of the last ID we had so we can scroll to it
-            self.last_id = 0
             for message in self.dynamic_messages:
-                if message.element_id is None:
-                    self.last_id += 1
-                    message.element_id = str(self.last_id)
-
-                html = message.to_html(in_div_flag=True)
+                html = self.message_html(message)
                 if html is not None:
                     string += html
 
@@ -279,14 +340,8 @@ class MessageViewer(QtWebKit.QWebView):
             # Handle sent Message instance
             string = html_header()
 
-            # Keep track of the last ID we had so we can scroll to it
-            self.last_id = 0
             for message in self.dynamic_messages:
-                if message.element_id is None:
-                    self.last_id += 1
-                    message.element_id = str(self.last_id)
-
-                html = message.to_html(in_div_flag=True)
+                html = self.message_html(message)
                 if html is not None:
                     string += html
 
@@ -320,6 +375,7 @@ class MessageViewer(QtWebKit.QWebView):
 
     def save_report_to_html(self):
         """Save report in the dock to html."""
+        self.render_pending_messages()
         html = self.page().mainFrame().toHtml()
         if self.report_path is not None:
             html_to_file(html, self.report_path)
@@ -358,6 +414,7 @@ class MessageViewer(QtWebKit.QWebView):
 
     def open_current_in_browser(self):
         """Open current selected impact report in browser."""
+        self.render_pending_messages()
         if self.impact_path is None:
             html = self.page().mainFrame().toHtml()
             html_to_file(html, open_browser=True)
@@ -370,6 +427,7 @@ class MessageViewer(QtWebKit.QWebView):
 
     def generate_pdf(self):
         """Generate a PDF from the displayed content."""
+        self.render_pending_messages()
         printer = QtGui.QPrinter(QtGui.QPrinter.HighResolution)
         printer.setPageSize(QtGui.QPrinter.A4)
         printer.setColorMode(QtGui.QPrinter.Color)
@@ -387,6 +445,7 @@ class MessageViewer(QtWebKit.QWebView):
         :param file_path: The path of the html file
         :type file_path: str
         """
+        self._page_appendable = False
         self.load_html(HTML_FILE_MODE, file_path)
 
     def load_html(self, mode, html):
@@ -61,6 +61,19 @@ class MessageViewerTest(unittest.TestCase):
         text = self.message_viewer.page_to_text()
         self.assertEqual(text, 'Hi\n')
 
+    def test_dynamic_messages_rendering(self):
+        """Test dynamic messages are appended to the page in one update."""
+        self.message_viewer.static_message_event(None, m.Message('Hi'))
+        for i in range(10):
+            self.message_viewer.dynamic_message_event(
+                None, m.Message('Message %s' % i))
+        self.message_viewer.render_pending_messages()
+
+        text = self.message_viewer.page().mainFrame().toPlainText()
+        self.assertIn('Hi', text)
+        for i in range(10):
+            self.assertIn('Message %s' % i, text)
+
     def test_static_message(self):
         """Test we can send static messages to the message viewer."""
         self.message_viewer.static_message_event(None, m.Message('Hi'))
@@ -0,0 +1,247 @@
+# coding=utf-8
+
+"""Cache of prepared aggregation layers, reused between analyses.
+
+Preparing an aggregation layer (cleaning geometries, renaming fields and
+reprojecting to the exposure CRS) can take minutes with a big boundary layer
+which is the same for every analysis. The prepared layer is saved in a
+GeoPackage, with its keywords next to it, in a persistent directory. The key
+is computed from the source, the modification time of the file, the
+keywords, the selected features, the target CRS and the InaSAFE version.
+
+The cached GeoPackage is never given to the analysis directly, because the
+analysis can edit the aggregation layer. It's only read to create a working
+copy in memory, without the FID field of the GeoPackage, like the layer from
+create_valid_aggregation. No file is created outside of the cache.
+
+The size of the cache is limited by the aggregationCacheSize setting. When a
+layer is saved, the layers which have not been used for the longest time are
+removed until the cache fits.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from glob import glob
+from os.path import exists, getmtime, getsize, join, splitext
+
+from qgis.core import (
+    QgsFeature, QgsGeometry, QgsVectorLayer, QgsVectorFileWriter)
+
+from safe.common.version import get_version
+from safe.gis.vector.feature_writer import FeatureWriter, scratch_fid
+from safe.gis.vector.tools import create_memory_layer
+from safe.utilities.keyword_io import KeywordIO
+from safe.utilities.settings import setting
+from safe.utilities.utilities import monkey_patch_keywords
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# The FID of a GeoPackage written by QgsVectorFileWriter, its first field.
+geopackage_fid = 'fid'
+
+
+def aggregation_cache_directory():
+    """The directory where prepared aggregation layers are stored.
+
+    :return: The path to the directory, created if needed.
+    :rtype: str
+    """
+    path = setting('aggregationCachePath', expected_type=str)
+    if not exists(path):
+        os.makedirs(path)
+    return path
+
+
+def aggregation_cache_key(layer, crs, use_selected_features_only=False):
+    """Compute the key of an aggregation layer in the cache.
+
+    Only file based layers can be cached, because we can't know if a layer in
+    a database or in memory has been modified.
+
+    :param layer: The aggregation layer, before any preparation.
+    :type layer: QgsVectorLayer
+
+    :param crs: The CRS the aggregation layer will be reprojected to.
+    :type crs: QgsCoordinateReferenceSystem
+
+    :param use_selected_features_only: If only selected features are used.
+    :type use_selected_features_only: bool
+
+    :return: The key or None if the layer can't be cached.
+    :rtype: str
+    """
+    if not setting('useAggregationCache', expected_type=bool):
+        return None
+
+    if layer.providerType() != 'ogr':
+        return None
+
+    path = layer.source().split('|')[0]
+    if not os.path.isfile(path):
+        return None
+
+    selection = None
+    if use_selected_features_only and layer.selectedFeatureCount() > 0:
+        selection = sorted(layer.selectedFeaturesIds())
+
+    key = json.dumps([
+        get_version(),
+        layer.source(),
+        os.path.getmtime(path),
+        layer.keywords,
+        selection,
+        # The authid is empty or a user ID for a custom CRS.
+        crs.toWkt(),
+    ], sort_keys=True, default=repr)
+    return hashlib.md5(key).hexdigest()
+
+
+def cached_aggregation(key):
+    """Get a copy in memory of a prepared aggregation layer from the cache.
+
+    :param key: The key from aggregation_cache_key.
+    :type key: str
+
+    :return: The prepared aggregation layer, with keywords, or None if the
+        layer is not in the cache.
+    :rtype: QgsVectorLayer
+    """
+    if not key:
+        return None
+
+    cached_path = join(aggregation_cache_directory(), key + '.gpkg')
+    cached_keywords = splitext(cached_path)[0] + '.xml'
+    if not exists(cached_path) or not exists(cached_keywords):
+        return None
+
+    # The modification time is the last time the layer was used.
+    os.utime(cached_path, None)
+
+    cached_layer = QgsVectorLayer(cached_path, 'aggregation', 'ogr')
+    if not cached_layer.isValid():
+        LOGGER.info('Invalid aggregation layer in the cache : %s' % key)
+        return None
+    monkey_patch_keywords(cached_layer)
+
+    # The FID of the GeoPackage and of the scratch layer it was written from,
+    # if any, are not fields of the aggregation layer.
+    fields = cached_layer.fields().toList()
+    indexes = [
+        index for index, field in enumerate(fields)
+        if field.name() != scratch_fid and not (
+            index == 0 and field.name() == geopackage_fid)]
+
+    layer = create_memory_layer(
+        'aggregation',
+        cached_layer.geometryType(),
+        cached_layer.crs(),
+        [fields[index] for index in indexes])
+    layer.keywords = cached_layer.keywords
+
+    out_feature = QgsFeature()
+    writer = FeatureWriter(layer)
+    for feature in cached_layer.getFeatures():
+        attributes = feature.attributes()
+        out_feature.setGeometry(QgsGeometry(feature.geometry()))
+        out_feature.setAttributes([attributes[index] for index in indexes])
+        writer.addFeature(out_feature)
+    writer.close()
+
+    LOGGER.info('Aggregation layer from the cache : %s' % cached_path)
+    return layer
+
+
+def cache_aggregation(key, layer):
+    """Save a prepared aggregation layer in the cache.
+
+    :param key: The key from aggregation_cache_key.
+    :type key: str
+
+    :param layer: The prepared aggregation layer.
+    :type layer: QgsVectorLayer
+
+    :return: True if the layer has been saved.
+    :rtype: bool
+    """
+    if not key:
+        return False
+
+    path = join(aggregation_cache_directory(), key + '.gpkg')
+    if exists(path):
+        os.remove(path)
+
+    # The GeoPackage driver is creating a spatial index by default.
+    error = QgsVectorFileWriter.writeAsVectorFormat(
+        layer, path, 'utf-8', layer.crs(), 'GPKG')
+    if error != QgsVectorFileWriter.NoError or not exists(path):
+        LOGGER.info('The aggregation layer can not be cached : %s' % key)
+        return False
+
+    cached_layer = QgsVectorLayer(path, 'aggregation', 'ogr')
+    KeywordIO().write_keywords(cached_layer, layer.keywords)
+
+    prune_aggregation_cache(keep=key)
+    return True
+
+
+def prune_aggregation_cache(keep=None, size=None):
+    """Remove the least recently used layers until the cache fits.
+
+    .. versionadded:: 4.2
+
+    :param keep: The key of a layer which must not be removed, even if it
+        doesn't fit alone.
+    :type keep: str
+
+    :param size: The maximum size of the cache in MB. Default to the
+        aggregationCacheSize setting.
+    :type size: int
+
+    :return: The keys of the removed layers.
+    :rtype: list
+    """
+    if size is None:
+        size = setting('aggregationCacheSize', expected_type=int)
+    maximum_size = size * 1024 * 1024
+
+    layers = []
+    total_size = 0
+    for path in glob(join(aggregation_cache_directory(), '*.gpkg')):
+        base_path = splitext(path)[0]
+        # The GeoPackage, its keywords and the SQLite journal if any.
+        files = glob(base_path + '.*')
+        layer_size = sum(getsize(f) for f in files)
+        total_size += layer_size
+        layers.append((getmtime(path), layer_size, base_path, files))
+
+    removed = []
+    for _, layer_size, base_path, files in sorted(layers):
+        if total_size <= maximum_size:
+            break
+        key = os.path.basename(base_path)
+        if key == keep:
+            continue
+        for f in files:
+            os.remove(f)
+        total_size -= layer_size
+        removed.append(key)
+
+    if removed:
+        LOGGER.info(
+            '%s layers removed from the aggregation cache.' % len(removed))
+    return removed
+
+
+def clear_aggregation_cache():
+    """Remove every prepared aggregation layer from the cache."""
+    path = aggregation_cache_directory()
+    shutil.rmtree(path)
+    os.makedirs(path)
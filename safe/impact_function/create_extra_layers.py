@@ -26,6 +26,7 @@ from safe.definitions.layer_purposes import (
     layer_purpose_aggregation,
     layer_purpose_analysis_impacted,
 )
+from safe.gis.vector.feature_writer import layer_attributes
 from safe.gis.vector.tools import (
     create_memory_layer, create_field_from_definition, copy_layer)
 from safe.utilities.gis import qgis_version
@@ -65,7 +66,8 @@ def create_virtual_aggregation(geometry, crs):
 
     feature = QgsFeature()
     feature.setGeometry(geometry)
-    feature.setAttributes([1, tr('Entire Area')])
+    feature.setAttributes(
+        layer_attributes(aggregation_layer, [1, tr('Entire Area')]))
     aggregation_layer.addFeature(feature)
     aggregation_layer.commitChanges()
 
@@ -113,7 +115,7 @@ def create_analysis_layer(analysis_extent, crs, name):
     feature = QgsFeature()
     # noinspection PyCallByClass,PyArgumentList,PyTypeChecker
     feature.setGeometry(analysis_extent)
-    feature.setAttributes([1, name])
+    feature.setAttributes(layer_attributes(analysis_layer, [1, name]))
     analysis_layer.addFeature(feature)
     analysis_layer.commitChanges()
 
@@ -176,9 +178,10 @@ def create_profile_layer(profiling):
         time = items[1].replace('-', '')
         if setting(key='memory_profile', expected_type=bool):
             memory = items[2].replace('-', '')
-            feature.setAttributes([items[0], time, memory])
+            attributes = [items[0], time, memory]
         else:
-            feature.setAttributes([items[0], time])
+            attributes = [items[0], time]
+        feature.setAttributes(layer_attributes(tabular, attributes))
         tabular.addFeature(feature)
 
     tabular.commitChanges()
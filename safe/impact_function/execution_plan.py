@@ -0,0 +1,215 @@
+# coding=utf-8
+
+"""Plan how each step of an analysis is executed, from the memory needed.
+
+check_memory_usage only estimates the memory of a raster from an extent and a
+cell size. The execution plan estimates the peak memory of each step of the
+impact function from the input layers (number of features, vertices and
+attributes, raster dimensions) and compares it with the free memory:
+
+* memory: the default, intermediate layers are memory layers.
+* batched: features are written to intermediate layers in smaller batches,
+  so fewer features are waiting to be written.
+* disk: intermediate layers are GeoPackages in a scratch directory, so
+  features are not kept in memory.
+
+The strategy applies to the thread running the step only, see write_options.
+
+The plan is recorded in the provenance of the analysis.
+"""
+
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from safe.common.utilities import get_free_memory, temp_dir
+from safe.gis.vector.feature_writer import write_options
+from safe.utilities.gis import is_raster_layer, is_vector_layer
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+memory_strategy = 'memory'
+batched_strategy = 'batched'
+disk_strategy = 'disk'
+
+# Number of copies of a layer kept in memory by a step: the input, the
+# reprojected or cleaned layer and the output.
+working_copies = 3
+
+# Part of the free memory a step can use before it's batched, then before
+# it's run on disk.
+batched_ratio = 0.25
+disk_ratio = 0.5
+
+# Batch size and memory limit of the feature writer, when a step is batched
+# or run on disk.
+small_batch_size = 100
+small_memory_limit = 8 * 1024 * 1024
+
+# Bytes used by a feature, without its geometry and its attributes.
+feature_overhead = 256
+
+# Number of features read to estimate the number of vertices of a layer.
+vertex_sample = 100
+
+
+def layer_memory(layer):
+    """Estimate the memory in bytes used by a layer loaded in memory.
+
+    :param layer: The layer, vector or raster.
+    :type layer: QgsMapLayer
+
+    :return: The estimated memory in bytes, 0 if there is no layer.
+    :rtype: int
+    """
+    if is_raster_layer(layer):
+        # Numpy uses 8 bytes by cell.
+        return layer.width() * layer.height() * 8 * layer.bandCount()
+
+    if is_vector_layer(layer):
+        vertices = 0
+        sampled = 0
+        for feature in layer.getFeatures():
+            if sampled == vertex_sample:
+                break
+            geometry = feature.geometry()
+            if geometry and geometry.geometry():
+                vertices += geometry.geometry().nCoordinates()
+            sampled += 1
+        average_vertices = float(vertices) / sampled if sampled else 0
+        feature_size = (
+            feature_overhead
+            + len(layer.fields()) * 16
+            + average_vertices * 16)
+        return int(layer.featureCount() * feature_size)
+
+    return 0
+
+
+class ExecutionPlan(object):
+
+    """Strategy of each step of an impact function.
+
+    .. versionadded:: 4.2
+    """
+
+    def __init__(self, impact_function, free_memory=None):
+        """Constructor.
+
+        :param impact_function: The impact function, prepared.
+        :type impact_function: ImpactFunction
+
+        :param free_memory: The free memory in MB. If not set, the free memory
+            of the machine is used.
+        :type free_memory: int
+        """
+        if free_memory is None:
+            try:
+                free_memory = get_free_memory()
+            except (OSError, ValueError, IndexError):
+                LOGGER.exception('Could not determine free memory')
+        self.free_memory = free_memory
+
+        hazard = layer_memory(impact_function.hazard)
+        exposure = layer_memory(impact_function.exposure)
+        aggregation = layer_memory(impact_function.aggregation)
+
+        # Step key from safe.definitions.analysis_steps -> estimated bytes.
+        self.estimates = OrderedDict([
+            ('aggregation_preparation', aggregation * working_copies),
+            ('hazard_preparation', hazard * working_copies),
+            ('aggregate_hazard_preparation',
+             (hazard + aggregation) * working_copies),
+            ('exposure_preparation', exposure * working_copies),
+            ('combine_hazard_exposure',
+             (hazard + aggregation + exposure) * working_copies),
+            ('post_processing', exposure * working_copies),
+            ('summary_calculation', hazard + aggregation + exposure),
+        ])
+
+        self.strategies = OrderedDict(
+            (key, self._strategy(estimate))
+            for key, estimate in self.estimates.items())
+        self._scratch_directory = None
+
+    @property
+    def peak_memory(self):
+        """The estimated peak memory of the analysis in bytes.
+
+        :rtype: int
+        """
+        return max(self.estimates.values())
+
+    def _strategy(self, estimate):
+        """Choose the strategy for a step.
+
+        :param estimate: The estimated memory of the step in bytes.
+        :type estimate: int
+
+        :return: The strategy.
+        :rtype: str
+        """
+        if not self.free_memory:
+            # We can't know, we keep the fast path.
+            return memory_strategy
+        usage = float(estimate) / (self.free_memory * 1024 * 1024)
+        if usage < batched_ratio:
+            return memory_strategy
+        elif usage < disk_ratio:
+            return batched_strategy
+        else:
+            return disk_strategy
+
+    def strategy(self, key):
+        """The strategy of a step.
+
+        :param key: The key of the step in analysis_steps.
+        :type key: str
+
+        :return: The strategy, memory if the step is not planned.
+        :rtype: str
+        """
+        return self.strategies.get(key, memory_strategy)
+
+    @contextmanager
+    def step(self, key):
+        """Run a step with its strategy, in the current thread.
+
+            with plan.step('hazard_preparation'):
+                impact_function.hazard_preparation()
+
+        :param key: The key of the step in analysis_steps.
+        :type key: str
+        """
+        strategy = self.strategy(key)
+        options = {}
+        if strategy != memory_strategy:
+            LOGGER.info('Step %s : %s strategy' % (key, strategy))
+            options['batch_size'] = small_batch_size
+            options['memory_limit'] = small_memory_limit
+        if strategy == disk_strategy:
+            if not self._scratch_directory:
+                self._scratch_directory = temp_dir(sub_dir='scratch')
+            options['scratch_directory'] = self._scratch_directory
+        with write_options(**options):
+            yield strategy
+
+    def to_dict(self):
+        """The plan, to be stored in the provenance.
+
+        :rtype: dict
+        """
+        return {
+            'free_memory': self.free_memory,
+            'peak_memory': self.peak_memory,
+            'steps': dict(
+                (key, {
+                    'estimate': self.estimates[key],
+                    'strategy': self.strategies[key]
+                }) for key in self.estimates),
+        }
@@ -26,10 +26,13 @@ import logging
 
 from safe.common.utilities import temp_dir
 from safe.common.version import get_version
+from safe.datastore.background_writer import BackgroundWriter
 from safe.datastore.folder import Folder
 from safe.datastore.datastore import DataStore
 from safe.gis.sanity_check import check_inasafe_fields, check_layer
-from safe.gis.vector.tools import remove_fields
+from safe.gis.vector.tools import (
+    deserialize_layer, remove_fields, serialize_layer)
+from safe.gis.vector.feature_frame import FeatureFrame
 from safe.gis.vector.from_counts_to_ratios import from_counts_to_ratios
 from safe.gis.vector.prepare_vector_layer import prepare_vector_layer
 from safe.gis.vector.clean_geometry import clean_layer
@@ -53,6 +56,7 @@ from safe.gis.raster.clip_bounding_box import clip_by_extent
 from safe.gis.raster.reclassify import reclassify as reclassify_raster
 from safe.gis.raster.polygonize import polygonize
 from safe.gis.raster.zonal_statistics import zonal_stats
+from safe.gis.raster.cross_tabulation import cross_tabulate
 from safe.definitions.analysis_steps import analysis_steps
 from safe.definitions.utilities import (
     definition,
@@ -92,6 +96,7 @@ from safe.definitions.provenance import (
     provenance_data_store_uri,
     provenance_duration,
     provenance_end_datetime,
+    provenance_execution_plan,
     provenance_exposure_keywords,
     provenance_exposure_layer,
     provenance_exposure_layer_id,
@@ -112,6 +117,7 @@ from safe.definitions.provenance import (
     provenance_qt_version,
     provenance_requested_extent,
     provenance_start_datetime,
+    provenance_step_schedule,
     provenance_user,
     provenance_layer_exposure_summary,
     provenance_layer_aggregate_hazard_impacted,
@@ -155,6 +161,13 @@ from safe.common.exceptions import (
 from safe.definitions.earthquake import EARTHQUAKE_FUNCTIONS
 from safe.impact_function.postprocessors import (
     run_single_post_processor, enough_input)
+from safe.impact_function.aggregation_cache import (
+    aggregation_cache_key,
+    cache_aggregation,
+    cached_aggregation,
+)
+from safe.impact_function.execution_plan import ExecutionPlan
+from safe.impact_function.step_scheduler import StepScheduler
 from safe.impact_function.create_extra_layers import (
     create_analysis_layer,
     create_virtual_aggregation,
@@ -173,7 +186,10 @@ from safe.utilities.default_values import get_inasafe_default_value_qsetting
 from safe.utilities.unicode import get_unicode
 from safe.utilities.keyword_io import KeywordIO
 from safe.utilities.metadata import (
-    active_thresholds_value_maps, copy_layer_keywords, write_iso19115_metadata)
+    active_classification,
+    active_thresholds_value_maps,
+    copy_layer_keywords,
+    write_iso19115_metadata_batch)
 from safe.utilities.utilities import (
     replace_accentuated_characters,
     get_error_message,
@@ -182,6 +198,7 @@ from safe.utilities.utilities import (
 from safe.utilities.profiling import (
     profile, clear_prof_data, profiling_log)
 from safe.utilities.gis import qgis_version
+from safe.utilities.scratch import check_scratch_quota, scratch_workspace
 from safe.utilities.settings import setting
 from safe import messaging as m
 from safe.messaging import styles
@@ -213,6 +230,11 @@ class ImpactFunction(object):
         # features only ?
         self.use_selected_features_only = False
 
+        # Key of the aggregation layer in the cache of prepared layers and
+        # if the aggregation layer is coming from this cache.
+        self._aggregation_cache_key = None
+        self._aggregation_from_cache = False
+
         # Output layers
         self._exposure_summary = None
         self._aggregate_hazard_impacted = None
@@ -223,6 +245,8 @@ class ImpactFunction(object):
 
         # Use debug to store intermediate results
         self.debug_mode = False
+        # Writer of intermediate results while the analysis is running.
+        self._debug_writer = None
 
         # Requested extent to use
         self._requested_extent = None
@@ -231,6 +255,16 @@ class ImpactFunction(object):
         # Use exposure view only
         self.use_exposure_view_only = False
 
+        # If the hazard is a raster and the exposure a continuous raster, do
+        # we cross tabulate rasters instead of polygonizing the hazard ?
+        self.use_raster_on_raster = setting(
+            key='raster_on_raster_analysis', expected_type=bool)
+        self._raster_on_raster = False
+
+        # Strategy of each step according to the memory needed. It can be set
+        # after prepare, otherwise it is planned from the input layers.
+        self._execution_plan = None
+
         # The current extent defined by the impact function. Read-only.
         # The CRS is the exposure CRS.
         self._analysis_extent = None
@@ -398,6 +432,26 @@ class ImpactFunction(object):
         self._aggregation = layer
         self._is_ready = False
 
+    @property
+    def execution_plan(self):
+        """Property for the execution plan of the analysis.
+
+        :returns: The execution plan, None if it is not planned yet.
+        :rtype: ExecutionPlan
+        """
+        return self._execution_plan
+
+    @execution_plan.setter
+    def execution_plan(self, plan):
+        """Setter for the execution plan, to force a strategy.
+
+        It must be set after calling prepare.
+
+        :param plan: The execution plan to use for the analysis.
+        :type plan: ExecutionPlan
+        """
+        self._execution_plan = plan
+
     @property
     def is_ready(self):
         """Property to know if the impact function is ready.
@@ -859,6 +913,7 @@ class ImpactFunction(object):
         :rtype: (int, m.Message)
         """
         self._provenance_ready = False
+        self._execution_plan = None
         # save layer reference before preparing.
         # used to display it in maps
         original_exposure = self.exposure
@@ -1125,10 +1180,21 @@ class ImpactFunction(object):
                 self._analysis_extent = hazard_exposure
 
         else:
-            # We monkey patch if we use selected features only.
-            self.aggregation.use_selected_features_only = (
+            self._aggregation_cache_key = aggregation_cache_key(
+                self.aggregation,
+                self.exposure.crs(),
                 self.use_selected_features_only)
-            self.aggregation = create_valid_aggregation(self.aggregation)
+            cached_layer = cached_aggregation(self._aggregation_cache_key)
+            if cached_layer:
+                # The layer is already valid, cleaned and reprojected.
+                self.aggregation = cached_layer
+                self._aggregation_from_cache = True
+            else:
+                # We monkey patch if we use selected features only.
+                self.aggregation.use_selected_features_only = (
+                    self.use_selected_features_only)
+                self.aggregation = create_valid_aggregation(self.aggregation)
+                self._aggregation_from_cache = False
             list_geometry = []
             for area in self.aggregation.getFeatures():
                 list_geometry.append(QgsGeometry(area.geometry()))
@@ -1170,8 +1236,9 @@ class ImpactFunction(object):
     def debug_layer(self, layer, check_fields=True, add_to_datastore=None):
         """Write the layer produced to the datastore if debug mode is on.
 
-        :param layer: The QGIS layer to check and save.
-        :type layer: QgsMapLayer
+        :param layer: The QGIS layer to check and save. A feature frame is
+            written to its layer only if it's saved.
+        :type layer: QgsMapLayer, FeatureFrame
 
         :param check_fields: Boolean to check or not inasafe_fields.
             By default, it's true.
@@ -1182,14 +1249,19 @@ class ImpactFunction(object):
             we usually let debug mode choose for us.
         :param add_to_datastore: bool
 
-        :return: The name of the layer added in the datastore.
+        :return: The name of the layer added in the datastore, None if it's
+            written in the background while the analysis is running.
         :rtype: basestring
         """
-        # This one checks the memory layer.
-        check_layer(layer, has_geometry=None)
+        if isinstance(layer, FeatureFrame):
+            if check_fields:
+                check_inasafe_fields(layer)
+        else:
+            # This one checks the memory layer.
+            check_layer(layer, has_geometry=None)
 
-        if isinstance(layer, QgsVectorLayer) and check_fields:
-            check_inasafe_fields(layer)
+            if isinstance(layer, QgsVectorLayer) and check_fields:
+                check_inasafe_fields(layer)
 
         # Be careful, add_to_datastore can be None, True or False.
         # None means we let debug_mode to choose for us.
@@ -1204,6 +1276,12 @@ class ImpactFunction(object):
             save_layer = False
 
         if save_layer:
+            if isinstance(layer, FeatureFrame):
+                layer = layer.to_layer()
+            if self._debug_writer:
+                self._debug_writer.add_layer(layer, layer.keywords['title'])
+                return None
+
             result, name = self.datastore.add_layer(
                 layer, layer.keywords['title'])
             if not result:
@@ -1383,56 +1461,28 @@ class ImpactFunction(object):
             if self.aggregation:
                 self.datastore.add_layer(self.aggregation, 'aggregation')
 
-        self._performance_log = profiling_log()
-        self.callback(2, step_count, analysis_steps['aggregation_preparation'])
-        self.aggregation_preparation()
-
-        # Special case for earthquake hazard on population. We need to remove
-        # the fatality model.
-        earthquake_on_population = False
-        if self.hazard.keywords.get('hazard') == 'earthquake':
-            if self.exposure.keywords.get('exposure') == 'population':
-                earthquake_on_population = True
-        if not earthquake_on_population:
-            self._earthquake_function = None
-
-        LOGGER.info('Starting a GIS overlay analysis')
-        # This is not a EQ raster on raster population. We need to set it to
-        # None as we don't want notes specific to EQ raster on population.
-        self._earthquake_function = None
-        step_count = len(analysis_steps)
-
-        self._performance_log = profiling_log()
-        self.callback(3, step_count, analysis_steps['hazard_preparation'])
-        self.hazard_preparation()
-
-        self._performance_log = profiling_log()
-        self.callback(
-            4, step_count, analysis_steps['aggregate_hazard_preparation'])
-        self.aggregate_hazard_preparation()
-
-        self._performance_log = profiling_log()
-        self.callback(5, step_count, analysis_steps['exposure_preparation'])
-        self.exposure_preparation()
-
-        self._performance_log = profiling_log()
-        self.callback(6, step_count, analysis_steps['combine_hazard_exposure'])
-        self.intersect_exposure_and_aggregate_hazard()
-
-        self._performance_log = profiling_log()
-        self.callback(7, step_count, analysis_steps['post_processing'])
-        if is_vector_layer(self._exposure_summary):
-            # We post process the exposure summary
-            self.post_process(self._exposure_summary)
-        else:
-            # We post process the aggregate hazard.
-            # Raster continuous exposure.
-            self.post_process(self._aggregate_hazard_impacted)
-
-        self._performance_log = profiling_log()
-        self.callback(8, step_count, analysis_steps['summary_calculation'])
-        self.summary_calculation()
-
+        # Intermediate files are written in a scratch workspace, removed at
+        # the end of the analysis, unless the caller manages it.
+        # Intermediate layers are written in the background, we wait for
+        # them before adding the outputs to the datastore.
+        with scratch_workspace(self._unique_name):
+            with BackgroundWriter(
+                    self.datastore, check=self.debug_mode) as writer:
+                self._debug_writer = writer
+                try:
+                    self._run_steps()
+                finally:
+                    self._debug_writer = None
+
+            # Outputs may be layers in the workspace, see the disk strategy
+            # of the execution plan. They are copied before it's removed.
+            self._save_outputs()
+
+    def _save_outputs(self):
+        """Add the outputs to the datastore and write their metadata.
+
+        Memory layers are replaced by the layers from the datastore.
+        """
         self._end_datetime = datetime.now()
         set_provenance(
             self._provenance, provenance_start_datetime, self.start_datetime)
@@ -1570,34 +1620,191 @@ class ImpactFunction(object):
 
         # Update provenance data with output layers URI
         self._provenance.update(output_layer_provenance)
-        if self._exposure_summary:
-            self._exposure_summary.keywords[
-                'provenance_data'] = self.provenance
-            write_iso19115_metadata(
-                self._exposure_summary.publicSource(),
-                self._exposure_summary.keywords)
-        if self._aggregate_hazard_impacted:
-            self._aggregate_hazard_impacted.keywords[
-                'provenance_data'] = self.provenance
-            write_iso19115_metadata(
-                self._aggregate_hazard_impacted.publicSource(),
-                self._aggregate_hazard_impacted.keywords)
-        if self._exposure_summary_table:
-            self._exposure_summary_table.keywords[
-                'provenance_data'] = self.provenance
-            write_iso19115_metadata(
-                self._exposure_summary_table.publicSource(),
-                self._exposure_summary_table.keywords)
 
-        self.aggregation_summary.keywords['provenance_data'] = self.provenance
-        write_iso19115_metadata(
-            self.aggregation_summary.publicSource(),
-            self.aggregation_summary.keywords)
+        output_layers = [
+            self._exposure_summary,
+            self._aggregate_hazard_impacted,
+            self._exposure_summary_table,
+            self.aggregation_summary,
+            self.analysis_impacted,
+        ]
+        metadata_layers = []
+        for layer in output_layers:
+            if layer:
+                layer.keywords['provenance_data'] = self.provenance
+                metadata_layers.append((layer.publicSource(), layer.keywords))
+        write_iso19115_metadata_batch(metadata_layers)
 
-        self.analysis_impacted.keywords['provenance_data'] = self.provenance
-        write_iso19115_metadata(
-            self.analysis_impacted.publicSource(),
-            self.analysis_impacted.keywords)
+    def _run_steps(self):
+        """Run the steps of the analysis, from the aggregation preparation to
+        the summary calculation.
+        """
+        step_count = len(analysis_steps)
+        self._raster_on_raster = (
+            self.use_raster_on_raster
+            and is_raster_layer(self.hazard)
+            and is_raster_layer(self.exposure)
+            and self.exposure.keywords.get('layer_mode') == 'continuous')
+        if self._raster_on_raster:
+            self.set_state_info('impact function', 'raster_on_raster', True)
+
+        if not self._execution_plan:
+            self._execution_plan = ExecutionPlan(self)
+        plan = self._execution_plan
+        LOGGER.info(
+            'Execution plan : about %d MB needed, %s MB available' % (
+                plan.peak_memory / 1024 / 1024, plan.free_memory))
+        set_provenance(
+            self._provenance, provenance_execution_plan, plan.to_dict())
+
+        # Special case for earthquake hazard on population. We need to remove
+        # the fatality model.
+        earthquake_on_population = False
+        if self.hazard.keywords.get('hazard') == 'earthquake':
+            if self.exposure.keywords.get('exposure') == 'population':
+                earthquake_on_population = True
+        if not earthquake_on_population:
+            self._earthquake_function = None
+
+        # This is not a EQ raster on raster population. We need to set it to
+        # None as we don't want notes specific to EQ raster on population.
+        self._earthquake_function = None
+
+        # The hazard and the exposure are prepared independently, the
+        # exposure can be prepared in another process. Intermediate layers
+        # of debug mode are written in order, so everything runs here.
+        processes = setting('stepProcesses', expected_type=int)
+        if self.debug_mode:
+            processes = 1
+        progress = {
+            'aggregation_preparation': 2,
+            'hazard_preparation': 3,
+            'aggregate_hazard_preparation': 4,
+            'exposure_preparation': 5,
+            'combine_hazard_exposure': 6,
+            'post_processing': 7,
+            'summary_calculation': 8,
+        }
+
+        def on_start(key):
+            """Relay the progress when a step starts."""
+            self.callback(progress[key], step_count, analysis_steps[key])
+            if key == 'hazard_preparation':
+                LOGGER.info('Starting a GIS overlay analysis')
+
+        def step(key, function):
+            """Function of a step, run with the execution plan."""
+            def run_step():
+                self._performance_log = profiling_log()
+                with plan.step(key):
+                    function()
+                # The workspaces are scanned once per step, not for each
+                # temporary file.
+                check_scratch_quota()
+            return run_step
+
+        def post_processing():
+            """Post process the exposure summary or the aggregate hazard."""
+            if is_vector_layer(self._exposure_summary):
+                # We post process the exposure summary
+                self.post_process(self._exposure_summary)
+            else:
+                # We post process the aggregate hazard.
+                # Raster continuous exposure.
+                self.post_process(self._aggregate_hazard_impacted)
+
+        scheduler = StepScheduler(processes, on_start=on_start)
+        scheduler.add_step(
+            'aggregation_preparation',
+            step('aggregation_preparation', self.aggregation_preparation))
+        scheduler.add_step(
+            'hazard_preparation',
+            step('hazard_preparation', self.hazard_preparation),
+            requires=['aggregation_preparation'])
+        scheduler.add_step(
+            'aggregate_hazard_preparation',
+            step(
+                'aggregate_hazard_preparation',
+                self.aggregate_hazard_preparation),
+            requires=['hazard_preparation'])
+        if self._exposure_preparation_can_fork():
+            export = self._export_exposure_preparation
+            merge = self._merge_exposure_preparation
+        else:
+            export = merge = None
+        scheduler.add_step(
+            'exposure_preparation',
+            step('exposure_preparation', self.exposure_preparation),
+            requires=['aggregation_preparation'],
+            export=export,
+            merge=merge)
+        scheduler.add_step(
+            'combine_hazard_exposure',
+            step(
+                'combine_hazard_exposure',
+                self.intersect_exposure_and_aggregate_hazard),
+            requires=['aggregate_hazard_preparation', 'exposure_preparation'])
+        scheduler.add_step(
+            'post_processing',
+            step('post_processing', post_processing),
+            requires=['combine_hazard_exposure'])
+        scheduler.add_step(
+            'summary_calculation',
+            step('summary_calculation', self.summary_calculation),
+            requires=['post_processing'])
+        scheduler.run()
+
+        schedule = scheduler.to_dict()
+        LOGGER.info(
+            'Step schedule : %s s with %s processes, critical path %s' % (
+                schedule['duration'],
+                schedule['processes'],
+                ', '.join(schedule['critical_path'])))
+        set_provenance(
+            self._provenance, provenance_step_schedule, schedule)
+
+    def _exposure_preparation_can_fork(self):
+        """Check if the exposure can be prepared in another process.
+
+        The prepared exposure must be a vector layer, so it can be sent back
+        as WKB geometries and attributes.
+
+        :rtype: bool
+        """
+        if is_raster_layer(self.exposure):
+            return self.exposure.keywords.get('layer_mode') != 'continuous'
+        return True
+
+    def _export_exposure_preparation(self):
+        """Results of the exposure preparation, in another process.
+
+        :return: The serialized exposure, the state of the exposure and the
+            profiling of the step.
+        :rtype: dict
+        """
+        profiling = None
+        if profiling_log():
+            steps = [
+                child for child in profiling_log().children
+                if child.key == 'exposure_preparation']
+            if steps:
+                profiling = steps[-1]
+        return {
+            'exposure': serialize_layer(self.exposure),
+            'state': self.state['exposure'],
+            'profiling': profiling,
+        }
+
+    def _merge_exposure_preparation(self, result):
+        """Use the exposure prepared in another process.
+
+        :param result: The results of _export_exposure_preparation.
+        :type result: dict
+        """
+        self.exposure = deserialize_layer(result['exposure'])
+        self.state['exposure'] = result['state']
+        if result['profiling'] and profiling_log():
+            profiling_log().children.append(result['profiling'])
 
     @profile
     def aggregation_preparation(self):
@@ -1681,24 +1888,35 @@ class ImpactFunction(object):
         else:
             self.set_state_info('aggregation', 'provided', True)
 
-            self.set_state_process(
-                'aggregation', 'Cleaning the aggregation layer')
-            self.aggregation = prepare_vector_layer(self.aggregation)
-            self.debug_layer(self.aggregation)
-
-            if self.aggregation.crs().authid() != self.exposure.crs().authid():
+            if self._aggregation_from_cache:
                 self.set_state_process(
                     'aggregation',
-                    'Reproject aggregation layer to exposure CRS')
-                # noinspection PyTypeChecker
-                self.aggregation = reproject(
-                    self.aggregation, self.exposure.crs())
-                self.debug_layer(self.aggregation)
+                    'Use the prepared aggregation layer from the cache')
 
             else:
                 self.set_state_process(
-                    'aggregation',
-                    'Aggregation layer already in exposure CRS')
+                    'aggregation', 'Cleaning the aggregation layer')
+                self.aggregation = prepare_vector_layer(self.aggregation)
+                self.debug_layer(self.aggregation)
+
+                exposure_crs = self.exposure.crs().authid()
+                if self.aggregation.crs().authid() != exposure_crs:
+                    self.set_state_process(
+                        'aggregation',
+                        'Reproject aggregation layer to exposure CRS')
+                    # noinspection PyTypeChecker
+                    self.aggregation = reproject(
+                        self.aggregation, self.exposure.crs())
+                    self.debug_layer(self.aggregation)
+
+                else:
+                    self.set_state_process(
+                        'aggregation',
+                        'Aggregation layer already in exposure CRS')
+
+                # Before any change related to the exposure.
+                cache_aggregation(
+                    self._aggregation_cache_key, self.aggregation)
 
             # We need to check if we can add default ratios to the exposure
             # by looking also in the aggregation layer.
@@ -1862,6 +2080,21 @@ class ImpactFunction(object):
                     self.hazard, self.exposure.keywords['exposure'])
                 self.debug_layer(self.hazard)
 
+            if self._raster_on_raster:
+                # The hazard stays a raster. It will be cross tabulated with
+                # the exposure and the aggregation later. Keywords from the
+                # wizard only have the value maps of every exposure, the
+                # active one is needed with the classification.
+                exposure_key = self.exposure.keywords['exposure']
+                if 'classification' not in self.hazard.keywords:
+                    self.hazard.keywords['value_map'] = (
+                        active_thresholds_value_maps(
+                            self.hazard.keywords, exposure_key))
+                    self.hazard.keywords['classification'] = (
+                        active_classification(
+                            self.hazard.keywords, exposure_key))
+                return
+
             self.set_state_process(
                 'hazard', 'Polygonize classified raster hazard')
             # noinspection PyTypeChecker
@@ -1915,6 +2148,12 @@ class ImpactFunction(object):
         aggregation areas and assign hazard class.
         """
         LOGGER.info('ANALYSIS : Aggregate hazard preparation')
+        if self._raster_on_raster:
+            LOGGER.info(
+                'The hazard has not been polygonized. The aggregate hazard '
+                'will be computed with the exposure.')
+            return
+
         self.set_state_process('hazard', 'Make hazard layer valid')
         self.hazard = clean_layer(self.hazard)
         self.debug_layer(self.hazard)
@@ -1961,12 +2200,16 @@ class ImpactFunction(object):
         self.exposure = prepare_vector_layer(self.exposure)
         self.debug_layer(self.exposure)
 
+        # Steps which only work on attributes share a feature frame. The
+        # layer is updated once, when a step needs a layer.
+        frame = FeatureFrame(self.exposure)
+
         self.set_state_process('exposure', 'Compute ratios from counts')
-        self.exposure = from_counts_to_ratios(self.exposure)
-        self.debug_layer(self.exposure)
+        frame = from_counts_to_ratios(frame)
+        self.debug_layer(frame)
 
-        exposure = self.exposure.keywords.get('exposure')
-        geometry = self.exposure.geometryType()
+        exposure = frame.keywords.get('exposure')
+        geometry = frame.geometryType()
         indivisible_keys = [f['key'] for f in indivisible_exposure]
         if exposure not in indivisible_keys and geometry != QGis.Point:
             # We can now split features because the `prepare_vector_layer`
@@ -1974,19 +2217,23 @@ class ImpactFunction(object):
             self.set_state_process(
                 'exposure',
                 'Clip the exposure layer with the analysis layer')
-            self.exposure = clip(self.exposure, self._analysis_impacted)
+            self.exposure = clip(frame.to_layer(), self._analysis_impacted)
             self.debug_layer(self.exposure)
+            frame = FeatureFrame(self.exposure)
 
         self.set_state_process('exposure', 'Add default values')
-        self.exposure = add_default_values(self.exposure)
-        self.debug_layer(self.exposure)
+        frame = add_default_values(frame)
+        self.debug_layer(frame)
 
-        fields = self.exposure.keywords['inasafe_fields']
+        fields = frame.keywords['inasafe_fields']
         if exposure_class_field['key'] not in fields:
             self.set_state_process(
                 'exposure', 'Assign classes based on value map')
-            self.exposure = update_value_map(self.exposure)
-            self.debug_layer(self.exposure)
+            frame = update_value_map(frame)
+            self.debug_layer(frame)
+
+        self.exposure = frame.to_layer()
+        check_layer(self.exposure)
 
     @profile
     def intersect_exposure_and_aggregate_hazard(self):
@@ -1998,12 +2245,21 @@ class ImpactFunction(object):
         """
         LOGGER.info('ANALYSIS : Intersect Exposure and Aggregate Hazard')
         if is_raster_layer(self.exposure):
-            self.set_state_process(
-                'impact function',
-                'Zonal stats between exposure and aggregate hazard')
-            # noinspection PyTypeChecker
-            self._aggregate_hazard_impacted = zonal_stats(
-                self.exposure, self._aggregate_hazard_impacted)
+            if self._raster_on_raster:
+                self.set_state_process(
+                    'impact function',
+                    'Cross tabulation between exposure, hazard and '
+                    'aggregation')
+                # noinspection PyTypeChecker
+                self._aggregate_hazard_impacted = cross_tabulate(
+                    self.exposure, self.hazard, self.aggregation)
+            else:
+                self.set_state_process(
+                    'impact function',
+                    'Zonal stats between exposure and aggregate hazard')
+                # noinspection PyTypeChecker
+                self._aggregate_hazard_impacted = zonal_stats(
+                    self.exposure, self._aggregate_hazard_impacted)
             self.debug_layer(self._aggregate_hazard_impacted)
 
             self.set_state_process('impact function', 'Add default values')
@@ -0,0 +1,334 @@
+# coding=utf-8
+
+"""Run the steps of an analysis according to their dependencies.
+
+The steps of the impact function are not a simple sequence: the hazard and
+the exposure are prepared independently once the aggregation is ready. The
+scheduler knows which steps each step requires, and runs a step as soon as
+they are done:
+
+    scheduler = StepScheduler(processes=2)
+    scheduler.add_step('aggregation', prepare_aggregation)
+    scheduler.add_step('hazard', prepare_hazard, requires=['aggregation'])
+    scheduler.add_step(
+        'exposure', prepare_exposure, requires=['aggregation'],
+        export=export_exposure, merge=merge_exposure)
+    scheduler.run()
+
+A step with an export and a merge function can run in another process while
+the current process runs other steps. The process is forked when the step
+starts, so it sees the results of the steps it requires. The export function
+is called in the process at the end of the step and returns the results as
+picklable data, the merge function is called with this data in the current
+process. Results are the same as if the steps were run one by one.
+
+The duration of each step and the critical path, the longest chain of steps
+which depend on each other, are recorded so they can be kept in the
+provenance.
+"""
+
+import logging
+import multiprocessing
+import time
+from collections import OrderedDict
+
+from safe.utilities.parallel import can_fork
+from safe.utilities.settings import setting
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# The steps of the scheduler which is running. It's set before a process is
+# forked, functions of the steps can't be pickled.
+_SCHEDULER = {}
+
+
+def _run_step(key):
+    """Run a step in a worker process and export its results.
+
+    It's a function at the module level so it can be used in other processes.
+
+    :param key: The key of the step.
+    :type key: str
+
+    :return: Tuple of the exported results, the start and the end time.
+    :rtype: tuple
+    """
+    step = _SCHEDULER['steps'][key]
+    start = time.time()
+    step['function']()
+    result = step['export']()
+    return result, start, time.time()
+
+
+class StepScheduler(object):
+
+    """Run steps as soon as the steps they require are done.
+
+    .. versionadded:: 4.2
+    """
+
+    def __init__(self, processes=None, on_start=None):
+        """Constructor.
+
+        :param processes: The maximum number of steps running at the same
+            time, each one in its own process. With 1, steps are run one by
+            one in the current process. Default to the stepProcesses setting.
+        :type processes: int
+
+        :param on_start: A function called with the key of each step when it
+            starts, in the current process.
+        :type on_start: function
+        """
+        if processes is None:
+            processes = setting('stepProcesses', expected_type=int)
+        self.processes = max(1, processes)
+        self.on_start = on_start
+        self.steps = OrderedDict()
+        self.timings = OrderedDict()
+        self._start_time = None
+        self._end_time = None
+
+    def add_step(self, key, function, requires=None, export=None, merge=None):
+        """Add a step to the scheduler.
+
+        Steps must be added after the steps they require.
+
+        :param key: The key of the step.
+        :type key: str
+
+        :param function: The function of the step, without arguments.
+        :type function: function
+
+        :param requires: Keys of the steps which must be done before.
+        :type requires: list
+
+        :param export: A function returning the results of the step as
+            picklable data. With merge, the step can run in another process.
+        :type export: function
+
+        :param merge: A function called with the exported results, in the
+            current process.
+        :type merge: function
+
+        :raises: KeyError if a required step doesn't exist.
+        """
+        requires = list(requires or [])
+        for required in requires:
+            if required not in self.steps:
+                raise KeyError(
+                    'The step %s requires %s which does not exist.' % (
+                        key, required))
+        self.steps[key] = {
+            'key': key,
+            'function': function,
+            'requires': requires,
+            'export': export,
+            'merge': merge,
+        }
+
+    def can_fork(self, key):
+        """Check if a step can run in another process.
+
+        Processes are forked, only on Linux and not from a process of a
+        pool, see safe.utilities.parallel.can_fork.
+
+        :param key: The key of the step.
+        :type key: str
+
+        :rtype: bool
+        """
+        step = self.steps[key]
+        return bool(
+            self.processes > 1 and step['export'] and step['merge'] and
+            can_fork())
+
+    def run(self):
+        """Run all the steps.
+
+        :raises: The first error raised by a step. The other running steps
+            are stopped.
+        """
+        self.timings = OrderedDict()
+        self._start_time = time.time()
+        self._end_time = None
+        pending = list(self.steps)
+        done = set()
+        running = OrderedDict()
+        try:
+            while pending or running:
+                for key, (pool, result) in running.items():
+                    if result.ready():
+                        self._merge(key, pool, result)
+                        del running[key]
+                        done.add(key)
+
+                ready = [
+                    key for key in pending
+                    if all(required in done
+                           for required in self.steps[key]['requires'])]
+
+                # A step is sent to another process only if the current one
+                # has something else to do in the meantime.
+                local = list(ready)
+                for key in ready:
+                    if (len(local) > 1 and
+                            len(running) < self.processes - 1 and
+                            self.can_fork(key)):
+                        running[key] = self._fork(key)
+                        local.remove(key)
+                        pending.remove(key)
+
+                if local:
+                    key = local[0]
+                    pending.remove(key)
+                    self._run_local(key)
+                    done.add(key)
+                elif running:
+                    key, (pool, result) = running.items()[0]
+                    result.wait()
+                    self._merge(key, pool, result)
+                    del running[key]
+                    done.add(key)
+                elif pending:
+                    raise ValueError(
+                        'The steps %s can not be run.' % ', '.join(pending))
+        finally:
+            for pool, _ in running.values():
+                pool.terminate()
+                pool.join()
+            _SCHEDULER.clear()
+            self._end_time = time.time()
+
+    def _run_local(self, key):
+        """Run a step in the current process.
+
+        :param key: The key of the step.
+        :type key: str
+        """
+        if self.on_start:
+            self.on_start(key)
+        start = time.time()
+        self.steps[key]['function']()
+        self._record(key, start, time.time(), False)
+
+    def _fork(self, key):
+        """Start a step in another process.
+
+        :param key: The key of the step.
+        :type key: str
+
+        :return: Tuple of the pool and the asynchronous result.
+        :rtype: tuple
+        """
+        if self.on_start:
+            self.on_start(key)
+        LOGGER.debug('Running the step %s in another process.' % key)
+        _SCHEDULER['steps'] = self.steps
+        pool = multiprocessing.Pool(1)
+        return pool, pool.apply_async(_run_step, (key, ))
+
+    def _merge(self, key, pool, async_result):
+        """Merge the results of a step which ran in another process.
+
+        :param key: The key of the step.
+        :type key: str
+
+        :param pool: The pool running the step.
+        :type pool: multiprocessing.Pool
+
+        :param async_result: The asynchronous result of the step.
+        :type async_result: multiprocessing.pool.AsyncResult
+        """
+        try:
+            result, start, end = async_result.get()
+        finally:
+            pool.close()
+            pool.join()
+        self.steps[key]['merge'](result)
+        self._record(key, start, end, True)
+
+    def _record(self, key, start, end, worker):
+        """Record the timing of a step.
+
+        :param key: The key of the step.
+        :type key: str
+
+        :param start: The start time.
+        :type start: float
+
+        :param end: The end time.
+        :type end: float
+
+        :param worker: If the step ran in another process.
+        :type worker: bool
+        """
+        self.timings[key] = {
+            'start': round(start - self._start_time, 3),
+            'duration': round(end - start, 3),
+            'worker': worker,
+        }
+
+    @property
+    def duration(self):
+        """The wall time to run all the steps, in seconds.
+
+        This property might return None if the steps are still running.
+
+        :rtype: float
+        """
+        if self._end_time is None:
+            return None
+        return round(self._end_time - self._start_time, 3)
+
+    def critical_path(self):
+        """The chain of dependent steps which took the longest time.
+
+        :return: The keys of the steps, from the first one.
+        :rtype: list
+        """
+        lengths = OrderedDict()
+        previous = {}
+        for key, step in self.steps.items():
+            if key not in self.timings:
+                continue
+            best = None
+            for required in step['requires']:
+                if required in lengths and (
+                        best is None or lengths[required] > lengths[best]):
+                    best = required
+            previous[key] = best
+            lengths[key] = self.timings[key]['duration'] + (
+                lengths[best] if best else 0)
+
+        # The last step of the longest chain, the latest one if many chains
+        # have the same length.
+        key = None
+        for step_key, length in lengths.items():
+            if key is None or length >= lengths[key]:
+                key = step_key
+        path = []
+        while key:
+            path.insert(0, key)
+            key = previous[key]
+        return path
+
+    def to_dict(self):
+        """The schedule, to be stored in the provenance.
+
+        :rtype: dict
+        """
+        return {
+            'processes': self.processes,
+            'duration': self.duration,
+            'critical_path': self.critical_path(),
+            'steps': dict(
+                (key, dict(
+                    self.timings.get(key, {}),
+                    requires=self.steps[key]['requires']))
+                for key in self.steps),
+        }
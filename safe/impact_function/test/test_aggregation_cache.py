@@ -0,0 +1,129 @@
+# coding=utf-8
+"""Test Aggregation Cache."""
+
+import os
+import unittest
+from os.path import join
+
+from safe.test.utilities import get_qgis_app, load_test_vector_layer
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from qgis.core import QgsCoordinateReferenceSystem
+
+from safe.common.utilities import temp_dir
+from safe.gis.vector.prepare_vector_layer import prepare_vector_layer
+from safe.impact_function.aggregation_cache import (
+    aggregation_cache_directory,
+    aggregation_cache_key,
+    cache_aggregation,
+    cached_aggregation,
+    clear_aggregation_cache,
+    prune_aggregation_cache,
+)
+from safe.utilities.settings import delete_setting, set_setting
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+class TestAggregationCache(unittest.TestCase):
+
+    """Test Aggregation Cache."""
+
+    def setUp(self):
+        set_setting(
+            'aggregationCachePath', temp_dir('test_aggregation_cache'))
+        clear_aggregation_cache()
+
+    def tearDown(self):
+        clear_aggregation_cache()
+        delete_setting('aggregationCachePath')
+
+    def test_aggregation_cache(self):
+        """Test we can reuse a prepared aggregation layer."""
+        layer = load_test_vector_layer(
+            'gisv4', 'aggregation', 'small_grid.geojson', clone=True)
+        crs = QgsCoordinateReferenceSystem('EPSG:4326')
+
+        key = aggregation_cache_key(layer, crs)
+        self.assertIsNotNone(key)
+        self.assertIsNone(cached_aggregation(key))
+
+        # The key depends on the CRS and on the selection.
+        self.assertNotEqual(
+            key,
+            aggregation_cache_key(
+                layer, QgsCoordinateReferenceSystem('EPSG:3857')))
+        layer.setSelectedFeatures([next(layer.getFeatures()).id()])
+        self.assertNotEqual(key, aggregation_cache_key(layer, crs, True))
+
+        # Custom CRS have no authority ID.
+        first_crs = QgsCoordinateReferenceSystem()
+        first_crs.createFromProj4(
+            '+proj=tmerc +lat_0=0 +lon_0=106.5 +k=0.9999 +x_0=200000 '
+            '+y_0=1500000 +ellps=WGS84 +units=m +no_defs')
+        second_crs = QgsCoordinateReferenceSystem()
+        second_crs.createFromProj4(
+            '+proj=tmerc +lat_0=0 +lon_0=110.5 +k=0.9999 +x_0=200000 '
+            '+y_0=1500000 +ellps=WGS84 +units=m +no_defs')
+        self.assertNotEqual(
+            aggregation_cache_key(layer, first_crs),
+            aggregation_cache_key(layer, second_crs))
+
+        prepared = prepare_vector_layer(layer)
+        self.assertTrue(cache_aggregation(key, prepared))
+
+        cached = cached_aggregation(key)
+        self.assertEqual(cached.featureCount(), prepared.featureCount())
+        self.assertEqual(cached.keywords['inasafe_fields'],
+                         prepared.keywords['inasafe_fields'])
+
+        # We get a working copy, not the file in the cache.
+        self.assertEqual(cached.providerType(), 'memory')
+        self.assertNotEqual(cached.source(), cached_aggregation(key).source())
+
+        # The FID of the GeoPackage is not a field of the layer.
+        self.assertListEqual(
+            [field.name() for field in cached.fields()],
+            [field.name() for field in prepared.fields()])
+        self.assertEqual(
+            next(cached.getFeatures()).attributes(),
+            next(prepared.getFeatures()).attributes())
+
+        # A memory layer can't be cached.
+        layer = load_test_vector_layer(
+            'gisv4', 'aggregation', 'small_grid.geojson',
+            clone_to_memory=True)
+        self.assertIsNone(aggregation_cache_key(layer, crs))
+
+    def test_prune_aggregation_cache(self):
+        """Test the least recently used layers are removed from the cache."""
+        layer = load_test_vector_layer(
+            'gisv4', 'aggregation', 'small_grid.geojson', clone=True)
+        prepared = prepare_vector_layer(layer)
+        first_key = aggregation_cache_key(
+            layer, QgsCoordinateReferenceSystem('EPSG:4326'))
+        second_key = aggregation_cache_key(
+            layer, QgsCoordinateReferenceSystem('EPSG:3857'))
+        self.assertTrue(cache_aggregation(first_key, prepared))
+        self.assertTrue(cache_aggregation(second_key, prepared))
+
+        # Big enough for both layers.
+        self.assertListEqual(prune_aggregation_cache(size=1024), [])
+
+        # The first layer is used, so the second one is removed first.
+        os.utime(
+            join(aggregation_cache_directory(), second_key + '.gpkg'),
+            (0, 0))
+        self.assertIsNotNone(cached_aggregation(first_key))
+        self.assertListEqual(
+            prune_aggregation_cache(size=0), [second_key, first_key])
+        self.assertIsNone(cached_aggregation(first_key))
+
+        # The layer we keep is not removed, even if the cache is too big.
+        self.assertTrue(cache_aggregation(first_key, prepared))
+        self.assertListEqual(
+            prune_aggregation_cache(keep=first_key, size=0), [])
+        self.assertIsNotNone(cached_aggregation(first_key))
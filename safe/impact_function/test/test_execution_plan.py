@@ -0,0 +1,151 @@
+# coding=utf-8
+"""Test the execution plan of an impact function."""
+
+import unittest
+from os.path import exists
+from threading import Thread
+
+from safe.test.utilities import get_qgis_app, load_test_vector_layer
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from PyQt4.QtCore import QPyNullVariant
+
+from safe.definitions.constants import ANALYSIS_SUCCESS, PREPARE_SUCCESS
+from safe.definitions.layer_purposes import layer_purpose_profiling
+from safe.gis.vector.feature_writer import FeatureWriter, write_option
+from safe.impact_function.execution_plan import (
+    ExecutionPlan,
+    batched_strategy,
+    disk_strategy,
+    feature_overhead,
+    layer_memory,
+    memory_strategy,
+)
+from safe.impact_function.impact_function import ImpactFunction
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+def prepared_impact_function():
+    """An impact function with small layers, prepared."""
+    impact_function = ImpactFunction()
+    impact_function.hazard = load_test_vector_layer(
+        'gisv4', 'hazard', 'classified_vector.geojson')
+    impact_function.exposure = load_test_vector_layer(
+        'gisv4', 'exposure', 'building-points.geojson')
+    impact_function.aggregation = load_test_vector_layer(
+        'gisv4', 'aggregation', 'small_grid.geojson')
+    return impact_function
+
+
+def attribute_tables(outputs):
+    """Field names and sorted attributes of the outputs, by layer purpose.
+
+    The analysis log is not included, durations are different every time.
+    """
+    tables = {}
+    for layer in outputs:
+        purpose = layer.keywords['layer_purpose']
+        if purpose == layer_purpose_profiling['key']:
+            continue
+        names = [field.name() for field in layer.fields().toList()]
+        rows = sorted(
+            [None if isinstance(value, QPyNullVariant) else value
+             for value in feature.attributes()]
+            for feature in layer.getFeatures())
+        tables[purpose] = (names, rows)
+    return tables
+
+
+class TestExecutionPlan(unittest.TestCase):
+
+    """Test the execution plan of an impact function."""
+
+    def run_analysis(self, free_memory=None):
+        """Run the analysis with a plan for the given free memory."""
+        impact_function = prepared_impact_function()
+        status, message = impact_function.prepare()
+        self.assertEqual(PREPARE_SUCCESS, status, message)
+        if free_memory:
+            impact_function.execution_plan = ExecutionPlan(
+                impact_function, free_memory)
+        status, message = impact_function.run()
+        self.assertEqual(ANALYSIS_SUCCESS, status, message)
+        return impact_function
+
+    def test_layer_memory(self):
+        """Test the memory of a layer depends on its features."""
+        impact_function = prepared_impact_function()
+        self.assertEqual(layer_memory(None), 0)
+        exposure = impact_function.exposure
+        self.assertGreater(
+            layer_memory(exposure),
+            exposure.featureCount() * feature_overhead)
+
+    def test_strategy(self):
+        """Test the strategy depends on the free memory."""
+        impact_function = prepared_impact_function()
+        plan = ExecutionPlan(impact_function, 1024 * 1024)
+        self.assertEqual(
+            set(plan.strategies.values()), set([memory_strategy]))
+
+        peak = float(plan.peak_memory) / 1024 / 1024
+        plan = ExecutionPlan(impact_function, peak * 3)
+        self.assertEqual(
+            plan.strategy('combine_hazard_exposure'), batched_strategy)
+
+        plan = ExecutionPlan(impact_function, peak / 10)
+        self.assertEqual(
+            plan.strategy('combine_hazard_exposure'), disk_strategy)
+
+        # The options only apply to the step, in the current thread.
+        other_thread = []
+        thread = Thread(
+            target=lambda: other_thread.append(
+                write_option('scratch_directory')))
+        with plan.step('combine_hazard_exposure') as strategy:
+            self.assertEqual(strategy, disk_strategy)
+            self.assertIsNotNone(write_option('scratch_directory'))
+            writer = FeatureWriter(impact_function.aggregation)
+            self.assertLessEqual(writer.size, 100)
+            thread.start()
+            thread.join()
+        self.assertListEqual(other_thread, [None])
+        self.assertIsNone(write_option('scratch_directory'))
+        writer = FeatureWriter(impact_function.aggregation)
+        self.assertEqual(writer.size, 1000)
+
+    def test_run_on_disk(self):
+        """Test an analysis too big for the memory is run on disk."""
+        impact_function = self.run_analysis()
+        plan = impact_function.execution_plan.to_dict()
+        self.assertEqual(
+            set(step['strategy'] for step in plan['steps'].values()),
+            set([memory_strategy]))
+        self.assertEqual(
+            impact_function.provenance['execution_plan'], plan)
+
+        # Nearly no memory, every step with features is run on disk.
+        on_disk = self.run_analysis(free_memory=0.001)
+        plan = on_disk.provenance['execution_plan']
+        self.assertEqual(
+            plan['steps']['combine_hazard_exposure']['strategy'],
+            disk_strategy)
+        # Same fields and same values, the FID of the GeoPackages is not an
+        # attribute.
+        self.assertDictEqual(
+            attribute_tables(on_disk.outputs),
+            attribute_tables(impact_function.outputs))
+
+        # Outputs are copied to the datastore before the scratch workspace
+        # is removed.
+        for layer in on_disk.outputs:
+            if layer.keywords['layer_purpose'] == layer_purpose_profiling[
+                    'key']:
+                continue
+            path = layer.publicSource().split('|')[0]
+            self.assertTrue(path.startswith(on_disk.datastore.uri_path), path)
+            self.assertTrue(exists(path), path)
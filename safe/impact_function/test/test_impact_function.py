@@ -136,6 +136,32 @@ def read_json_flow(json_path):
     return data['scenario'], data['expected_steps'], data['expected_outputs']
 
 
+def scenario_layer_path(scenario, layer_type):
+    """Helper method to find the path of a layer in a scenario.
+
+    :param scenario: Dictionary of hazard, exposure, and aggregation.
+    :type scenario: dict
+
+    :param layer_type: The layer type : hazard, exposure or aggregation.
+    :type layer_type: str
+
+    :returns: The absolute path to the layer or None if the scenario does not
+        have this layer.
+    :rtype: str
+    """
+    path = scenario[layer_type]
+    if not path:
+        return None
+    elif os.path.exists(path):
+        return path
+    elif os.path.exists(standard_data_path(layer_type, path)):
+        return standard_data_path(layer_type, path)
+    elif os.path.exists(standard_data_path(*(path.split('/')))):
+        return standard_data_path(*(path.split('/')))
+    else:
+        raise IOError('No %s file' % layer_type)
+
+
 def run_scenario(scenario, use_debug=False):
     """Run scenario.
 
@@ -148,40 +174,9 @@ def run_scenario(scenario, use_debug=False):
     :returns: Tuple(status, Flow dictionary, outputs).
     :rtype: list
     """
-    if os.path.exists(scenario['exposure']):
-        exposure_path = scenario['exposure']
-    elif os.path.exists(standard_data_path('exposure', scenario['exposure'])):
-        exposure_path = standard_data_path('exposure', scenario['exposure'])
-    elif os.path.exists(
-            standard_data_path(*(scenario['exposure'].split('/')))):
-        exposure_path = standard_data_path(*(scenario['exposure'].split('/')))
-    else:
-        raise IOError('No exposure file')
-
-    if os.path.exists(scenario['hazard']):
-        hazard_path = scenario['hazard']
-    elif os.path.exists(standard_data_path('hazard', scenario['hazard'])):
-        hazard_path = standard_data_path('hazard', scenario['hazard'])
-    elif os.path.exists(standard_data_path(*(scenario['hazard'].split('/')))):
-        hazard_path = standard_data_path(*(scenario['hazard'].split('/')))
-    else:
-        raise IOError('No hazard file')
-
-    if not scenario['aggregation']:
-        aggregation_path = None
-    else:
-        if os.path.exists(scenario['aggregation']):
-            aggregation_path = scenario['aggregation']
-        elif os.path.exists(standard_data_path(
-                'aggregation', scenario['aggregation'])):
-            aggregation_path = standard_data_path(
-                'aggregation', scenario['aggregation'])
-        elif os.path.exists(
-                standard_data_path(*(scenario['aggregation'].split('/')))):
-            aggregation_path = standard_data_path(
-                *(scenario['aggregation'].split('/')))
-        else:
-            raise IOError('No aggregation file')
+    exposure_path = scenario_layer_path(scenario, 'exposure')
+    hazard_path = scenario_layer_path(scenario, 'hazard')
+    aggregation_path = scenario_layer_path(scenario, 'aggregation')
 
     impact_function = ImpactFunction()
     impact_function.debug_mode = use_debug
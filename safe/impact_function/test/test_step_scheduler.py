@@ -0,0 +1,159 @@
+# coding=utf-8
+"""Test the step scheduler."""
+
+import os
+import time
+import unittest
+
+from safe.test.utilities import get_qgis_app, load_test_vector_layer
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from safe.definitions.constants import ANALYSIS_SUCCESS, PREPARE_SUCCESS
+from safe.definitions.layer_purposes import layer_purpose_profiling
+from safe.gis.vector.tools import deserialize_layer, serialize_layer
+from safe.impact_function.impact_function import ImpactFunction
+from safe.impact_function.step_scheduler import StepScheduler
+from safe.utilities.parallel import can_fork
+from safe.utilities.settings import delete_setting, set_setting
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+def layer_content(layer):
+    """Geometries and attributes of the features of a layer, in order."""
+    content = []
+    for feature in layer.getFeatures():
+        geometry = feature.geometry()
+        content.append(
+            (geometry.exportToWkt() if geometry else None,
+             feature.attributes()))
+    return content
+
+
+class TestStepScheduler(unittest.TestCase):
+
+    """Test the step scheduler."""
+
+    def test_order(self):
+        """Test steps are run after the steps they require."""
+        order = []
+
+        def step(key, duration=0):
+            def function():
+                time.sleep(duration)
+                order.append(key)
+            return function
+
+        scheduler = StepScheduler(processes=1)
+        scheduler.add_step('a', step('a', 0.01))
+        scheduler.add_step('b', step('b', 0.05), requires=['a'])
+        scheduler.add_step('c', step('c', 0.2), requires=['a'])
+        scheduler.add_step('d', step('d'), requires=['b', 'c'])
+        scheduler.run()
+
+        self.assertEqual(order, ['a', 'b', 'c', 'd'])
+        self.assertEqual(scheduler.critical_path(), ['a', 'c', 'd'])
+        schedule = scheduler.to_dict()
+        self.assertEqual(schedule['critical_path'], ['a', 'c', 'd'])
+        self.assertEqual(schedule['steps']['d']['requires'], ['b', 'c'])
+        self.assertGreaterEqual(schedule['duration'], 0.26)
+
+        with self.assertRaises(KeyError):
+            scheduler.add_step('e', step('e'), requires=['f'])
+
+    def test_worker(self):
+        """Test a step is run in another process."""
+        if not can_fork():
+            self.skipTest('Processes are only forked on Linux.')
+        results = {}
+
+        def prepare():
+            results['worker'] = os.getpid()
+
+        scheduler = StepScheduler(processes=2)
+        scheduler.add_step('a', lambda: None)
+        scheduler.add_step(
+            'b', prepare, requires=['a'],
+            export=lambda: results['worker'],
+            merge=lambda pid: results.update(merged=pid))
+        scheduler.add_step('c', lambda: time.sleep(0.1), requires=['a'])
+        scheduler.add_step('d', lambda: None, requires=['b', 'c'])
+        scheduler.run()
+
+        self.assertNotIn('worker', results)
+        self.assertNotEqual(results['merged'], os.getpid())
+        self.assertTrue(scheduler.timings['b']['worker'])
+        self.assertFalse(scheduler.timings['c']['worker'])
+
+    def test_error(self):
+        """Test an error in a step is raised."""
+        def fail():
+            raise ValueError
+
+        scheduler = StepScheduler(processes=2)
+        scheduler.add_step('a', lambda: None)
+        scheduler.add_step(
+            'b', fail, requires=['a'], export=lambda: None,
+            merge=lambda result: None)
+        scheduler.add_step('c', lambda: None, requires=['a'])
+        with self.assertRaises(ValueError):
+            scheduler.run()
+
+    def test_serialize_layer(self):
+        """Test a layer is the same after being serialized."""
+        layer = load_test_vector_layer(
+            'gisv4', 'exposure', 'buildings.geojson', clone_to_memory=True)
+        copy = deserialize_layer(serialize_layer(layer))
+        self.assertEqual(layer_content(copy), layer_content(layer))
+        self.assertEqual(copy.crs().authid(), layer.crs().authid())
+        self.assertEqual(copy.keywords, layer.keywords)
+
+    def run_analysis(self, processes):
+        """Run an analysis with the given number of processes."""
+        set_setting('stepProcesses', processes)
+        try:
+            impact_function = ImpactFunction()
+            impact_function.hazard = load_test_vector_layer(
+                'gisv4', 'hazard', 'classified_vector.geojson')
+            impact_function.exposure = load_test_vector_layer(
+                'gisv4', 'exposure', 'buildings.geojson')
+            impact_function.aggregation = load_test_vector_layer(
+                'gisv4', 'aggregation', 'small_grid.geojson')
+            status, message = impact_function.prepare()
+            self.assertEqual(PREPARE_SUCCESS, status, message)
+            status, message = impact_function.run()
+            self.assertEqual(ANALYSIS_SUCCESS, status, message)
+        finally:
+            delete_setting('stepProcesses')
+        return impact_function
+
+    def test_impact_function(self):
+        """Test an analysis gives the same results with many processes."""
+        expected = self.run_analysis(1)
+        impact_function = self.run_analysis(2)
+
+        for layer in expected.outputs:
+            purpose = layer.keywords['layer_purpose']
+            if purpose == layer_purpose_profiling['key']:
+                # Durations are different.
+                continue
+            output = [
+                other for other in impact_function.outputs
+                if other.keywords['layer_purpose'] == purpose][0]
+            self.assertEqual(
+                layer_content(output), layer_content(layer), purpose)
+        self.assertEqual(
+            impact_function.state['exposure'], expected.state['exposure'])
+
+        schedule = impact_function.provenance['step_schedule']
+        self.assertEqual(schedule['processes'], 2)
+        self.assertEqual(schedule['critical_path'][-1], 'summary_calculation')
+        if can_fork():
+            self.assertTrue(
+                schedule['steps']['exposure_preparation']['worker'])
+        self.assertIn(
+            'Exposure preparation', impact_function.performance_log_message(
+            ).to_text())
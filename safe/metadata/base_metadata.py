@@ -12,10 +12,10 @@ from safe.common.exceptions import MetadataReadError, HashNotFoundError
 from safe.metadata.encoder import MetadataEncoder
 from safe.metadata.metadata_db_io import MetadataDbIO
 from safe.metadata.utilities import (
-    XML_NS,
-    insert_xml_element,
     read_property_from_xml,
-    reading_ancillary_files
+    reading_ancillary_files,
+    template_xml_element,
+    xml_template,
 )
 from safe.utilities.i18n import tr
 
@@ -264,15 +264,11 @@ class BaseMetadata(object):
         :return: xml representation of the metadata
         :rtype: ElementTree.Element
         """
-        tree = ElementTree.parse(METADATA_XML_TEMPLATE)
-        root = tree.getroot()
+        root = xml_template(METADATA_XML_TEMPLATE)
 
         for name, prop in self.properties.iteritems():
-            path = prop.xml_path
-            elem = root.find(path, XML_NS)
-            if elem is None:
-                # create elem
-                elem = insert_xml_element(root, path)
+            elem = template_xml_element(
+                root, METADATA_XML_TEMPLATE, prop.xml_path)
             elem.text = self.get_xml_value(name)
 
         return root
@@ -17,9 +17,9 @@ __date__ = '27/05/2015'
 __copyright__ = ('Copyright 2012, Australia Indonesia Facility for '
                  'Disaster Reduction')
 
-from xml.etree import ElementTree
 from safe.metadata import BaseMetadata
-from safe.metadata.utilities import reading_ancillary_files, prettify_xml
+from safe.metadata.utilities import (
+    reading_ancillary_files, pretty_xml_element)
 
 
 class GenericLayerMetadata(BaseMetadata):
@@ -91,7 +91,7 @@ class GenericLayerMetadata(BaseMetadata):
         :rtype: str
         """
         root = super(GenericLayerMetadata, self).xml
-        return prettify_xml(ElementTree.tostring(root))
+        return pretty_xml_element(root)
 
     def read_json(self):
         """
@@ -6,7 +6,8 @@ from xml.etree import ElementTree
 from safe.metadata import BaseMetadata
 
 from safe.metadata.provenance import Provenance
-from safe.metadata.utilities import reading_ancillary_files, prettify_xml
+from safe.metadata.utilities import (
+    reading_ancillary_files, pretty_xml_element)
 from safe.metadata.utilities import XML_NS
 from safe.metadata.utilities import merge_dictionaries
 from safe.metadata.encoder import MetadataEncoder
@@ -201,7 +202,7 @@ class OutputLayerMetadata(BaseMetadata):
         # generate the provenance xml element
         provenance_element = ElementTree.fromstring(self.provenance.xml)
         provenance_parent.append(provenance_element)
-        return prettify_xml(ElementTree.tostring(root))
+        return pretty_xml_element(root)
 
     def read_xml(self):
         """
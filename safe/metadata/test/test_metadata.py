@@ -13,7 +13,13 @@ Contact : ole.moller.nielsen@gmail.com
      (at your option) any later version.
 
 """
-from safe.metadata.utilities import insert_xml_element
+from safe.metadata.utilities import (
+    insert_xml_element,
+    prettify_xml,
+    pretty_xml_element,
+    template_xml_element,
+    xml_template,
+    XML_NS)
 
 __author__ = 'marco@opengis.ch'
 __revision__ = '$Format:%H$'
@@ -23,6 +29,7 @@ __copyright__ = ('Copyright 2012, Australia Indonesia Facility for '
 
 
 from xml.etree import ElementTree
+from safe.definitions.metadata import METADATA_XML_TEMPLATE
 from safe.metadata import BaseMetadata
 from safe.metadata import OutputLayerMetadata
 from unittest import TestCase
@@ -61,3 +68,31 @@ class TestMetadata(TestCase):
         result_xml = ElementTree.tostring(root)
 
         self.assertEquals(expected_xml, result_xml)
+
+    def test_xml_template(self):
+        """Check we get a new copy of the template each time"""
+        root = xml_template(METADATA_XML_TEMPLATE)
+        path = 'gmd:fileIdentifier/gco:CharacterString'
+        element = template_xml_element(root, METADATA_XML_TEMPLATE, path)
+        self.assertIs(element, root.find(path, XML_NS))
+        element.text = 'TESTtext'
+
+        new_root = xml_template(METADATA_XML_TEMPLATE)
+        self.assertIsNot(root, new_root)
+        self.assertNotEqual(
+            'TESTtext',
+            template_xml_element(new_root, METADATA_XML_TEMPLATE, path).text)
+
+        # Not in the template.
+        element = template_xml_element(
+            new_root, METADATA_XML_TEMPLATE, 'd/e/f')
+        self.assertIs(element, new_root.find('d/e/f'))
+
+    def test_pretty_xml_element(self):
+        """Check we write the same XML as minidom"""
+        root = ElementTree.parse(METADATA_XML_TEMPLATE).getroot()
+        root.append(ElementTree.fromstring(
+            '<a b="1 &amp; 2">x<c>\xc3\xa9</c>y<d/></a>'))
+        self.assertEqual(
+            prettify_xml(ElementTree.tostring(root)),
+            pretty_xml_element(root))
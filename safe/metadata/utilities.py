@@ -25,6 +25,12 @@ ElementTree.register_namespace('gco', XML_NS['gco'])
 ElementTree.register_namespace('gmd', XML_NS['gmd'])
 ElementTree.register_namespace('xsi', XML_NS['xsi'])
 
+# Parsed XML templates, per path.
+XML_TEMPLATES = {}
+
+# Position of elements in XML templates, per template path and element path.
+XML_ELEMENT_INDEXES = {}
+
 
 def insert_xml_element(root, element_path):
     """insert an XML element in an other creating the needed parents.
@@ -49,6 +55,110 @@ def insert_xml_element(root, element_path):
     return element
 
 
+def xml_template(template_path):
+    """Get a copy of an XML template, the file is parsed only once.
+
+    :param template_path: The path to the XML template.
+    :type template_path: str
+
+    :return: The root of a new copy of the template.
+    :rtype: ElementTree.Element
+    """
+    if template_path not in XML_TEMPLATES:
+        XML_TEMPLATES[template_path] = ElementTree.parse(
+            template_path).getroot()
+    return _copy_xml_element(XML_TEMPLATES[template_path])
+
+
+def template_xml_element(root, template_path, element_path):
+    """Find or create an element in a copy of an XML template.
+
+    The position of the element in the template is computed only once, so we
+    don't need to search the element in each copy of the template. If the
+    element is not in the template, it is created like insert_xml_element.
+
+    Elements must only be appended to the copy before this call, otherwise
+    positions are not valid anymore.
+
+    :param root: The root of a copy of the template, from xml_template.
+    :type root: ElementTree.Element
+
+    :param template_path: The path to the XML template.
+    :type template_path: str
+
+    :param element_path: The path relative to root.
+    :type element_path: str
+
+    :return: The element.
+    :rtype: ElementTree.Element
+    """
+    key = (template_path, element_path)
+    if key not in XML_ELEMENT_INDEXES:
+        if template_path not in XML_TEMPLATES:
+            xml_template(template_path)
+        XML_ELEMENT_INDEXES[key] = _xml_element_indexes(
+            XML_TEMPLATES[template_path], element_path)
+
+    indexes = XML_ELEMENT_INDEXES[key]
+    if indexes is None:
+        element = root.find(element_path, XML_NS)
+        if element is None:
+            element = insert_xml_element(root, element_path)
+        return element
+
+    element = root
+    for index in indexes:
+        element = element[index]
+    return element
+
+
+def _xml_element_indexes(root, element_path):
+    """Compute the position of an element, from the root.
+
+    :param root: The container.
+    :type root: ElementTree.Element
+
+    :param element_path: The path relative to root.
+    :type element_path: str
+
+    :return: The index of the element in each parent, from the root, or None
+        if the element is not found.
+    :rtype: tuple
+    """
+    element = root.find(element_path, XML_NS)
+    if element is None:
+        return None
+
+    parents = {}
+    for parent in root.iter():
+        for index, child in enumerate(parent):
+            parents[child] = parent, index
+
+    indexes = []
+    while element is not root:
+        element, index = parents[element]
+        indexes.append(index)
+    return tuple(reversed(indexes))
+
+
+def _copy_xml_element(element):
+    """Copy an XML element recursively.
+
+    It's faster than copy.deepcopy.
+
+    :param element: The element to copy.
+    :type element: ElementTree.Element
+
+    :return: The copy.
+    :rtype: ElementTree.Element
+    """
+    new_element = element.makeelement(element.tag, element.attrib.copy())
+    new_element.text = element.text
+    new_element.tail = element.tail
+    new_element.extend(_copy_xml_element(child) for child in element)
+    return new_element
+
+
 @contextmanager
 def reading_ancillary_files(metadata):
     """
@@ -123,6 +233,96 @@ def prettify_xml(xml_str):
     return pretty_xml
 
 
+def pretty_xml_element(root):
+    """Returns indented XML without blank lines from an XML element.
+
+    The output is the same as prettify_xml(ElementTree.tostring(root)) but the
+    XML is written in a single pass, without being serialized and parsed
+    again with minidom.
+
+    :param root: The XML element.
+    :type root: ElementTree.Element
+
+    :return: The indented XML, encoded in UTF-8.
+    :rtype: str
+    """
+    prefixes = dict((uri, prefix) for prefix, uri in XML_NS.items())
+    namespaces = {}
+
+    def qualified_name(name):
+        """Replace the namespace URI of a name by its prefix."""
+        if name[:1] != '{':
+            return name
+        uri, local_name = name[1:].split('}', 1)
+        prefix = namespaces.get(uri)
+        if prefix is None:
+            prefix = prefixes.get(uri, 'ns%d' % len(namespaces))
+            namespaces[uri] = prefix
+        return '%s:%s' % (prefix, local_name)
+
+    # Every namespace is declared in the root element.
+    for element in root.iter():
+        qualified_name(element.tag)
+        for key in element.keys():
+            qualified_name(key)
+
+    lines = [u'<?xml version="1.0" encoding="UTF-8"?>']
+
+    def write(element, indent):
+        """Write an element and its children, like minidom."""
+        tag = qualified_name(element.tag)
+        attributes = [
+            (qualified_name(key), value) for key, value in element.items()]
+        if element is root:
+            attributes.extend(
+                ('xmlns:%s' % prefix, uri)
+                for uri, prefix in namespaces.items())
+        # Minidom is sorting attributes.
+        attributes.sort()
+        start = indent + '<' + tag + ''.join(
+            ' %s="%s"' % (key, _escape_xml(value))
+            for key, value in attributes)
+
+        children = list(element)
+        if not children:
+            if element.text:
+                lines.append(u'%s>%s</%s>' % (
+                    start, _escape_xml(element.text), tag))
+            else:
+                lines.append(start + '/>')
+            return
+
+        lines.append(start + '>')
+        child_indent = indent + ' ' * 2
+        if element.text:
+            lines.append(child_indent + _escape_xml(element.text))
+        for child in children:
+            write(child, child_indent)
+            if child.tail:
+                lines.append(child_indent + _escape_xml(child.tail))
+        lines.append(indent + '</' + tag + '>')
+
+    write(root, '')
+
+    xml_str = u'\n'.join(lines).encode('utf-8')
+    pretty_xml = '\n'.join(
+        [line for line in xml_str.split('\n') if line.strip()])
+    return pretty_xml + '\n'
+
+
+def _escape_xml(text):
+    """Escape a text or an attribute value like minidom.
+
+    :param text: The text.
+    :type text: basestring
+
+    :return: The escaped text.
+    :rtype: basestring
+    """
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace(
+        '"', '&quot;').replace('>', '&gt;')
+
+
 def serialize_dictionary(dictionary):
     """Function to stringify a dictionary recursively.
 
@@ -3,6 +3,7 @@
 
 This context then used for SVG Jinja2 generation.
 """
+import hashlib
 import math
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
@@ -46,6 +47,20 @@ class SVGChartContext(object):
         """
         self._as_file = value
 
+    @property
+    def cache_key(self):
+        """Key of the chart content, to reuse a chart already rendered.
+
+        Charts with the same key look the same. The base context has no
+        key, so it is never reused.
+
+        :return: The key or None.
+        :rtype: str
+
+        .. versionadded:: 4.2
+        """
+        return None
+
     @classmethod
     def _convert_tuple_color_to_hex(cls, color):
         """Convert tuple of color element (r, g, b) to hexa.
@@ -228,6 +243,30 @@ class DonutChartContext(SVGChartContext):
         """
         return self._colors
 
+    @property
+    def cache_key(self):
+        """Key of the chart content, made of its data and its style.
+
+        :return: SHA1 hex digest, or None if the chart has no data.
+        :rtype: str
+
+        .. versionadded:: 4.2
+        """
+        if not self.data:
+            return None
+        content = repr((
+            self.__class__.__name__,
+            self.data,
+            self.labels,
+            self.colors,
+            self.inner_radius_ratio,
+            self.stroke_color,
+            self.title,
+            self.total_header,
+            self.thousand_separator_format,
+            self.as_file))
+        return hashlib.sha1(content).hexdigest()
+
     @property
     def total_value(self):
         """Total sum of data array.
@@ -146,4 +146,11 @@ def population_chart_to_png_extractor(impact_report, component_metadata):
 
     context['filepath'] = population_donut_path
 
+    # The chart is the same if its data and its style are the same.
+    svg_component = impact_report.metadata.component_by_key(
+        'population-chart')
+    if svg_component and svg_component.context:
+        chart = svg_component.context.get('context')
+        context['cache_key'] = getattr(chart, 'cache_key', None)
+
     return context
@@ -10,6 +10,8 @@ import imp
 import logging
 import os
 import shutil
+import time
+from collections import OrderedDict
 
 from qgis.core import (
     QgsComposition,
@@ -333,6 +335,7 @@ class ImpactReport(object):
             map_settings,
             ImpactReport.DEFAULT_PAGE_DPI)
         self._keyword_io = KeywordIO()
+        self._timings = OrderedDict()
 
     @property
     def inasafe_context(self):
@@ -649,6 +652,29 @@ class ImpactReport(object):
                 pass
         return legend_attribute_dict
 
+    @property
+    def timings(self):
+        """Time spent on each component by the last process_components.
+
+        :return: Dictionary component key -> time in seconds, in the order of
+            components.
+        :rtype: OrderedDict
+
+        .. versionadded:: 4.2
+        """
+        return self._timings
+
+    def _timed_components(self):
+        """Iterate over components and record the time spent on each one.
+
+        The time of a component is recorded when the caller asks for the next
+        one, so a component skipped with `continue` is recorded too.
+        """
+        for component in self.metadata.components:
+            start = time.time()
+            yield component
+            self._timings[component.key] = time.time() - start
+
     def process_components(self):
         """Process context for each component and a given template.
 
@@ -672,7 +698,8 @@ class ImpactReport(object):
 
         generation_error_code = self.REPORT_GENERATION_SUCCESS
 
-        for component in self.metadata.components:
+        self._timings = OrderedDict()
+        for component in self._timed_components():
             # load extractors
             try:
                 if not component.context:
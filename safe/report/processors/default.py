@@ -7,9 +7,12 @@ Module for basic renderer we support. Currently we have:
 - QGIS Composition templating renderer
 """
 
+import hashlib
 import io
 import logging
 import os
+import time
+from collections import OrderedDict
 from PyQt4 import QtXml
 from tempfile import mkdtemp
 
@@ -39,7 +42,9 @@ from safe.common.utilities import temp_dir
 from safe.definitions.reports.infographic import map_overview
 from safe.report.report_metadata import QgisComposerComponentsMetadata
 from safe.utilities.i18n import tr
+from safe.utilities.parallel import parallel_map
 from safe.utilities.settings import general_setting, setting
+from safe.utilities.unicode import get_unicode
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
 __license__ = "GPL version 3"
@@ -49,6 +54,26 @@ __revision__ = '$Format:%H$'
 
 LOGGER = logging.getLogger('InaSAFE')
 
+# Minimum number of atlas pages before rendering them in many processes.
+atlas_parallel_minimum = 20
+
+# The atlas being rendered by _render_atlas_files, inherited by forked
+# processes because a composition can't be sent to them.
+_ATLAS_RENDERING = {}
+
+# Content of composer templates, by path: (modification time, content).
+TEMPLATES = {}
+
+# Rendered charts, by content key: (rendered SVG text or PNG bytes, time
+# spent to render it in seconds). The least recently used charts are first.
+# Charts rendered in forked processes are added by the report orchestrator,
+# see new_charts and cache_charts.
+CHARTS = OrderedDict()
+
+# Maximum number of charts kept in CHARTS.
+chart_cache_size = 128
+CHART_CACHE_STATISTICS = {'hits': 0, 'misses': 0, 'time_saved': 0.0}
+
 
 def composition_item(composer, item_id, item_class):
     """Fetch a specific item according to its type in a composer.
@@ -125,8 +150,18 @@ def jinja2_renderer(impact_report, component):
         loader=loader,
         extensions=extensions)
 
-    template = env.get_template(component.template)
-    rendered = template.render(context)
+    # A chart with the same content has been rendered with this template.
+    chart = context.get('context') if isinstance(context, dict) else None
+    chart_key = getattr(chart, 'cache_key', None)
+    if chart_key:
+        chart_key = _chart_key(component.template, chart_key)
+    rendered = _cached_chart(chart_key)
+    if rendered is None:
+        start = time.time()
+        template = env.get_template(component.template)
+        rendered = template.render(context)
+        _cache_chart(chart_key, rendered, time.time() - start)
+
     if component.output_format == 'string':
         return rendered
     elif component.output_format == 'file':
@@ -375,6 +410,66 @@ def qgis_composer_html_renderer(impact_report, component):
     return component.output
 
 
+def composer_template(template_path, substitution_map=None):
+    """Parse a composer template, with its text substituted.
+
+    The template file is read once and kept in memory until it's modified.
+    Text is substituted like QgsComposition.loadFromTemplate does, so the
+    document can be loaded without a substitution map and is only parsed
+    once.
+
+    :param template_path: The path to the .qpt file.
+    :type template_path: str
+
+    :param substitution_map: Values for each [key] in the template.
+    :type substitution_map: dict
+
+    :return: The parsed document or None if the template is not valid.
+    :rtype: QDomDocument
+
+    .. versionadded:: 4.2
+    """
+    modification_time = os.path.getmtime(template_path)
+    cached = TEMPLATES.get(template_path)
+    if not cached or cached[0] != modification_time:
+        with open(template_path) as template_file:
+            content = get_unicode(template_file.read())
+        cached = (modification_time, content)
+        TEMPLATES[template_path] = cached
+
+    content = cached[1]
+    for key, value in (substitution_map or {}).iteritems():
+        content = content.replace(
+            u'[%s]' % key, _encode_for_xml(get_unicode(value)))
+
+    document = QtXml.QDomDocument()
+    if not document.setContent(content):
+        return None
+    return document
+
+
+def clear_template_cache():
+    """Forget every composer template read."""
+    TEMPLATES.clear()
+
+
+def _encode_for_xml(text):
+    """Escape a text like QgsComposition.encodeStringForXML.
+
+    :param text: The text.
+    :type text: unicode
+
+    :return: The escaped text.
+    :rtype: unicode
+    """
+    return (
+        text.replace(u'&', u'&amp;')
+        .replace(u'"', u'&quot;')
+        .replace(u"'", u'&apos;')
+        .replace(u'<', u'&lt;')
+        .replace(u'>', u'&gt;'))
+
+
 def qgis_composer_renderer(impact_report, component):
     """Default Map Report Renderer using QGIS Composer.
 
@@ -406,14 +501,9 @@ def qgis_composer_renderer(impact_report, component):
     main_template_folder = impact_report.metadata.template_folder
     template_path = os.path.join(main_template_folder, component.template)
 
-    with open(template_path) as template_file:
-        template_content = template_file.read()
-
-    document = QtXml.QDomDocument()
-    document.setContent(template_content)
-
-    load_status = composition.loadFromTemplate(
-        document, context.substitution_map)
+    document = composer_template(template_path, context.substitution_map)
+    load_status = document is not None and composition.loadFromTemplate(
+        document, None)
 
     if not load_status:
         raise TemplateLoadingError(
@@ -640,14 +730,6 @@ def qt_svg_to_png_renderer(impact_report, component):
     filepath = context['filepath']
     width = component.extra_args['width']
     height = component.extra_args['height']
-    image_format = QImage.Format_ARGB32
-    qimage = QImage(width, height, image_format)
-    qimage.fill(0x00000000)
-    renderer = QSvgRenderer(filepath)
-    painter = QPainter(qimage)
-    renderer.render(painter)
-    # Should call painter.end() so that QImage is not used
-    painter.end()
 
     # in case output folder not specified
     if impact_report.output_folder is None:
@@ -655,15 +737,150 @@ def qt_svg_to_png_renderer(impact_report, component):
     output_path = impact_report.component_absolute_output_path(
         component.key)
 
-    qimage.save(output_path)
+    # Without a key from the extractor, the key is the SVG content.
+    chart_key = context.get('cache_key')
+    if not chart_key:
+        with open(filepath, 'rb') as svg_file:
+            chart_key = hashlib.sha1(svg_file.read()).hexdigest()
+    chart_key = _chart_key('png', chart_key, width, height)
+
+    png = _cached_chart(chart_key)
+    if png is None:
+        start = time.time()
+        image_format = QImage.Format_ARGB32
+        qimage = QImage(width, height, image_format)
+        qimage.fill(0x00000000)
+        renderer = QSvgRenderer(filepath)
+        painter = QPainter(qimage)
+        renderer.render(painter)
+        # Should call painter.end() so that QImage is not used
+        painter.end()
+
+        qimage.save(output_path)
+        with open(output_path, 'rb') as png_file:
+            _cache_chart(chart_key, png_file.read(), time.time() - start)
+    else:
+        with open(output_path, 'wb') as png_file:
+            png_file.write(png)
 
     component.output = output_path
     return component.output
 
 
-def atlas_renderer(composition, coverage_layer, output_path, file_format):
+def _chart_key(*args):
+    """Content key of a rendered chart.
+
+    :param args: Everything the rendering depends on: the chart key of the
+        context, the template or the output format and the size.
+
+    :return: SHA1 hex digest.
+    :rtype: str
+    """
+    return hashlib.sha1(repr(args)).hexdigest()
+
+
+def _cached_chart(chart_key):
+    """Chart already rendered with this key.
+
+    Hits and time saved are logged and counted in CHART_CACHE_STATISTICS.
+
+    :param chart_key: The content key, None if the chart can't be reused.
+    :type chart_key: str
+
+    :return: The rendered chart or None if it has not been rendered yet.
+    :rtype: basestring
+    """
+    if not chart_key:
+        return None
+    if chart_key not in CHARTS:
+        CHART_CACHE_STATISTICS['misses'] += 1
+        return None
+
+    # The chart is now the most recently used.
+    rendered, duration = CHARTS[chart_key] = CHARTS.pop(chart_key)
+    CHART_CACHE_STATISTICS['hits'] += 1
+    CHART_CACHE_STATISTICS['time_saved'] += duration
+    LOGGER.info(
+        'Chart reused from the cache, %.3f s saved. Chart cache: %s hits, '
+        '%s misses, %.3f s saved.' % (
+            duration,
+            CHART_CACHE_STATISTICS['hits'],
+            CHART_CACHE_STATISTICS['misses'],
+            CHART_CACHE_STATISTICS['time_saved']))
+    return rendered
+
+
+def _cache_chart(chart_key, rendered, duration):
+    """Keep a rendered chart for the next reports.
+
+    If the cache is full, the least recently used chart is forgotten.
+
+    :param chart_key: The content key, None if the chart can't be reused.
+    :type chart_key: str
+
+    :param rendered: The rendered chart.
+    :type rendered: basestring
+
+    :param duration: The time spent to render it, in seconds.
+    :type duration: float
+    """
+    if chart_key:
+        CHARTS.pop(chart_key, None)
+        CHARTS[chart_key] = (rendered, duration)
+        while len(CHARTS) > chart_cache_size:
+            CHARTS.popitem(last=False)
+
+
+def new_charts(known_keys):
+    """Charts rendered since the cache had only the given keys.
+
+    A forked process fills its own copy of the cache, these charts are sent
+    back to the parent process to be added with cache_charts.
+
+    .. versionadded:: 4.2
+
+    :param known_keys: The keys of the cache before rendering.
+    :type known_keys: set
+
+    :return: The rendered chart and the time spent to render it, by key.
+    :rtype: dict
+    """
+    return dict(
+        (chart_key, chart) for chart_key, chart in CHARTS.iteritems()
+        if chart_key not in known_keys)
+
+
+def cache_charts(charts):
+    """Keep charts rendered in another process for the next reports.
+
+    .. versionadded:: 4.2
+
+    :param charts: The charts from new_charts.
+    :type charts: dict
+    """
+    for chart_key, (rendered, duration) in charts.iteritems():
+        _cache_chart(chart_key, rendered, duration)
+
+
+def clear_chart_cache():
+    """Forget every chart rendered and reset the cache statistics.
+
+    .. versionadded:: 4.2
+    """
+    CHARTS.clear()
+    CHART_CACHE_STATISTICS.update(hits=0, misses=0, time_saved=0.0)
+
+
+def atlas_renderer(
+        composition, coverage_layer, output_path, file_format,
+        processes=None):
     """Extract composition using atlas generation.
 
+    If the atlas is not on a single file, every page is a PDF file of its
+    own. Pages are then rendered by batches in forked processes, each one
+    with its own copy of the composition, and output paths are returned in
+    page order. An atlas on a single file is always rendered sequentially.
+
     :param composition: QGIS Composition object used for producing the report.
     :type composition: qgis.core.QgsComposition
 
@@ -676,6 +893,10 @@ def atlas_renderer(composition, coverage_layer, output_path, file_format):
     :param file_format: File format of map output, 'pdf' or 'png'.
     :type file_format: str
 
+    :param processes: The number of processes rendering pages. Default to the
+        atlasProcesses setting.
+    :type processes: int
+
     :return: Generated output path(s).
     :rtype: str, list
     """
@@ -735,37 +956,128 @@ def atlas_renderer(composition, coverage_layer, output_path, file_format):
 
         LOGGER.info('Exporting Atlas')
 
-        atlas_output = []
+        if not atlas_on_single_file:
+            if processes is None:
+                processes = setting('atlasProcesses', expected_type=int)
+            atlas_output = _render_atlas_files(
+                composition, output_directory, processes)
+            atlas_composition.endRender()
+            return atlas_output
+
         for feature_index in range(atlas_composition.numFeatures()):
             if not atlas_composition.prepareForFeature(feature_index):
                 msg = ('Atlas processing error: Exporting atlas error at '
                        'feature number {index}').format(index=feature_index)
                 LOGGER.error(msg)
                 return
-            if not atlas_on_single_file:
-                # we need another printer object fot multi file atlas
-                multi_file_printer = QPrinter(QPrinter.HighResolution)
-                current_filename = atlas_composition.currentFilename()
-                output_path = os.path.join(
-                    output_directory, current_filename + '.pdf')
-                composition.beginPrintAsPDF(multi_file_printer, output_path)
-                composition.beginPrint(multi_file_printer)
-                if not painter.begin(multi_file_printer):
-                    msg = ('Atlas processing error: Cannot write to '
-                           '{output}.').format(output=output_path)
-                    LOGGER.error(msg)
-                    return
-                composition.doPrint(multi_file_printer, painter)
-                painter.end()
-                composition.georeferenceOutput(output_path)
-                atlas_output.append(output_path)
-            else:
-                composition.doPrint(printer, painter, feature_index > 0)
+            composition.doPrint(printer, painter, feature_index > 0)
 
         atlas_composition.endRender()
+        painter.end()
+        return output_path
+
+
+def _render_atlas_files(composition, output_directory, processes):
+    """Render each atlas page in its own PDF file.
+
+    The atlas must be ready, between beginRender and endRender.
+
+    :param composition: The composition in atlas mode.
+    :type composition: qgis.core.QgsComposition
+
+    :param output_directory: The directory of PDF files.
+    :type output_directory: str
+
+    :param processes: The number of processes.
+    :type processes: int
+
+    :return: Output paths in page order, None if a page failed.
+    :rtype: list
+    """
+    page_count = composition.atlasComposition().numFeatures()
+    if processes > 1 and page_count >= atlas_parallel_minimum:
+        # Each batch is a range of pages, forked processes find the
+        # composition in _ATLAS_RENDERING.
+        batch_count = min(page_count, processes * 4)
+        bounds = [
+            page_count * i // batch_count for i in range(batch_count + 1)]
+        batches = zip(bounds[:-1], bounds[1:])
+        _ATLAS_RENDERING['composition'] = composition
+        _ATLAS_RENDERING['output_directory'] = output_directory
+        try:
+            results = parallel_map(_render_atlas_batch, batches, processes)
+        finally:
+            _ATLAS_RENDERING.clear()
+        atlas_output = [path for batch in results for path in batch]
+    else:
+        painter = QPainter()
+        atlas_output = []
+        for feature_index in range(page_count):
+            path = _render_atlas_page(
+                composition, output_directory, feature_index, painter)
+            if not path:
+                return
+            atlas_output.append(path)
+
+    if None in atlas_output:
+        return
+    return atlas_output
+
+
+def _render_atlas_batch(pages):
+    """Render a range of atlas pages, in a forked process.
+
+    :param pages: Tuple (first page, last page + 1).
+    :type pages: tuple
+
+    :return: Output paths, None for a page which failed.
+    :rtype: list
+    """
+    composition = _ATLAS_RENDERING['composition']
+    output_directory = _ATLAS_RENDERING['output_directory']
+    painter = QPainter()
+    return [
+        _render_atlas_page(composition, output_directory, index, painter)
+        for index in range(*pages)]
 
-        if atlas_on_single_file:
-            painter.end()
-            return output_path
 
-        return atlas_output
+def _render_atlas_page(composition, output_directory, feature_index, painter):
+    """Render one atlas page in its own PDF file.
+
+    :param composition: The composition in atlas mode.
+    :type composition: qgis.core.QgsComposition
+
+    :param output_directory: The directory of PDF files.
+    :type output_directory: str
+
+    :param feature_index: The index of the atlas feature.
+    :type feature_index: int
+
+    :param painter: The painter to use.
+    :type painter: QPainter
+
+    :return: The output path or None if the page failed.
+    :rtype: str
+    """
+    atlas_composition = composition.atlasComposition()
+    if not atlas_composition.prepareForFeature(feature_index):
+        msg = ('Atlas processing error: Exporting atlas error at '
+               'feature number {index}').format(index=feature_index)
+        LOGGER.error(msg)
+        return None
+
+    # we need another printer object fot multi file atlas
+    printer = QPrinter(QPrinter.HighResolution)
+    current_filename = atlas_composition.currentFilename()
+    output_path = os.path.join(output_directory, current_filename + '.pdf')
+    composition.beginPrintAsPDF(printer, output_path)
+    composition.beginPrint(printer)
+    if not painter.begin(printer):
+        msg = ('Atlas processing error: Cannot write to '
+               '{output}.').format(output=output_path)
+        LOGGER.error(msg)
+        return None
+    composition.doPrint(printer, painter)
+    painter.end()
+    composition.georeferenceOutput(output_path)
+    return output_path
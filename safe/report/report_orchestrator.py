@@ -0,0 +1,119 @@
+# coding=utf-8
+
+"""Generate many reports of the same analysis concurrently.
+
+The impact report, the map report and the infographic are independent: they
+only read the layers of the impact function. Each report is generated in its
+own forked process, which inherits the impact function, the layers and the
+reports, so nothing has to be pickled except the outputs of the components.
+The charts rendered in these processes are sent back too, so they are in the
+chart cache of the parent process for the next reports.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+
+from safe.report.processors.default import (
+    CHARTS, cache_charts, new_charts)
+from safe.utilities.parallel import parallel_map
+from safe.utilities.settings import setting
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# Reports being generated. It is set before forking so that the processes
+# inherit them, an ImpactReport can't be pickled.
+_ORCHESTRATION = {}
+
+
+class ReportOrchestrator(object):
+
+    """Generate a list of impact reports, each one in its own process.
+
+    .. versionadded:: 4.2
+    """
+
+    def __init__(self, impact_reports, processes=None):
+        """Constructor.
+
+        :param impact_reports: The reports to generate, with their output
+            folder set.
+        :type impact_reports: list
+
+        :param processes: The maximum number of processes. If not set, the
+            reportProcesses setting is used.
+        :type processes: int
+        """
+        self.impact_reports = impact_reports
+        if processes is None:
+            processes = setting('reportProcesses', expected_type=int)
+        self.processes = processes
+
+        # Report key -> OrderedDict component key -> time in seconds.
+        self.timings = OrderedDict()
+        self.duration = None
+
+    def process(self):
+        """Generate all reports.
+
+        :return: List of tuple of error code and message, for each report.
+        :rtype: list
+        """
+        start = time.time()
+        _ORCHESTRATION['reports'] = self.impact_reports
+        try:
+            results = parallel_map(
+                _process_report,
+                range(len(self.impact_reports)),
+                min(self.processes, len(self.impact_reports)))
+        finally:
+            _ORCHESTRATION.clear()
+
+        self.timings = OrderedDict()
+        status = []
+        for impact_report, result in zip(self.impact_reports, results):
+            error_code, message, outputs, timings, duration, charts = result
+            cache_charts(charts)
+            for component in impact_report.metadata.components:
+                if component.key in outputs:
+                    component.output = outputs[component.key]
+            self.timings[impact_report.metadata.key] = timings
+            LOGGER.info('Report %s generated in %.2f s.' % (
+                impact_report.metadata.key, duration))
+            status.append((error_code, message))
+
+        self.duration = time.time() - start
+        return status
+
+
+def _process_report(index):
+    """Generate a report of the orchestration, in any process.
+
+    :param index: The index of the report.
+    :type index: int
+
+    :return: Tuple of error code, message, outputs of components by key,
+        timings of components, the time spent on the report and the charts
+        rendered for the report.
+    :rtype: tuple
+    """
+    impact_report = _ORCHESTRATION['reports'][index]
+    start = time.time()
+    known_charts = set(CHARTS)
+    error_code, message = impact_report.process_components()
+    outputs = dict(
+        (component.key, component.output)
+        for component in impact_report.metadata.components
+        if component.output is not None)
+    return (
+        error_code,
+        message,
+        outputs,
+        impact_report.timings,
+        time.time() - start,
+        new_charts(known_charts))
@@ -0,0 +1,177 @@
+# coding=utf-8
+"""Test the cache of rendered charts."""
+
+import unittest
+
+from safe.test.utilities import get_qgis_app
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from qgis.core import QGis
+
+from safe.common.utilities import safe_dir, temp_dir
+from safe.definitions.reports import (
+    jinja2_component_type,
+    png_product_tag,
+    qt_renderer_component_type,
+    svg_product_tag)
+from safe.gis.vector.tools import create_memory_layer
+from safe.impact_function.impact_function import ImpactFunction
+from safe.report.extractors.infographic_elements.svg_charts import (
+    DonutChartContext)
+from safe.report.extractors.population_chart import (
+    population_chart_to_png_extractor)
+from safe.report.impact_report import ImpactReport
+from safe.report.processors import default
+from safe.report.processors.default import (
+    CHARTS,
+    CHART_CACHE_STATISTICS,
+    cache_charts,
+    clear_chart_cache,
+    jinja2_renderer,
+    new_charts,
+    qt_svg_to_png_renderer)
+from safe.report.report_metadata import (
+    Jinja2ComponentsMetadata,
+    ReportMetadata)
+from safe.report.report_orchestrator import ReportOrchestrator
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+def donut_chart(data):
+    """Donut chart with the given data."""
+    return DonutChartContext(
+        data=data,
+        labels=['Wet', 'Dry'],
+        colors=['#f03b20', '#1a9641'],
+        inner_radius_ratio=0.5,
+        title='Population',
+        total_header='Affected',
+        as_file=True)
+
+
+def chart_report_metadata(data):
+    """Metadata of a report with a donut chart, in SVG then in PNG."""
+    return {
+        'key': 'chart-cache',
+        'name': 'chart-cache',
+        'template_folder': safe_dir(sub_dir='../resources/report-templates/'),
+        'components': [
+            {
+                'key': 'population-chart',
+                'type': jinja2_component_type,
+                'processor': jinja2_renderer,
+                'extractor': lambda impact_report, component: {
+                    'context': donut_chart(data)},
+                'output_format': Jinja2ComponentsMetadata.OutputFormat.File,
+                'output_path': 'population-chart.svg',
+                'template': 'standard-template/jinja2/svg/donut-chart.svg',
+                'tags': [svg_product_tag],
+            },
+            {
+                'key': 'population-chart-png',
+                'type': qt_renderer_component_type,
+                'processor': qt_svg_to_png_renderer,
+                'extractor': population_chart_to_png_extractor,
+                'output_format': Jinja2ComponentsMetadata.OutputFormat.File,
+                'output_path': 'population-chart.png',
+                'tags': [png_product_tag],
+                'extra_args': {
+                    'width': 256,
+                    'height': 256
+                }
+            },
+        ]
+    }
+
+
+class TestChartCache(unittest.TestCase):
+
+    """Test the cache of rendered charts."""
+
+    def setUp(self):
+        clear_chart_cache()
+
+    def tearDown(self):
+        clear_chart_cache()
+
+    def chart_report(self, data, output_folder='test_chart_cache'):
+        """The report of a chart."""
+        impact_report = ImpactReport(
+            iface=IFACE,
+            template_metadata=ReportMetadata(
+                metadata_dict=chart_report_metadata(data)),
+            impact_function=ImpactFunction(),
+            impact=create_memory_layer('impact', QGis.Polygon))
+        impact_report.output_folder = temp_dir(output_folder)
+        return impact_report
+
+    def render(self, data):
+        """Render the chart report and return the PNG content."""
+        impact_report = self.chart_report(data)
+        error_code, message = impact_report.process_components()
+        self.assertEqual(
+            error_code, ImpactReport.REPORT_GENERATION_SUCCESS,
+            message.to_text())
+        png_path = impact_report.metadata.component_by_key(
+            'population-chart-png').output
+        with open(png_path, 'rb') as png_file:
+            return png_file.read()
+
+    def test_cache_key(self):
+        """Test the key of a chart depends on its data."""
+        self.assertEqual(
+            donut_chart([30, 40]).cache_key, donut_chart([30, 40]).cache_key)
+        self.assertNotEqual(
+            donut_chart([30, 40]).cache_key, donut_chart([40, 30]).cache_key)
+        self.assertIsNone(DonutChartContext().cache_key)
+
+    def test_chart_cache(self):
+        """Test a chart with the same data is not rendered again."""
+        png = self.render([30, 40])
+        self.assertEqual(CHART_CACHE_STATISTICS['hits'], 0)
+        self.assertEqual(CHART_CACHE_STATISTICS['misses'], 2)
+
+        # The SVG and the PNG come from the cache.
+        self.assertEqual(self.render([30, 40]), png)
+        self.assertEqual(CHART_CACHE_STATISTICS['hits'], 2)
+
+        self.render([40, 30])
+        self.assertEqual(CHART_CACHE_STATISTICS['hits'], 2)
+        self.assertEqual(CHART_CACHE_STATISTICS['misses'], 4)
+
+    def test_least_recently_used(self):
+        """Test the least recently used charts are forgotten first."""
+        chart_cache_size = default.chart_cache_size
+        default.chart_cache_size = 2
+        try:
+            cache_charts({'first': ('1', 1.0)})
+            cache_charts({'second': ('2', 1.0)})
+            # The first chart is used, so the second one is forgotten.
+            self.assertEqual(default._cached_chart('first'), '1')
+            cache_charts({'third': ('3', 1.0)})
+            self.assertListEqual(CHARTS.keys(), ['first', 'third'])
+            self.assertDictEqual(
+                new_charts({'first'}), {'third': ('3', 1.0)})
+        finally:
+            default.chart_cache_size = chart_cache_size
+
+    def test_charts_from_processes(self):
+        """Test charts rendered in other processes are in the cache."""
+        orchestrator = ReportOrchestrator(
+            [
+                self.chart_report([30, 40], 'test_chart_cache_1'),
+                self.chart_report([40, 30], 'test_chart_cache_2')],
+            processes=2)
+        for error_code, message in orchestrator.process():
+            self.assertEqual(
+                error_code, ImpactReport.REPORT_GENERATION_SUCCESS,
+                message.to_text())
+        # The SVG and the PNG of each report.
+        self.assertEqual(len(CHARTS), 4)
+        hits = CHART_CACHE_STATISTICS['hits']
+        self.render([30, 40])
+        self.assertEqual(CHART_CACHE_STATISTICS['hits'], hits + 2)
@@ -0,0 +1,68 @@
+# coding=utf-8
+"""Test the composer template cache."""
+
+import os
+import shutil
+import unittest
+
+from safe.test.utilities import get_qgis_app
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from safe.common.utilities import unique_filename, temp_dir
+from safe.report.processors.default import (
+    composer_template,
+    clear_template_cache,
+    TEMPLATES,
+)
+from safe.utilities.resources import resources_path
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+class TestComposerTemplate(unittest.TestCase):
+
+    """Test the composer template cache."""
+
+    def setUp(self):
+        clear_template_cache()
+
+    def tearDown(self):
+        clear_template_cache()
+
+    def test_composer_template(self):
+        """Test a template is read once and text is substituted."""
+        template_path = unique_filename(
+            suffix='.qpt', dir=temp_dir('test_composer_template'))
+        shutil.copy(
+            resources_path(
+                'qgis-composer-templates', 'a4-portrait-blue.qpt'),
+            template_path)
+
+        title = u'Flood <impact> & "damage"'
+        document = composer_template(
+            template_path, {'impact-title': title})
+        self.assertIsNotNone(document)
+        self.assertIn(template_path, TEMPLATES)
+        content = TEMPLATES[template_path][1]
+        self.assertIn(u'[impact-title]', content)
+
+        text = document.toString()
+        self.assertNotIn(u'[impact-title]', text)
+        self.assertIn(u'Flood &lt;impact', text)
+
+        # The cached content is not modified by the substitution.
+        composer_template(template_path, {'impact-title': u'Earthquake'})
+        self.assertIs(content, TEMPLATES[template_path][1])
+
+        # A modified template is read again.
+        with open(template_path, 'w') as template_file:
+            template_file.write('<Composer>[impact-title]</Composer>')
+        modification_time = TEMPLATES[template_path][0] + 10
+        os.utime(template_path, (modification_time, modification_time))
+        document = composer_template(
+            template_path, {'impact-title': u'Earthquake'})
+        self.assertEqual(
+            document.documentElement().text(), u'Earthquake')
@@ -0,0 +1,165 @@
+# coding=utf-8
+
+"""Benchmark the atlas export with a synthetic coverage layer.
+
+A grid of polygons is used as the coverage layer of a composition with a
+single map, and the atlas is exported with one PDF file per page. The
+throughput in pages per second is measured for each number of processes:
+
+    python -m safe.test.benchmark.atlas --pages 500 --processes 1 2 4
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from math import ceil, sqrt
+
+from safe.test.utilities import get_qgis_app
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from qgis.core import (
+    QGis,
+    QgsComposerMap,
+    QgsComposition,
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsGeometry,
+    QgsMapLayerRegistry,
+    QgsMapSettings,
+    QgsRectangle,
+)
+
+from safe.common.utilities import temp_dir
+from safe.gis.vector.feature_writer import FeatureWriter
+from safe.gis.vector.tools import create_memory_layer
+from safe.report.processors.default import atlas_renderer
+from safe.report.report_metadata import QgisComposerComponentsMetadata
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+
+def synthetic_coverage_layer(feature_count):
+    """Create a grid of square polygons in EPSG:4326.
+
+    :param feature_count: The number of polygons.
+    :type feature_count: int
+
+    :return: The memory layer.
+    :rtype: QgsVectorLayer
+    """
+    layer = create_memory_layer(
+        'coverage',
+        QGis.Polygon,
+        QgsCoordinateReferenceSystem('EPSG:4326'))
+    size = int(ceil(sqrt(feature_count)))
+    with FeatureWriter(layer) as writer:
+        for i in range(feature_count):
+            x = 106.0 + (i % size) * 0.01
+            y = -6.0 - (i // size) * 0.01
+            feature = QgsFeature()
+            feature.setGeometry(QgsGeometry.fromRect(
+                QgsRectangle(x, y - 0.01, x + 0.01, y)))
+            writer.addFeature(feature)
+    return layer
+
+
+def atlas_composition(layer):
+    """Create a composition with a map driven by the atlas.
+
+    :param layer: The coverage layer, also displayed in the map.
+    :type layer: QgsVectorLayer
+
+    :return: The composition.
+    :rtype: QgsComposition
+    """
+    map_settings = QgsMapSettings()
+    map_settings.setLayers([layer.id()])
+    map_settings.setDestinationCrs(layer.crs())
+    map_settings.setExtent(layer.extent())
+
+    composition = QgsComposition(map_settings)
+    composer_map = QgsComposerMap(composition, 10, 10, 190, 277)
+    composer_map.setId('impact-map')
+    composition.addComposerMap(composer_map)
+
+    atlas = composition.atlasComposition()
+    atlas.setEnabled(True)
+    atlas.setSingleFile(False)
+    atlas.setFilenamePattern("'page_'||@atlas_featurenumber")
+    return composition
+
+
+def benchmark_atlas(feature_count, processes):
+    """Export an atlas and measure the page throughput.
+
+    :param feature_count: The number of pages.
+    :type feature_count: int
+
+    :param processes: The number of processes rendering pages.
+    :type processes: int
+
+    :return: The benchmark, with the wall time, pages per second and the
+        output files in page order.
+    :rtype: dict
+    """
+    layer = synthetic_coverage_layer(feature_count)
+    QgsMapLayerRegistry.instance().addMapLayer(layer)
+    try:
+        composition = atlas_composition(layer)
+        output_directory = temp_dir(sub_dir='benchmark_atlas_%s' % processes)
+        start = time.time()
+        output = atlas_renderer(
+            composition,
+            layer,
+            os.path.join(output_directory, 'atlas.pdf'),
+            QgisComposerComponentsMetadata.OutputFormat.PDF,
+            processes=processes)
+        wall_time = time.time() - start
+    finally:
+        QgsMapLayerRegistry.instance().removeMapLayer(layer.id())
+
+    output = output or []
+    return {
+        'processes': processes,
+        'pages': len(output),
+        'wall_time': wall_time,
+        'pages_per_second': len(output) / wall_time if wall_time else None,
+        'output': [os.path.basename(path) for path in output],
+    }
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--pages', type=int, default=500, help='Number of atlas pages.')
+    parser.add_argument(
+        '--processes', nargs='*', type=int, default=[1, 2, 4],
+        help='Number of processes, for each run.')
+    arguments = parser.parse_args()
+
+    reference = None
+    for processes in arguments.processes:
+        result = benchmark_atlas(arguments.pages, processes)
+        print '%s processes : %s pages in %.1f s, %.2f pages/s' % (
+            processes,
+            result['pages'],
+            result['wall_time'],
+            result['pages_per_second'] or 0)
+        if reference is None:
+            reference = result['output']
+        elif result['output'] != reference:
+            print 'The output differs from the first run.'
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
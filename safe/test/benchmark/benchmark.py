@@ -0,0 +1,400 @@
+# coding=utf-8
+
+"""Benchmark the impact function with the JSON scenarios.
+
+Each scenario is run end to end, with the test data or with bigger synthetic
+data. Every function decorated with @profile (union, intersection, clip,
+assign_highest_value, zonal_stats, summaries, post processors ...) is timed
+inside the analysis thanks to the profiling tree, so we get a benchmark per
+algorithm with real inputs.
+
+Results are saved in a JSON file which can be compared with a baseline:
+
+    python -m safe.test.benchmark.benchmark \
+        --features 10000 100000 --raster-sizes 1000 4000 \
+        --output results.json --baseline baseline.json --threshold 0.2
+
+Each run is done in a new process so the peak memory is not shared between
+scenarios.
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from os.path import basename, join, isfile, splitext
+
+from safe.test.utilities import get_qgis_app, standard_data_path
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from osgeo import gdal
+from safe.common.utilities import unique_filename, temp_dir
+from safe.common.version import get_version
+from safe.impact_function.test.test_impact_function import (
+    read_json_flow, run_scenario, scenario_layer_path)
+from safe.test.benchmark.synthetic_data import scale_layer
+from safe.utilities.gis import qgis_version
+from safe.utilities.profiling import profiling_log
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# Steps which are lower than this duration in seconds are not compared.
+minimum_duration = 0.1
+
+
+def peak_memory():
+    """Peak resident memory of the current process.
+
+    :return: The peak memory in MB or None if it's not available.
+    :rtype: float
+    """
+    if not resource:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # Bytes on OSX, kilobytes on Linux.
+        return peak / 1024.0 / 1024.0
+    return peak / 1024.0
+
+
+def profiling_steps(tree, steps=None):
+    """Flatten the profiling tree, grouped by function.
+
+    :param tree: The profiling tree.
+    :type tree: safe.utilities.profiling.Tree
+
+    :param steps: The dictionary to update. Default to a new one.
+    :type steps: dict
+
+    :return: A dictionary function name -> time, calls, features and features
+        per second.
+    :rtype: dict
+    """
+    if steps is None:
+        steps = {}
+
+    step = steps.setdefault(
+        tree.key, {'time': 0.0, 'calls': 0, 'features': None})
+    step['time'] += tree.elapsed_time or 0.0
+    step['calls'] += 1
+    if tree.feature_count is not None:
+        step['features'] = (step['features'] or 0) + tree.feature_count
+    if step['features'] is not None and step['time']:
+        step['features_per_second'] = step['features'] / step['time']
+    else:
+        step['features_per_second'] = None
+
+    for child in tree.children:
+        profiling_steps(child, steps)
+    return steps
+
+
+def scale_scenario(
+        scenario, feature_count=None, raster_size=None, scale_hazard=False):
+    """Replace layers in a scenario by bigger synthetic layers.
+
+    The aggregation layer is never scaled.
+
+    :param scenario: Dictionary of hazard, exposure, and aggregation.
+    :type scenario: dict
+
+    :param feature_count: The minimum number of features for vector layers.
+    :type feature_count: int
+
+    :param raster_size: The number of pixels of the longest side for raster
+        layers.
+    :type raster_size: int
+
+    :param scale_hazard: If we should scale a vector hazard too. Rasters are
+        always scaled. Default to False.
+    :type scale_hazard: bool
+
+    :return: The new scenario.
+    :rtype: dict
+    """
+    scenario = dict(scenario)
+    scenario['exposure'] = scale_layer(
+        scenario_layer_path(scenario, 'exposure'), feature_count, raster_size)
+    scenario['hazard'] = scale_layer(
+        scenario_layer_path(scenario, 'hazard'),
+        feature_count if scale_hazard else None,
+        raster_size)
+    return scenario
+
+
+def benchmark_scenario(
+        json_path,
+        feature_count=None,
+        raster_size=None,
+        scale_hazard=False,
+        repeat=1):
+    """Run a scenario and measure it.
+
+    :param json_path: Path to json file.
+    :type json_path: str
+
+    :param feature_count: The minimum number of features for vector layers.
+        Default to None, the test data is used.
+    :type feature_count: int
+
+    :param raster_size: The number of pixels of the longest side for raster
+        layers. Default to None, the test data is used.
+    :type raster_size: int
+
+    :param scale_hazard: If we should scale a vector hazard too.
+    :type scale_hazard: bool
+
+    :param repeat: The number of runs, the fastest one is kept.
+    :type repeat: int
+
+    :return: The benchmark of the scenario.
+    :rtype: dict
+    """
+    scenario, _, _ = read_json_flow(json_path)
+    scenario = scale_scenario(
+        scenario, feature_count, raster_size, scale_hazard)
+
+    result = None
+    for _ in range(repeat):
+        start = time.time()
+        status, message, _ = run_scenario(scenario)
+        wall_time = time.time() - start
+
+        if status != 0:
+            return {
+                'status': status,
+                'message': str(message),
+            }
+
+        if result is None or wall_time < result['wall_time']:
+            result = {
+                'status': status,
+                'wall_time': wall_time,
+                'steps': profiling_steps(profiling_log()),
+            }
+
+    result['peak_memory'] = peak_memory()
+    result['exposure'] = scenario['exposure']
+    result['hazard'] = scenario['hazard']
+    return result
+
+
+def compare_results(results, baseline, threshold=0.1):
+    """Compare benchmark results with a baseline.
+
+    :param results: The benchmark results.
+    :type results: dict
+
+    :param baseline: The benchmark results of the baseline.
+    :type baseline: dict
+
+    :param threshold: The tolerance, as a ratio of the baseline value.
+    :type threshold: float
+
+    :return: The list of regressions as human readable strings.
+    :rtype: list
+    """
+    regressions = []
+
+    def check(name, value, reference, unit):
+        """Helper to check one value."""
+        if value is None or not reference:
+            return
+        if value > reference * (1 + threshold):
+            regressions.append(
+                '{name} : {value:.3f} {unit} instead of {reference:.3f} '
+                '{unit} (+{ratio:.0%})'.format(
+                    name=name,
+                    value=value,
+                    reference=reference,
+                    unit=unit,
+                    ratio=value / reference - 1))
+
+    for name, result in sorted(results['scenarios'].items()):
+        reference = baseline['scenarios'].get(name)
+        if not reference or 'wall_time' not in reference:
+            continue
+        if 'wall_time' not in result:
+            regressions.append('{name} : failed'.format(name=name))
+            continue
+
+        check(name, result['wall_time'], reference['wall_time'], 's')
+        check(
+            name + ' memory',
+            result.get('peak_memory'),
+            reference.get('peak_memory'),
+            'MB')
+        for step, value in sorted(result['steps'].items()):
+            reference_step = reference['steps'].get(step)
+            if not reference_step:
+                continue
+            if reference_step['time'] < minimum_duration:
+                continue
+            check(
+                '{name} {step}'.format(name=name, step=step),
+                value['time'],
+                reference_step['time'],
+                's')
+
+    return regressions
+
+
+def scenario_files(paths=None):
+    """List enabled JSON scenarios.
+
+    :param paths: List of JSON paths. Default to the scenario directory.
+    :type paths: list
+
+    :return: The list of JSON paths.
+    :rtype: list
+    """
+    if not paths:
+        directory = standard_data_path('scenario')
+        paths = [
+            join(directory, f) for f in sorted(os.listdir(directory))
+            if isfile(join(directory, f)) and f.endswith('.json')]
+    return [
+        path for path in paths if read_json_flow(path)[0].get('enable', True)]
+
+
+def run_in_process(json_path, feature_count, raster_size, arguments):
+    """Run the benchmark of a scenario in a new process.
+
+    :param json_path: Path to json file.
+    :type json_path: str
+
+    :param feature_count: The minimum number of features for vector layers.
+    :type feature_count: int
+
+    :param raster_size: The number of pixels of the longest side for raster
+        layers.
+    :type raster_size: int
+
+    :param arguments: The command line arguments.
+    :type arguments: argparse.Namespace
+
+    :return: The benchmark of the scenario.
+    :rtype: dict
+    """
+    output = unique_filename(suffix='.json', dir=temp_dir(sub_dir='benchmark'))
+    command = [
+        sys.executable, '-m', 'safe.test.benchmark.benchmark',
+        json_path,
+        '--single',
+        '--repeat', str(arguments.repeat),
+        '--output', output]
+    if feature_count:
+        command.extend(['--features', str(feature_count)])
+    if raster_size:
+        command.extend(['--raster-sizes', str(raster_size)])
+    if arguments.scale_hazard:
+        command.append('--scale-hazard')
+
+    status = subprocess.call(command)
+    if status != 0 or not isfile(output):
+        return {'status': status, 'message': 'The process crashed.'}
+    with open(output) as json_file:
+        return json.load(json_file)
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        'scenarios', nargs='*',
+        help='JSON scenarios. Default to every enabled scenario.')
+    parser.add_argument(
+        '--features', nargs='*', type=int, default=[],
+        help='Number of features of vector layers, for each scale.')
+    parser.add_argument(
+        '--raster-sizes', nargs='*', type=int, default=[],
+        help='Size in pixels of raster layers, for each scale.')
+    parser.add_argument(
+        '--scale-hazard', action='store_true',
+        help='Scale vector hazard layers too.')
+    parser.add_argument(
+        '--repeat', type=int, default=1,
+        help='Number of runs of each scenario, the fastest one is kept.')
+    parser.add_argument(
+        '--output', help='JSON file where the results are saved.')
+    parser.add_argument(
+        '--baseline', help='JSON file of previous results to compare with.')
+    parser.add_argument(
+        '--threshold', type=float, default=0.1,
+        help='Regression threshold, as a ratio of the baseline.')
+    parser.add_argument(
+        '--single', action='store_true', help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.single:
+        # We are in the child process.
+        result = benchmark_scenario(
+            arguments.scenarios[0],
+            arguments.features[0] if arguments.features else None,
+            arguments.raster_sizes[0] if arguments.raster_sizes else None,
+            arguments.scale_hazard,
+            arguments.repeat)
+        with open(arguments.output, 'w') as json_file:
+            json.dump(result, json_file)
+        return 0
+
+    scale_count = max(len(arguments.features), len(arguments.raster_sizes))
+    scales = [(None, None)]
+    for i in range(scale_count):
+        scales.append((
+            arguments.features[i] if i < len(arguments.features) else None,
+            arguments.raster_sizes[i]
+            if i < len(arguments.raster_sizes) else None))
+
+    results = {
+        'environment': {
+            'inasafe': get_version(),
+            'qgis': qgis_version(),
+            'gdal': gdal.VersionInfo('VERSION_NUM'),
+        },
+        'scenarios': {},
+    }
+    for json_path in scenario_files(arguments.scenarios):
+        for feature_count, raster_size in scales:
+            name = '{scenario} features={features} raster={raster}'.format(
+                scenario=splitext(basename(json_path))[0],
+                features=feature_count or 'original',
+                raster=raster_size or 'original')
+            LOGGER.info('Benchmark : %s' % name)
+            result = run_in_process(
+                json_path, feature_count, raster_size, arguments)
+            results['scenarios'][name] = result
+            print '%s : %s s' % (name, result.get('wall_time', 'failed'))
+
+    if arguments.output:
+        with open(arguments.output, 'w') as json_file:
+            json.dump(results, json_file, indent=2, sort_keys=True)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as json_file:
+            baseline = json.load(json_file)
+        regressions = compare_results(
+            results, baseline, arguments.threshold)
+        for regression in regressions:
+            print 'Regression : %s' % regression
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# coding=utf-8
+
+"""Benchmark the generation of reports after an analysis.
+
+A JSON scenario is run once, then the impact report, the map report and the
+infographic are generated with the report orchestrator, from the end of the
+analysis until every report is on disk. The wall time and the time of each
+component are measured for each number of processes:
+
+    python -m safe.test.benchmark.reports --processes 1 2 3 \
+        safe/test/data/scenario/polygon_classified_on_vector_population.json
+"""
+
+import argparse
+import logging
+import sys
+
+from safe.test.utilities import (
+    get_qgis_app, load_layer, standard_data_path)
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from qgis.core import QgsMapLayerRegistry, QgsRasterLayer, QgsVectorLayer
+
+from safe.definitions.exposure import exposure_population
+from safe.definitions.reports.infographic import map_overview
+from safe.gui.analysis_utilities import (
+    add_impact_layers_to_canvas,
+    add_layer_to_canvas,
+    create_impact_map_report,
+    create_impact_report,
+    create_infographic_report)
+from safe.impact_function.impact_function import ImpactFunction
+from safe.impact_function.test.test_impact_function import (
+    read_json_flow, scenario_layer_path)
+from safe.report.extractors.util import layer_definition_type
+from safe.report.report_orchestrator import ReportOrchestrator
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+
+def run_analysis(json_path):
+    """Run the analysis of a scenario and add its layers to the canvas.
+
+    :param json_path: Path to the JSON scenario.
+    :type json_path: basestring
+
+    :return: The impact function which has been run.
+    :rtype: ImpactFunction
+
+    :raises: Exception if the analysis failed.
+    """
+    scenario = read_json_flow(json_path)[0]
+    impact_function = ImpactFunction()
+
+    for layer_purpose in ['hazard', 'exposure']:
+        path = scenario_layer_path(scenario, layer_purpose)
+        layer = QgsVectorLayer(path, layer_purpose, 'ogr')
+        if not layer.isValid():
+            layer = QgsRasterLayer(path, layer_purpose)
+        setattr(impact_function, layer_purpose, layer)
+
+    aggregation_path = scenario_layer_path(scenario, 'aggregation')
+    if aggregation_path:
+        impact_function.aggregation = QgsVectorLayer(
+            aggregation_path, 'aggregation', 'ogr')
+
+    status, message = impact_function.prepare()
+    if status == 0:
+        status, message = impact_function.run()
+    if status != 0:
+        raise Exception(message.to_text())
+
+    add_impact_layers_to_canvas(impact_function, IFACE)
+    return impact_function
+
+
+def benchmark_reports(impact_function, processes):
+    """Generate every report of an analysis and measure the time.
+
+    :param impact_function: The impact function which has been run.
+    :type impact_function: ImpactFunction
+
+    :param processes: The number of processes generating reports.
+    :type processes: int
+
+    :return: The benchmark, with the wall time, the time of each report
+        component and the outputs of components.
+    :rtype: dict
+    """
+    impact_reports = [
+        create_impact_report(impact_function, IFACE),
+        create_impact_map_report(impact_function, IFACE)]
+
+    map_overview_layer = None
+    exposure_type = layer_definition_type(impact_function.exposure)
+    if exposure_type == exposure_population:
+        map_overview_layer = load_layer(map_overview['path'])[0]
+        add_layer_to_canvas(
+            map_overview_layer, map_overview['id'], impact_function)
+        impact_reports.append(
+            create_infographic_report(impact_function, IFACE))
+
+    try:
+        orchestrator = ReportOrchestrator(impact_reports, processes)
+        results = orchestrator.process()
+    finally:
+        if map_overview_layer:
+            QgsMapLayerRegistry.instance().removeMapLayer(
+                map_overview_layer.id())
+
+    return {
+        'processes': processes,
+        'wall_time': orchestrator.duration,
+        'failed': [
+            report.metadata.key
+            for report, (error_code, _) in zip(impact_reports, results)
+            if error_code == report.REPORT_GENERATION_FAILED],
+        'timings': orchestrator.timings,
+        'output': dict(
+            (report.metadata.key, sorted(
+                component.key for component in report.metadata.components
+                if component.output))
+            for report in impact_reports),
+    }
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        'scenario', nargs='?',
+        default=standard_data_path(
+            'scenario', 'polygon_classified_on_vector_population.json'),
+        help='The JSON scenario.')
+    parser.add_argument(
+        '--processes', nargs='*', type=int, default=[1, 2, 3],
+        help='Number of processes, for each run.')
+    arguments = parser.parse_args()
+
+    impact_function = run_analysis(arguments.scenario)
+    reference = None
+    for processes in arguments.processes:
+        result = benchmark_reports(impact_function, processes)
+        print '%s processes : reports in %.1f s' % (
+            processes, result['wall_time'])
+        for report_key, timings in result['timings'].items():
+            for component_key, duration in timings.items():
+                print '    %s %s: %.2f s' % (
+                    report_key, component_key, duration)
+        if result['failed']:
+            print 'Failed reports: %s' % ', '.join(result['failed'])
+            return 1
+        if reference is None:
+            reference = result['output']
+        elif result['output'] != reference:
+            print 'The output differs from the first run.'
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+# coding=utf-8
+
+"""Benchmark the steps of the analysis run in many processes.
+
+Each JSON scenario is run with the stepProcesses setting set to each number
+of processes, optionally with bigger synthetic data. The wall time, the
+critical path and the duration of each step are measured, and the outputs
+are compared with the first run:
+
+    python -m safe.test.benchmark.steps --processes 1 2 --features 100000
+"""
+
+import argparse
+import logging
+import sys
+import time
+from os.path import basename, splitext
+
+from safe.test.utilities import get_qgis_app
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from safe.definitions.layer_purposes import layer_purpose_profiling
+from safe.impact_function.test.test_impact_function import (
+    read_json_flow, run_scenario)
+from safe.test.benchmark.benchmark import scale_scenario, scenario_files
+from safe.utilities.settings import delete_setting, set_setting
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+
+def output_content(outputs):
+    """Geometries and attributes of the output layers, by layer purpose.
+
+    The analysis log is not included, durations are different every time.
+
+    :param outputs: The output layers of the analysis.
+    :type outputs: list
+
+    :return: The WKT geometry and the attributes of each feature.
+    :rtype: dict
+    """
+    content = {}
+    for layer in outputs:
+        purpose = layer.keywords['layer_purpose']
+        if purpose == layer_purpose_profiling['key']:
+            continue
+        features = []
+        for feature in layer.getFeatures():
+            geometry = feature.geometry()
+            features.append((
+                geometry.exportToWkt() if geometry else None,
+                feature.attributes()))
+        content[purpose] = features
+    return content
+
+
+def benchmark_steps(scenario, processes):
+    """Run a scenario with the steps in many processes and measure it.
+
+    :param scenario: Dictionary of hazard, exposure, and aggregation.
+    :type scenario: dict
+
+    :param processes: The number of processes running steps.
+    :type processes: int
+
+    :return: The benchmark, with the wall time, the step schedule and the
+        content of the outputs.
+    :rtype: dict
+    """
+    set_setting('stepProcesses', processes)
+    try:
+        start = time.time()
+        status, message, outputs = run_scenario(scenario)
+        wall_time = time.time() - start
+    finally:
+        delete_setting('stepProcesses')
+
+    if status != 0:
+        return {'processes': processes, 'error': message}
+
+    provenance = [
+        layer.keywords['provenance_data'] for layer in outputs
+        if 'provenance_data' in layer.keywords][0]
+    return {
+        'processes': processes,
+        'wall_time': wall_time,
+        'schedule': provenance['step_schedule'],
+        'output': output_content(outputs),
+    }
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        'scenarios', nargs='*',
+        help='JSON scenarios. Default to every enabled scenario.')
+    parser.add_argument(
+        '--processes', nargs='*', type=int, default=[1, 2],
+        help='Number of processes, for each run.')
+    parser.add_argument(
+        '--features', type=int,
+        help='Number of features of vector layers.')
+    parser.add_argument(
+        '--raster-size', type=int,
+        help='Size in pixels of raster layers.')
+    arguments = parser.parse_args()
+
+    different = False
+    for json_path in scenario_files(arguments.scenarios):
+        name = splitext(basename(json_path))[0]
+        scenario, _, _ = read_json_flow(json_path)
+        if arguments.features or arguments.raster_size:
+            scenario = scale_scenario(
+                scenario, arguments.features, arguments.raster_size)
+
+        reference = None
+        for processes in arguments.processes:
+            result = benchmark_steps(scenario, processes)
+            if 'error' in result:
+                print '%s, %s processes : failed, %s' % (
+                    name, processes, result['error'])
+                break
+            print '%s, %s processes : %.2f s, critical path %s' % (
+                name,
+                processes,
+                result['wall_time'],
+                ', '.join(result['schedule']['critical_path']))
+            for key, step in sorted(
+                    result['schedule']['steps'].items(),
+                    key=lambda item: item[1].get('start')):
+                print '    %s : %s s%s' % (
+                    key,
+                    step.get('duration'),
+                    ' in another process' if step.get('worker') else '')
+            if reference is None:
+                reference = result
+            else:
+                print '    %.2fx faster' % (
+                    reference['wall_time'] / result['wall_time'])
+                if result['output'] != reference['output']:
+                    print '    The output differs from the first run.'
+                    different = True
+    return 1 if different else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
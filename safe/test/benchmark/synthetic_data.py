@@ -0,0 +1,216 @@
+# coding=utf-8
+
+"""Generate bigger datasets from the test data for benchmarking.
+
+A vector layer is tiled N x N times in its own extent, every copy being
+shrunk by N, so the scaled layer covers exactly the same area as the original
+layer and still overlaps the other layers of the scenario. A raster layer is
+resampled to a new size with the nearest neighbour. Keywords are copied next
+to the new file.
+"""
+
+import json
+import logging
+import shutil
+from math import ceil, sqrt
+from os.path import exists, splitext
+
+from osgeo import gdal, ogr
+
+from safe.common.utilities import unique_filename, temp_dir
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+
+def is_raster_file(path):
+    """Check if a file is a raster according to GDAL.
+
+    :param path: The path to the file.
+    :type path: str
+
+    :return: True if GDAL can open the file as a raster.
+    :rtype: bool
+    """
+    return gdal.OpenEx(path, gdal.OF_RASTER) is not None
+
+
+def scale_vector(source, feature_count, output=None):
+    """Tile a vector layer in its own extent to reach a number of features.
+
+    :param source: The path to the vector layer.
+    :type source: str
+
+    :param feature_count: The minimum number of features we want.
+    :type feature_count: int
+
+    :param output: The path to the GeoPackage. Default to a new temporary file.
+    :type output: str
+
+    :return: The path to the new layer.
+    :rtype: str
+    """
+    if not output:
+        output = unique_filename(
+            suffix='.gpkg', dir=temp_dir(sub_dir='benchmark'))
+
+    dataset = ogr.Open(source)
+    layer = dataset.GetLayer(0)
+    x_minimum, x_maximum, y_minimum, y_maximum = layer.GetExtent()
+
+    factor = max(
+        1, int(ceil(sqrt(float(feature_count) / layer.GetFeatureCount()))))
+    width = (x_maximum - x_minimum) / factor
+    height = (y_maximum - y_minimum) / factor
+
+    output_dataset = ogr.GetDriverByName('GPKG').CreateDataSource(output)
+    output_layer = output_dataset.CreateLayer(
+        layer.GetName(), layer.GetSpatialRef(), layer.GetGeomType())
+    definition = layer.GetLayerDefn()
+    for i in range(definition.GetFieldCount()):
+        output_layer.CreateField(definition.GetFieldDefn(i))
+
+    output_layer.StartTransaction()
+    for feature in layer:
+        geometry = feature.GetGeometryRef()
+        geometry = json.loads(geometry.ExportToJson()) if geometry else None
+        for column in range(factor):
+            for row in range(factor):
+                output_feature = ogr.Feature(output_layer.GetLayerDefn())
+                output_feature.SetFrom(feature)
+                if geometry and 'coordinates' in geometry:
+                    tile = dict(geometry)
+                    tile['coordinates'] = _scale_coordinates(
+                        geometry['coordinates'],
+                        x_minimum,
+                        y_minimum,
+                        factor,
+                        column * width,
+                        row * height)
+                    output_feature.SetGeometry(
+                        ogr.CreateGeometryFromJson(json.dumps(tile)))
+                output_layer.CreateFeature(output_feature)
+    output_layer.CommitTransaction()
+
+    output_dataset = None
+    dataset = None
+
+    _copy_keywords(source, output)
+    LOGGER.info('%s scaled %s times in %s' % (source, factor ** 2, output))
+    return output
+
+
+def scale_raster(source, size, output=None):
+    """Resample a raster layer to a new size, using the nearest neighbour.
+
+    :param source: The path to the raster layer.
+    :type source: str
+
+    :param size: The number of pixels of the longest side of the new raster.
+    :type size: int
+
+    :param output: The path to the GeoTIFF. Default to a new temporary file.
+    :type output: str
+
+    :return: The path to the new layer.
+    :rtype: str
+    """
+    if not output:
+        output = unique_filename(
+            suffix='.tif', dir=temp_dir(sub_dir='benchmark'))
+
+    dataset = gdal.Open(source)
+    ratio = float(size) / max(dataset.RasterXSize, dataset.RasterYSize)
+    gdal.Translate(
+        output,
+        dataset,
+        format='GTiff',
+        width=max(1, int(round(dataset.RasterXSize * ratio))),
+        height=max(1, int(round(dataset.RasterYSize * ratio))),
+        resampleAlg='near',
+        creationOptions=['TILED=YES', 'BIGTIFF=IF_SAFER'])
+    dataset = None
+
+    _copy_keywords(source, output)
+    return output
+
+
+def scale_layer(source, feature_count=None, raster_size=None):
+    """Scale a vector or a raster layer.
+
+    :param source: The path to the layer.
+    :type source: str
+
+    :param feature_count: The minimum number of features for a vector layer.
+        Default to None, the vector layer is not scaled.
+    :type feature_count: int
+
+    :param raster_size: The number of pixels of the longest side for a raster
+        layer. Default to None, the raster layer is not scaled.
+    :type raster_size: int
+
+    :return: The path to the scaled layer, or the source if not scaled.
+    :rtype: str
+    """
+    if is_raster_file(source):
+        if raster_size:
+            return scale_raster(source, raster_size)
+    elif feature_count:
+        return scale_vector(source, feature_count)
+    return source
+
+
+def _scale_coordinates(
+        coordinates, x_origin, y_origin, factor, x_offset, y_offset):
+    """Shrink GeoJSON coordinates by a factor and move them.
+
+    :param coordinates: GeoJSON coordinates, nested lists of positions.
+    :type coordinates: list
+
+    :param x_origin: The X origin of the shrinking.
+    :type x_origin: float
+
+    :param y_origin: The Y origin of the shrinking.
+    :type y_origin: float
+
+    :param factor: The shrinking factor.
+    :type factor: int
+
+    :param x_offset: The translation on X after the shrinking.
+    :type x_offset: float
+
+    :param y_offset: The translation on Y after the shrinking.
+    :type y_offset: float
+
+    :return: The new coordinates.
+    :rtype: list
+    """
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        position = list(coordinates)
+        position[0] = (
+            x_origin + (position[0] - x_origin) / float(factor) + x_offset)
+        position[1] = (
+            y_origin + (position[1] - y_origin) / float(factor) + y_offset)
+        return position
+    return [
+        _scale_coordinates(
+            item, x_origin, y_origin, factor, x_offset, y_offset)
+        for item in coordinates]
+
+
+def _copy_keywords(source, output):
+    """Copy the keywords of a layer next to another layer.
+
+    :param source: The path to the original layer.
+    :type source: str
+
+    :param output: The path to the new layer.
+    :type output: str
+    """
+    xml = splitext(source)[0] + '.xml'
+    if exists(xml):
+        shutil.copy2(xml, splitext(output)[0] + '.xml')
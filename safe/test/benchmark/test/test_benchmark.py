@@ -0,0 +1,113 @@
+# coding=utf-8
+"""Test Benchmark."""
+
+import unittest
+
+from osgeo import ogr
+
+from safe.test.utilities import get_qgis_app, standard_data_path
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from safe.impact_function.test.test_impact_function import read_json_flow
+from safe.report.processors import default
+from safe.test.benchmark.atlas import benchmark_atlas
+from safe.test.benchmark.benchmark import compare_results
+from safe.test.benchmark.reports import benchmark_reports, run_analysis
+from safe.test.benchmark.steps import benchmark_steps
+from safe.test.benchmark.synthetic_data import scale_vector
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+class TestBenchmark(unittest.TestCase):
+
+    """Test Benchmark."""
+
+    def test_scale_vector(self):
+        """Test we can tile a vector layer in its own extent."""
+        source = standard_data_path('gisv4', 'exposure', 'buildings.geojson')
+        output = scale_vector(source, 100)
+
+        source_layer = ogr.Open(source).GetLayer(0)
+        output_layer = ogr.Open(output).GetLayer(0)
+
+        # 12 buildings, tiled 3 x 3 times.
+        self.assertEqual(
+            output_layer.GetFeatureCount(),
+            source_layer.GetFeatureCount() * 9)
+        for source_value, output_value in zip(
+                source_layer.GetExtent(), output_layer.GetExtent()):
+            self.assertAlmostEqual(source_value, output_value)
+
+    def test_compare_results(self):
+        """Test we can find regressions against a baseline."""
+        baseline = {
+            'scenarios': {
+                'flood': {
+                    'wall_time': 10.0,
+                    'peak_memory': 100.0,
+                    'steps': {
+                        'union': {'time': 5.0},
+                        'clip': {'time': 0.01},
+                    }
+                }
+            }
+        }
+        results = {
+            'scenarios': {
+                'flood': {
+                    'wall_time': 10.5,
+                    'peak_memory': 100.0,
+                    'steps': {
+                        'union': {'time': 7.0},
+                        'clip': {'time': 1.0},
+                    }
+                }
+            }
+        }
+        regressions = compare_results(results, baseline, threshold=0.1)
+        # Clip is too fast in the baseline to be compared.
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('union', regressions[0])
+
+    def test_benchmark_atlas(self):
+        """Test atlas pages rendered by many processes are in page order."""
+        parallel_minimum = default.atlas_parallel_minimum
+        # Use many processes even with a few pages.
+        default.atlas_parallel_minimum = 1
+        try:
+            sequential = benchmark_atlas(6, 1)
+            parallel = benchmark_atlas(6, 2)
+        finally:
+            default.atlas_parallel_minimum = parallel_minimum
+
+        self.assertEqual(sequential['pages'], 6)
+        self.assertListEqual(sequential['output'], parallel['output'])
+
+    def test_benchmark_reports(self):
+        """Test reports generated by many processes are the same."""
+        impact_function = run_analysis(standard_data_path(
+            'scenario', 'polygon_classified_on_vector_population.json'))
+        sequential = benchmark_reports(impact_function, 1)
+        parallel = benchmark_reports(impact_function, 3)
+
+        self.assertListEqual(sequential['failed'], [])
+        self.assertListEqual(parallel['failed'], [])
+        self.assertDictEqual(sequential['output'], parallel['output'])
+        self.assertListEqual(
+            sequential['timings'].keys(), parallel['timings'].keys())
+
+    def test_benchmark_steps(self):
+        """Test steps run in many processes give the same outputs."""
+        scenario, _, _ = read_json_flow(standard_data_path(
+            'scenario', 'polygon_classified_on_vector_population.json'))
+        sequential = benchmark_steps(scenario, 1)
+        parallel = benchmark_steps(scenario, 2)
+
+        self.assertNotIn('error', sequential)
+        self.assertNotIn('error', parallel)
+        self.assertEqual(parallel['schedule']['processes'], 2)
+        self.assertDictEqual(sequential['output'], parallel['output'])
@@ -18,12 +18,14 @@ __date__ = '16/03/2014'
 __copyright__ = ('Copyright 2012, Australia Indonesia Facility for '
                  'Disaster Reduction')
 
+import hashlib
 import logging
+import os
 # This import is to enable SIP API V2
 # noinspection PyUnresolvedReferences
 import qgis  # pylint: disable=unused-import
 # noinspection PyPackageRequirements
-from PyQt4.QtCore import QCoreApplication, QFile, QUrl, QByteArray
+from PyQt4.QtCore import QEventLoop, QFile, QIODevice, QUrl
 # noinspection PyPackageRequirements
 from PyQt4.QtNetwork import QNetworkRequest, QNetworkReply
 
@@ -32,16 +34,29 @@ from safe.utilities.i18n import tr
 
 LOGGER = logging.getLogger('InaSAFE')
 
+# Size of the chunks read from the file when it is hashed.
+HASH_CHUNK_SIZE = 1024 * 1024
+
 
 class FileDownloader(object):
 
-    """The blueprint for downloading file from url."""
+    """The blueprint for downloading file from url.
+
+    The response is written to a temporary file next to the output path
+    while it is received, so the memory used doesn't depend on the size of
+    the file. The temporary file is renamed to the output path when the
+    download is complete. If a previous download has been interrupted, the
+    temporary file is resumed with a range request.
+    """
 
-    def __init__(self, url, output_path, progress_dialog=None):
+    def __init__(
+            self, url, output_path, progress_dialog=None, checksum=None):
         """Constructor of the class.
 
         .. versionchanged:: 3.3 removed manager parameter.
 
+        .. versionchanged:: 4.2 added checksum parameter.
+
         :param url: URL of file.
         :type url: str
 
@@ -50,17 +65,24 @@ class FileDownloader(object):
 
         :param progress_dialog: Progress dialog widget.
         :type progress_dialog: QWidget
+
+        :param checksum: The expected MD5 hex digest of the file. If set, the
+            download fails if the file doesn't match.
+        :type checksum: str
         """
         # noinspection PyArgumentList
         self.manager = qgis.core.QgsNetworkAccessManager.instance()
         self.url = QUrl(url)
         self.output_path = output_path
+        self.partial_path = output_path + '.part'
         self.progress_dialog = progress_dialog
         if self.progress_dialog:
             self.prefix_text = self.progress_dialog.labelText()
+        self.checksum = checksum
         self.output_file = None
         self.reply = None
-        self.downloaded_file_buffer = None
+        self.hash = None
+        self.resumed_size = 0
         self.finished_flag = False
 
     def download(self):
@@ -71,19 +93,34 @@ class FileDownloader(object):
 
         :raises: IOError - when cannot create output_path
         """
-        # Prepare output path
-        self.output_file = QFile(self.output_path)
-        if not self.output_file.open(QFile.WriteOnly):
-            raise IOError(self.output_file.errorString())
+        self.start()
+        return self.wait()
 
-        # Prepare downloaded buffer
-        self.downloaded_file_buffer = QByteArray()
+    def start(self):
+        """Send the request, without waiting for the response.
+
+        Many downloads can be started before waiting for them, they are then
+        received concurrently.
+
+        .. versionadded:: 4.2
+
+        :raises: IOError - when cannot create output_path
+        """
+        # Check we can write the output before requesting the url.
+        output_directory = os.path.dirname(os.path.abspath(self.output_path))
+        if not os.access(output_directory, os.W_OK):
+            raise IOError(tr('Cannot write to %s') % self.output_path)
 
-        # Request the url
+        # Resume an interrupted download.
         request = QNetworkRequest(self.url)
+        if os.path.exists(self.partial_path):
+            self.resumed_size = os.path.getsize(self.partial_path)
+        if self.resumed_size:
+            request.setRawHeader('Range', 'bytes=%s-' % self.resumed_size)
+
         self.reply = self.manager.get(request)
-        self.reply.readyRead.connect(self.get_buffer)
-        self.reply.finished.connect(self.write_data)
+        self.reply.readyRead.connect(self.write_buffer)
+        self.reply.finished.connect(self.finish_file)
         self.manager.requestTimedOut.connect(self.request_timeout)
 
         if self.progress_dialog:
@@ -97,9 +134,6 @@ class FileDownloader(object):
                 :param total: Total expected data.
                 :type total: int
                 """
-                # noinspection PyArgumentList
-                QCoreApplication.processEvents()
-
                 self.progress_dialog.adjustSize()
 
                 human_received = humanize_file_size(received)
@@ -116,18 +150,34 @@ class FileDownloader(object):
             def cancel_action():
                 """Cancel download."""
                 self.reply.abort()
-                self.reply.deleteLater()
 
             self.reply.downloadProgress.connect(progress_event)
             self.progress_dialog.canceled.connect(cancel_action)
 
-        # Wait until finished
+    def abort(self):
+        """Cancel the download.
+
+        .. versionadded:: 4.2
+        """
+        if self.reply is not None and not self.finished_flag:
+            self.reply.abort()
+
+    def wait(self):
+        """Wait until the download started by start is finished.
+
+        .. versionadded:: 4.2
+
+        :returns: True if success, otherwise returns a tuple with format like
+            this (QNetworkReply.NetworkError, error_message)
+        """
+        # Wait until finished, the loop quits when the reply is finished.
         # On Windows 32bit AND QGIS 2.2, self.reply.isFinished() always
         # returns False even after finished slot is called. So, that's why we
         # are adding self.finished_flag (see #864)
-        while not self.reply.isFinished() and not self.finished_flag:
-            # noinspection PyArgumentList
-            QCoreApplication.processEvents()
+        if not self.reply.isFinished() and not self.finished_flag:
+            loop = QEventLoop()
+            self.reply.finished.connect(loop.quit)
+            loop.exec_()
 
         result = self.reply.error()
         try:
@@ -141,7 +191,11 @@ class FileDownloader(object):
         self.reply.deleteLater()
 
         if result == QNetworkReply.NoError:
-            return True, None
+            if self.output_file is None:
+                # The file is empty.
+                self._start_file(http_code)
+                self.output_file.close()
+            return self._complete()
 
         elif result == QNetworkReply.UnknownNetworkError:
             return False, tr(
@@ -155,6 +209,15 @@ class FileDownloader(object):
             LOGGER.debug(msg)
             return False, msg
 
+        elif http_code == 416:
+            # The temporary file is not a part of the file on the server.
+            os.remove(self.partial_path)
+            msg = tr(
+                'Sorry, the download could not be resumed. '
+                'Please try again.')
+            LOGGER.debug(msg)
+            return False, msg
+
         elif http_code == 509:
             msg = tr(
                 'Sorry, the server is currently busy with another request. '
@@ -175,19 +238,73 @@ class FileDownloader(object):
         else:
             return result, self.reply.errorString()
 
-    def get_buffer(self):
-        """Get buffer from self.reply and store it to our buffer container."""
-        buffer_size = self.reply.size()
-        data = self.reply.read(buffer_size)
-        self.downloaded_file_buffer.append(data)
-
-    def write_data(self):
-        """Write data to a file."""
-        self.output_file.write(self.downloaded_file_buffer)
-        self.output_file.close()
+    def write_buffer(self):
+        """Write the data available in self.reply to the temporary file."""
+        if self.output_file is None:
+            try:
+                http_code = int(self.reply.attribute(
+                    QNetworkRequest.HttpStatusCodeAttribute))
+            except TypeError:
+                http_code = None
+            if http_code not in (None, 200, 206):
+                # This is an error page, not the file.
+                return
+            self._start_file(http_code)
+
+        data = self.reply.readAll()
+        self.output_file.write(data)
+        self.hash.update(str(data))
+
+    def finish_file(self):
+        """Close the temporary file."""
+        if self.output_file is not None:
+            self.output_file.close()
         self.finished_flag = True
 
     def request_timeout(self):
         """The request timed out."""
         if self.progress_dialog:
             self.progress_dialog.hide()
+
+    def _start_file(self, http_code):
+        """Open the temporary file when the response starts.
+
+        The file is appended only if the server sent a part of the file.
+
+        :param http_code: The HTTP status code of the response.
+        :type http_code: int
+
+        :raises: IOError - when cannot open the temporary file
+        """
+        self.hash = hashlib.md5()
+        self.output_file = QFile(self.partial_path)
+        if http_code == 206:
+            # Include the part we already have in the checksum.
+            with open(self.partial_path, 'rb') as partial_file:
+                for chunk in iter(
+                        lambda: partial_file.read(HASH_CHUNK_SIZE), ''):
+                    self.hash.update(chunk)
+            mode = QIODevice.Append
+        else:
+            mode = QIODevice.WriteOnly | QIODevice.Truncate
+        if not self.output_file.open(mode):
+            raise IOError(self.output_file.errorString())
+
+    def _complete(self):
+        """Check the temporary file and move it to the output path.
+
+        :returns: True if success, otherwise returns a tuple with format like
+            this (False, error_message)
+        """
+        if self.checksum and self.hash.hexdigest() != self.checksum.lower():
+            os.remove(self.partial_path)
+            msg = tr(
+                'Sorry, the downloaded file is corrupted. Please try again.')
+            LOGGER.debug('Checksum mismatch for %s' % self.url.toString())
+            return False, msg
+
+        if os.path.exists(self.output_path):
+            # os.rename can't replace a file on Windows.
+            os.remove(self.output_path)
+        os.rename(self.partial_path, self.output_path)
+        return True, None
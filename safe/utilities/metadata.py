@@ -78,6 +78,23 @@ def write_iso19115_metadata(layer_uri, keywords):
     return metadata
 
 
+def write_iso19115_metadata_batch(layers):
+    """Create metadata objects for many layers, in one call.
+
+    It's used to write every output of an analysis at the end. The ISO 19115
+    template is parsed only once for all layers.
+
+    :param layers: List of tuples (layer URI, dictionary of keywords).
+    :type layers: list
+
+    :return: The list of metadata objects, in the same order.
+    :rtype: list
+    """
+    return [
+        write_iso19115_metadata(layer_uri, keywords)
+        for layer_uri, keywords in layers]
+
+
 def read_iso19115_metadata(layer_uri, keyword=None):
     """Retrieve keywords from a metadata object
 
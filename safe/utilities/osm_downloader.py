@@ -4,15 +4,28 @@
 import zipfile
 import os
 import logging
+import shutil
 import tempfile
+import time
+from collections import OrderedDict
+from math import floor
 
 from PyQt4.QtNetwork import QNetworkReply
 from PyQt4.QtGui import QDialog
 from PyQt4.QtCore import QSettings
+from qgis.core import (
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsGeometry,
+    QgsRectangle,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+)
 
 from safe.utilities.i18n import tr, locale
 from safe.utilities.gis import qgis_version
 from safe.utilities.file_downloader import FileDownloader
+from safe.utilities.settings import setting
 from safe.common.exceptions import DownloadError, CanceledImportDialogError
 from safe.common.version import get_version, release_status
 
@@ -32,14 +45,33 @@ else:
     URL_OSM_PREFIX = 'http://osm.inasafe.org/'
 URL_OSM_SUFFIX = '-shp'
 
+# The extent is downloaded by tiles of this size, in degrees.
+tile_size = 0.05
+
+# Maximum number of tile requests sent to the server at the same time.
+maximum_requests = 8
+
+# Above this number of tiles, the extent is downloaded with a single request,
+# which is not cached.
+maximum_tiles = 100
+
 LOGGER = logging.getLogger('InaSAFE')
 
 
 def download(feature_type, output_base_path, extent, progress_dialog=None):
     """Download shapefiles from Kartoza server.
 
+    The extent is split into tiles of tile_size degrees. Tiles are cached
+    on disk by feature type, so only tiles which are missing or older than
+    the osmTileCacheDays setting are downloaded, maximum_requests at the same
+    time. The features of the tiles are then merged in the output shapefile.
+    A big extent, with more than maximum_tiles tiles, is downloaded with a
+    single request instead.
+
     .. versionadded:: 3.2
 
+    .. versionchanged:: 4.2 download and cache tiles.
+
     :param feature_type: What kind of features should be downloaded.
         Currently 'buildings', 'building-points' or 'roads' are supported.
     :type feature_type: str
@@ -56,22 +88,45 @@ def download(feature_type, output_base_path, extent, progress_dialog=None):
 
     :raises: ImportDialogError, CanceledImportDialogError
     """
-    # preparing necessary data
-    min_longitude = extent[0]
-    min_latitude = extent[1]
-    max_longitude = extent[2]
-    max_latitude = extent[3]
+    if len(extent_tiles(extent)) > maximum_tiles:
+        path = tempfile.mktemp('.shp.zip')
+        fetch_zip(
+            osm_url(feature_type, extent), path, feature_type, progress_dialog)
+        extract_zip(path, output_base_path)
+        os.remove(path)
+    else:
+        tile_paths = fetch_tiles(feature_type, extent, progress_dialog)
+        merge_tiles(tile_paths, output_base_path, extent)
+
+    if progress_dialog:
+        progress_dialog.done(QDialog.Accepted)
+
+
+def osm_url(feature_type, extent):
+    """URL of the OSM extract of an extent.
+
+    .. versionadded:: 4.2
 
+    :param feature_type: What kind of features should be downloaded.
+    :type feature_type: str
+
+    :param extent: A list in the form [xmin, ymin, xmax, ymax] in
+        EPSG:4326.
+    :type extent: list
+
+    :return: The URL.
+    :rtype: str
+    """
     box = (
         '{min_longitude},{min_latitude},{max_longitude},'
         '{max_latitude}').format(
-            min_longitude=min_longitude,
-            min_latitude=min_latitude,
-            max_longitude=max_longitude,
-            max_latitude=max_latitude
+            min_longitude=extent[0],
+            min_latitude=extent[1],
+            max_longitude=extent[2],
+            max_latitude=extent[3]
     )
 
-    url = (
+    return (
         '{url_osm_prefix}'
         '{feature_type}'
         '{url_osm_suffix}?'
@@ -87,14 +142,286 @@ def download(feature_type, output_base_path, extent, progress_dialog=None):
             lang=locale(),
             inasafe_version=get_version()))
 
-    path = tempfile.mktemp('.shp.zip')
 
-    # download and extract it
-    fetch_zip(url, path, feature_type, progress_dialog)
-    extract_zip(path, output_base_path)
+def extent_tiles(extent):
+    """Tiles covering an extent.
+
+    Tiles are aligned on a grid of tile_size degrees, so the same area
+    always gives the same tiles.
+
+    .. versionadded:: 4.2
+
+    :param extent: A list in the form [xmin, ymin, xmax, ymax] in
+        EPSG:4326.
+    :type extent: list
+
+    :return: List of (column, row) of each tile.
+    :rtype: list
+    """
+    # A small epsilon so an extent ending on the grid has no extra tile.
+    epsilon = tile_size * 1e-6
+    first_column = int(floor(extent[0] / tile_size))
+    last_column = int(floor((extent[2] - epsilon) / tile_size))
+    first_row = int(floor(extent[1] / tile_size))
+    last_row = int(floor((extent[3] - epsilon) / tile_size))
+    return [
+        (column, row)
+        for row in range(first_row, max(first_row, last_row) + 1)
+        for column in range(first_column, max(first_column, last_column) + 1)
+    ]
+
+
+def tile_extent(tile):
+    """Extent of a tile.
+
+    .. versionadded:: 4.2
+
+    :param tile: The column and the row of the tile.
+    :type tile: tuple
+
+    :return: A list in the form [xmin, ymin, xmax, ymax] in EPSG:4326.
+    :rtype: list
+    """
+    column, row = tile
+    return [
+        round(column * tile_size, 6),
+        round(row * tile_size, 6),
+        round((column + 1) * tile_size, 6),
+        round((row + 1) * tile_size, 6)]
+
+
+def tile_path(feature_type, tile):
+    """Path of a tile in the cache.
+
+    .. versionadded:: 4.2
+
+    :param feature_type: What kind of features are in the tile.
+    :type feature_type: str
+
+    :param tile: The column and the row of the tile.
+    :type tile: tuple
+
+    :return: The path of the zip file.
+    :rtype: str
+    """
+    directory = os.path.join(
+        setting('osmTileCachePath', expected_type=str),
+        feature_type,
+        str(tile_size))
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    return os.path.join(directory, '%s_%s.zip' % tile)
+
+
+def fetch_tiles(feature_type, extent, progress_dialog=None):
+    """Download the tiles of an extent which are not in the cache.
+
+    Missing and stale tiles are requested concurrently, with at most
+    maximum_requests requests at the same time. Stale tiles of the cache are
+    removed after.
+
+    .. versionadded:: 4.2
+
+    :param feature_type: What kind of features should be downloaded.
+    :type feature_type: str
+
+    :param extent: A list in the form [xmin, ymin, xmax, ymax] in
+        EPSG:4326.
+    :type extent: list
+
+    :param progress_dialog: A progress dialog.
+    :type progress_dialog: QProgressDialog
+
+    :return: The path of the zip file of each tile.
+    :rtype: list
+
+    :raises: ImportDialogError, CanceledImportDialogError
+    """
+    tiles = extent_tiles(extent)
+    maximum_age = setting('osmTileCacheDays', expected_type=int) * 86400
+    paths = [tile_path(feature_type, tile) for tile in tiles]
+
+    downloaders = []
+    for tile, path in zip(tiles, paths):
+        if (os.path.exists(path) and
+                time.time() - os.path.getmtime(path) < maximum_age):
+            continue
+        url = osm_url(feature_type, tile_extent(tile))
+        LOGGER.debug('Downloading tile from URL: %s' % url)
+        downloaders.append(FileDownloader(url, path))
+    LOGGER.debug('%s tiles in the cache, %s to download.' % (
+        len(tiles) - len(downloaders), len(downloaders)))
+
+    canceled = []
+    results = []
+    running = []
 
     if progress_dialog:
-        progress_dialog.done(QDialog.Accepted)
+        progress_dialog.show()
+        progress_dialog.setMinimum(0)
+        progress_dialog.setMaximum(len(downloaders))
+        progress_dialog.setValue(0)
+
+        # Get a pretty label from feature_type, but not translatable
+        label_feature_type = feature_type.replace('-', ' ')
+
+        label_text = tr('Fetching %s' % label_feature_type)
+        progress_dialog.setLabelText(label_text)
+
+        def cancel_action():
+            """Cancel every download."""
+            canceled.append(True)
+            for downloader in downloaders:
+                downloader.abort()
+
+        progress_dialog.canceled.connect(cancel_action)
+
+    def wait_first():
+        """Wait for the first download which is running."""
+        results.append(running.pop(0).wait())
+        if progress_dialog:
+            progress_dialog.setValue(len(results))
+
+    for downloader in downloaders:
+        if len(running) >= maximum_requests:
+            wait_first()
+        if canceled or any(result[0] is not True for result in results):
+            # Don't send other requests, the download failed.
+            break
+        downloader.start()
+        running.append(downloader)
+    while running:
+        wait_first()
+
+    prune_tile_cache()
+
+    for result in results:
+        if result[0] is not True:
+            _, error_message = result
+
+            if result[0] == QNetworkReply.OperationCanceledError:
+                raise CanceledImportDialogError(error_message)
+            else:
+                raise DownloadError(error_message)
+    if canceled:
+        # The tiles which were not requested are missing.
+        raise CanceledImportDialogError(tr('The download has been canceled.'))
+
+    return paths
+
+
+def prune_tile_cache():
+    """Remove the tiles older than the osmTileCacheDays setting.
+
+    These tiles would be downloaded again anyway. Interrupted downloads of
+    the same age are removed too.
+
+    .. versionadded:: 4.2
+
+    :return: The number of files removed.
+    :rtype: int
+    """
+    maximum_age = setting('osmTileCacheDays', expected_type=int) * 86400
+    now = time.time()
+    removed = 0
+    root = setting('osmTileCachePath', expected_type=str)
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            try:
+                if now - os.path.getmtime(path) >= maximum_age:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                # The file is used by another download.
+                pass
+    if removed:
+        LOGGER.debug('%s stale tiles removed from the cache.' % removed)
+    return removed
+
+
+def merge_tiles(tile_paths, output_base_path, extent):
+    """Merge the shapefiles of tiles into the output shapefile.
+
+    Only features intersecting the extent are kept, clipped to the extent
+    like a single request. The server clips features to each tile, so a
+    road or a building crossing the border of tiles comes in pieces. The
+    pieces with the same osm_id are joined, features without osm_id are
+    written once. Other files of the first tile, like the style or the
+    keywords, are copied too.
+
+    .. versionadded:: 4.2
+
+    :param tile_paths: The path of the zip file of each tile.
+    :type tile_paths: list
+
+    :param output_base_path: The base path of the shape file.
+    :type output_base_path: str
+
+    :param extent: A list in the form [xmin, ymin, xmax, ymax] in
+        EPSG:4326.
+    :type extent: list
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        layers = []
+        for index, path in enumerate(tile_paths):
+            base_path = os.path.join(directory, str(index))
+            extract_zip(path, base_path)
+            layer = QgsVectorLayer(base_path + '.shp', str(index), 'ogr')
+            if layer.isValid():
+                layers.append(layer)
+        if not layers:
+            return
+
+        # Style, keywords ... from the first tile.
+        extract_zip(tile_paths[0], output_base_path)
+
+        fields = layers[0].fields()
+        writer = QgsVectorFileWriter(
+            output_base_path + '.shp',
+            'utf-8',
+            fields,
+            layers[0].wkbType(),
+            layers[0].crs(),
+            'ESRI Shapefile')
+
+        rectangle = QgsRectangle(*extent)
+        area = QgsGeometry.fromRect(rectangle)
+        identifier = fields.indexFromName('osm_id')
+        # Features in the order of the tiles, with the pieces of each one.
+        pieces = OrderedDict()
+        for layer in layers:
+            request = QgsFeatureRequest().setFilterRect(rectangle)
+            for feature in layer.getFeatures(request):
+                geometry = feature.geometry()
+                if not geometry or not geometry.intersects(area):
+                    continue
+                key = feature[identifier] if identifier != -1 else None
+                if not key:
+                    key = geometry.exportToWkt()
+                if key in pieces:
+                    pieces[key][1].append(QgsGeometry(geometry))
+                else:
+                    pieces[key] = (feature, [QgsGeometry(geometry)])
+
+        for feature, geometries in pieces.itervalues():
+            geometry = geometries[0]
+            for piece in geometries[1:]:
+                geometry = geometry.combine(piece)
+            if not area.contains(geometry):
+                geometry = geometry.intersection(area)
+            if not geometry or geometry.isGeosEmpty():
+                continue
+
+            output_feature = QgsFeature(fields)
+            output_feature.setGeometry(geometry)
+            for field in fields.toList():
+                output_feature[field.name()] = feature[field.name()]
+            writer.addFeature(output_feature)
+        del writer
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
 
 
 def fetch_zip(url, output_path, feature_type, progress_dialog=None):
@@ -0,0 +1,72 @@
+# coding=utf-8
+
+"""Run a function on many items with a pool of processes."""
+
+import logging
+import multiprocessing
+import sys
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+
+def can_fork():
+    """Check if processes can be forked to run a function.
+
+    Processes are only forked on Linux. Windows can't fork, and a forked
+    process on macOS can crash in the system frameworks used by Qt, while
+    Python 2 has no spawn start method. A process of a pool can't start its
+    own processes either.
+
+    .. versionadded:: 4.2
+
+    :rtype: bool
+    """
+    return bool(
+        sys.platform.startswith('linux') and
+        not multiprocessing.current_process().daemon)
+
+
+def parallel_map(function, items, processes, minimum=1):
+    """Apply a function to every item, using many processes if possible.
+
+    Processes are forked, only on Linux, see can_fork. Otherwise, or if the
+    current process is already a worker of a pool, the function runs in the
+    current process. The function must be defined at the module level and
+    items must be picklable, for instance WKB geometries rather than
+    QgsGeometry.
+
+    :param function: The function to apply to each item.
+    :type function: function
+
+    :param items: The items.
+    :type items: list
+
+    :param processes: The number of processes. With 1, everything runs in
+        the current process.
+    :type processes: int
+
+    :param minimum: The minimum number of items before using many processes.
+        Below, starting processes costs more than it saves.
+    :type minimum: int
+
+    :return: The result of the function for each item, in the same order.
+    :rtype: list
+    """
+    if processes > 1 and len(items) >= minimum and can_fork():
+        LOGGER.debug(
+            'Using %s processes for %s items.' % (processes, len(items)))
+        pool = multiprocessing.Pool(processes)
+        try:
+            return pool.map(
+                function,
+                items,
+                chunksize=max(1, len(items) // (processes * 4)))
+        finally:
+            pool.close()
+            pool.join()
+    return [function(item) for item in items]
@@ -7,7 +7,6 @@ This code was taken from http://stackoverflow.com/a/3620972
 """
 
 import time
-import inspect
 from functools import wraps
 from safe.utilities.memory_checker import get_free_memory
 from safe.utilities.settings import setting
@@ -39,6 +38,12 @@ class Tree(object):
             # memory at termination
             self._end_memory = None
 
+        # Number of features in the output layer, if any.
+        self.feature_count = None
+
+        # Counters added by the function itself, like repaired features.
+        self.counters = {}
+
         # Children
         self.children = []
 
@@ -87,6 +92,13 @@ class Tree(object):
                 if not child.elapsed_time:
                     child.append(node)
 
+    def running_step(self):
+        """The deepest step which is still running."""
+        for child in reversed(self.children):
+            if child._end_time is None:
+                return child.running_step()
+        return self
+
     def __str__(self):
         # It might be a private function.
         step = self.key.lstrip('_')
@@ -97,6 +109,12 @@ class Tree(object):
         # Capitalize first letter
         step = step.capitalize()
 
+        # No comma, the profiling layer is split on commas.
+        if self.counters:
+            step += ' (%s)' % '; '.join(
+                '%s: %s' % (key, value)
+                for key, value in sorted(self.counters.items()))
+
         return step
 
 ROOT = None
@@ -107,26 +125,48 @@ def profile(fn):
     def with_profiling(*args, **kwargs):
         global ROOT
 
-        current_frame = inspect.currentframe()
-        parent_frame = inspect.getouterframes(current_frame)[1]
-        parent_name = parent_frame[3]
-
         current_step = Tree(fn.__name__)
 
         if ROOT:
-            current_step.parent = parent_name
-            ROOT.append(current_step)
+            # The parent is the deepest profiled function still running,
+            # even if it's calling this one through other functions.
+            parent = ROOT.running_step()
+            if parent._end_time is None:
+                current_step.parent = parent.key
+                parent.children.append(current_step)
         else:
             ROOT = current_step
 
-        ret = fn(*args, **kwargs)
-
-        current_step.ended()
+        try:
+            ret = fn(*args, **kwargs)
+        finally:
+            # If the function raises, it must not stay the running step,
+            # otherwise the next steps would be its children.
+            current_step.ended()
+
+        # Useful for benchmarking, to know the number of features per second.
+        feature_count = getattr(ret, 'featureCount', None)
+        if callable(feature_count):
+            current_step.feature_count = feature_count()
         return ret
 
     return with_profiling
 
 
+def profiling_count(key, value):
+    """Add a counter to the function being profiled.
+
+    :param key: The name of the counter.
+    :type key: str
+
+    :param value: The value to add.
+    :type value: int
+    """
+    if ROOT:
+        counters = ROOT.running_step().counters
+        counters[key] = counters.get(key, 0) + value
+
+
 def profiling_log():
     """Get the profiling logs."""
     global ROOT
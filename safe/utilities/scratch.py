@@ -0,0 +1,271 @@
+# coding=utf-8
+
+"""Scratch workspaces for the temporary files of an analysis.
+
+Intermediate layers of an analysis (polygonized rasters, clipped layers,
+reprojected layers...) are written with temp_dir and unique_filename. While a
+scratch workspace is in use, these files are created in the directory of the
+workspace, which is removed when the analysis is finished:
+
+    with ScratchWorkspace() as workspace:
+        impact_function.run()
+        workspace.retain()
+
+A workspace which is retained is kept until it's released as many times, for
+instance when the outputs of the analysis are not used anymore. If the caller
+is not using a workspace, the impact function uses its own one for the
+intermediate files only, the outputs stay in the datastore.
+
+All workspaces can share a quota, checked between the steps of an analysis
+with check_scratch_quota. There is no quota by default. Workspaces left by
+processes which don't exist anymore are reclaimed when a new workspace is
+created.
+"""
+
+import getpass
+import logging
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+from os.path import exists, getsize, isdir, join
+from tempfile import gettempdir
+from uuid import uuid4
+
+from safe.common.exceptions import ScratchQuotaExceededError
+from safe.common.utilities import scratch_workspaces
+from safe.utilities.settings import setting
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# RAM disk used for workspaces if the scratchRamDisk setting is enabled.
+ram_disk_path = '/dev/shm'
+
+# Workspaces of this process which are open or retained, by path.
+_WORKSPACES = {}
+
+
+def scratch_root(ram_disk=None, quota=None):
+    """The directory where workspaces are created.
+
+    :param ram_disk: If the RAM disk should be used when it's available and
+        bigger than the quota. Default to the scratchRamDisk setting. Without
+        quota, the RAM disk is not used.
+    :type ram_disk: bool
+
+    :param quota: The quota in MB, 0 for no limit. Default to the
+        scratchQuota setting.
+    :type quota: int
+
+    :return: The path to the directory, created if needed.
+    :rtype: str
+    """
+    if ram_disk is None:
+        ram_disk = setting('scratchRamDisk', expected_type=bool)
+    if quota is None:
+        quota = setting('scratchQuota', expected_type=int)
+
+    user = getpass.getuser().replace(' ', '_')
+    if ram_disk and not quota:
+        LOGGER.info('The RAM disk is not used without a scratch quota.')
+        ram_disk = False
+    if ram_disk and isdir(ram_disk_path) and hasattr(os, 'statvfs'):
+        statistics = os.statvfs(ram_disk_path)
+        available = statistics.f_bavail * statistics.f_frsize
+        if available >= quota * 1024 * 1024:
+            path = join(ram_disk_path, 'inasafe', user, 'scratch')
+        else:
+            LOGGER.info(
+                'Not enough space on %s for the scratch quota.' %
+                ram_disk_path)
+            ram_disk = False
+    if not ram_disk:
+        base = os.environ.get('INASAFE_WORK_DIR', gettempdir())
+        path = join(base, 'inasafe', user, 'scratch')
+
+    if not exists(path):
+        os.makedirs(path)
+    return path
+
+
+def directory_size(path):
+    """The size of all files in a directory.
+
+    :param path: The path to the directory.
+    :type path: str
+
+    :return: The size in bytes.
+    :rtype: int
+    """
+    size = 0
+    for directory, _, files in os.walk(path):
+        for filename in files:
+            try:
+                size += getsize(join(directory, filename))
+            except OSError:
+                # The file has been removed in the meantime.
+                pass
+    return size
+
+
+def _process_exists(pid):
+    """Check if a process is running.
+
+    :param pid: The process ID.
+    :type pid: int
+
+    :return: True if the process exists or if we can't know.
+    :rtype: bool
+    """
+    if 'win32' in sys.platform:
+        # os.kill terminates the process on Windows.
+        return True
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno != 3  # ESRCH, no such process.
+    return True
+
+
+def reclaim(root):
+    """Remove the workspaces left by processes which are not running.
+
+    :param root: The directory of workspaces.
+    :type root: str
+
+    :return: The number of workspaces removed.
+    :rtype: int
+    """
+    removed = 0
+    for name in os.listdir(root):
+        path = join(root, name)
+        if path in _WORKSPACES:
+            continue
+        try:
+            pid = int(name.split('_')[0])
+        except ValueError:
+            continue
+        if pid == os.getpid() or not _process_exists(pid):
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    if removed:
+        LOGGER.info('%s scratch workspaces reclaimed.' % removed)
+    return removed
+
+
+class ScratchWorkspace(object):
+
+    """A directory for the temporary files of an analysis.
+
+    .. versionadded:: 4.2
+    """
+
+    def __init__(self, name=None, quota=None, ram_disk=None):
+        """Constructor.
+
+        :param name: A name to recognize the workspace in the directory.
+        :type name: basestring
+
+        :param quota: The quota in MB shared by all workspaces, 0 for no
+            limit. Default to the scratchQuota setting.
+        :type quota: int
+
+        :param ram_disk: If the workspace should be on a RAM disk. Default to
+            the scratchRamDisk setting.
+        :type ram_disk: bool
+        """
+        if quota is None:
+            quota = setting('scratchQuota', expected_type=int)
+        self.quota = quota
+        self.root = scratch_root(ram_disk, quota)
+        self.path = join(self.root, '%s_%s' % (
+            os.getpid(), name or uuid4().hex))
+        self.references = 0
+        self._closed = False
+
+    def __enter__(self):
+        """Create the workspace and use it for temporary files."""
+        reclaim(self.root)
+        if not exists(self.path):
+            os.makedirs(self.path)
+        _WORKSPACES[self.path] = self
+        scratch_workspaces.append(self)
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        """Stop using the workspace, remove it if it's not retained."""
+        scratch_workspaces.remove(self)
+        self._closed = True
+        if exception_type or not self.references:
+            self.remove()
+
+    def retain(self):
+        """Keep the workspace until it's released, its outputs are used."""
+        self.references += 1
+
+    def release(self):
+        """Release the workspace, it's removed when it's not used anymore."""
+        self.references = max(0, self.references - 1)
+        if self._closed and not self.references:
+            self.remove()
+
+    def remove(self):
+        """Remove the workspace and all its files."""
+        _WORKSPACES.pop(self.path, None)
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.references = 0
+
+    @property
+    def size(self):
+        """The size of files in the workspace, in bytes.
+
+        :rtype: int
+        """
+        return directory_size(self.path)
+
+    def check_quota(self):
+        """Check all workspaces are not using more than the quota.
+
+        It scans every workspace, it's not called for each temporary file but
+        between the steps of an analysis, see check_scratch_quota.
+
+        :raises: ScratchQuotaExceededError
+        """
+        if not self.quota:
+            return
+        size = directory_size(self.root)
+        if size > self.quota * 1024 * 1024:
+            reclaim(self.root)
+            size = directory_size(self.root)
+        if size > self.quota * 1024 * 1024:
+            raise ScratchQuotaExceededError(
+                'The scratch workspaces use %d MB, more than the quota of '
+                '%d MB.' % (size / 1024 / 1024, self.quota))
+
+
+def check_scratch_quota():
+    """Check the quota of the scratch workspace in use, if any.
+
+    :raises: ScratchQuotaExceededError
+    """
+    if scratch_workspaces:
+        scratch_workspaces[-1].check_quota()
+
+
+@contextmanager
+def scratch_workspace(name=None):
+    """Use the scratch workspace in use, or a new one removed at the end.
+
+    :param name: A name to recognize the new workspace in the directory.
+    :type name: basestring
+    """
+    if scratch_workspaces:
+        yield scratch_workspaces[-1]
+    else:
+        with ScratchWorkspace(name) as workspace:
+            yield workspace
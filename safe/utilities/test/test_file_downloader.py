@@ -16,8 +16,18 @@ __date__ = '16/03/2014'
 __copyright__ = ('Copyright 2012, Australia Indonesia Facility for '
                  'Disaster Reduction')
 
-import unittest
+import hashlib
+import os
 import tempfile
+import threading
+import unittest
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
 
 # AG: Although we don't use qgis here, qgis should be imported before PyQt to
 #  force this test to use SIP API V.2
@@ -30,9 +40,68 @@ from safe.test.utilities import assert_hash_for_file, get_qgis_app
 
 QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
 
+# The payload served by the local server is made of this block.
+BLOCK = ''.join(chr(i % 256) for i in range(64 * 1024))
+
+
+class PayloadHandler(BaseHTTPRequestHandler):
+
+    """Serve BLOCK repeated as many times as the path says, like /16."""
+
+    def do_GET(self):
+        """Send the payload, or the requested range of it."""
+        blocks = int(self.path.strip('/'))
+        size = blocks * len(BLOCK)
+        self.server.ranges.append(self.headers.get('Range'))
+
+        start = 0
+        if self.headers.get('Range'):
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            self.send_response(206)
+            self.send_header(
+                'Content-Range', 'bytes %s-%s/%s' % (start, size - 1, size))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(size - start))
+        self.end_headers()
+
+        # Start in the middle of a block if needed, then send whole blocks.
+        self.wfile.write(BLOCK[start % len(BLOCK):])
+        for _ in range(start // len(BLOCK) + 1, blocks):
+            self.wfile.write(BLOCK)
+
+    def log_message(self, *args):
+        """Don't log requests."""
+        pass
+
+
+def payload_hash(blocks):
+    """MD5 hex digest of a payload."""
+    md5 = hashlib.md5()
+    for _ in range(blocks):
+        md5.update(BLOCK)
+    return md5.hexdigest()
+
 
 class FileDownloaderTest(unittest.TestCase):
     """Test FileDownloader class."""
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), PayloadHandler)
+        self.server.ranges = []
+        self.url = 'http://127.0.0.1:%s/' % self.server.server_port
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.path = tempfile.mktemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        for path in [self.path, self.path + '.part']:
+            if os.path.exists(path):
+                os.remove(path)
+
     # noinspection PyMethodMayBeStatic
     def test_download(self):
         """Test download."""
@@ -60,3 +129,46 @@ class FileDownloaderTest(unittest.TestCase):
             raise DownloadError(error_message)
 
         assert_hash_for_file(unique_hash, path)
+
+    def test_download_checksum(self):
+        """Test the file is verified with its checksum."""
+        downloader = FileDownloader(
+            self.url + '16', self.path, checksum=payload_hash(16))
+        self.assertEqual(downloader.download(), (True, None))
+        assert_hash_for_file(payload_hash(16), self.path)
+        self.assertFalse(os.path.exists(self.path + '.part'))
+
+        os.remove(self.path)
+        downloader = FileDownloader(
+            self.url + '16', self.path, checksum=payload_hash(15))
+        result, _ = downloader.download()
+        self.assertFalse(result)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(self.path + '.part'))
+
+    def test_download_resume(self):
+        """Test an interrupted download is resumed with a range request."""
+        size = len(BLOCK) * 5 + 100
+        with open(self.path + '.part', 'wb') as partial_file:
+            for _ in range(5):
+                partial_file.write(BLOCK)
+            partial_file.write(BLOCK[:100])
+
+        downloader = FileDownloader(
+            self.url + '16', self.path, checksum=payload_hash(16))
+        self.assertEqual(downloader.download(), (True, None))
+        self.assertEqual(self.server.ranges, ['bytes=%s-' % size])
+        assert_hash_for_file(payload_hash(16), self.path)
+
+    @unittest.skipIf(resource is None, 'resource is not available.')
+    def test_download_memory(self):
+        """Test a big file is not kept in memory."""
+        blocks = 2048  # 128 MB
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        downloader = FileDownloader(self.url + str(blocks), self.path)
+        self.assertEqual(downloader.download(), (True, None))
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        self.assertEqual(os.path.getsize(self.path), blocks * len(BLOCK))
+        # ru_maxrss is in kilobytes on Linux.
+        self.assertLess(after - before, blocks * len(BLOCK) / 1024 / 4)
@@ -25,11 +25,25 @@ import unittest
 import tempfile
 import shutil
 import os
+import threading
+import time
+import urlparse
+import zipfile
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+from osgeo import ogr, osr
 
 from PyQt4.QtCore import QObject, pyqtSignal, QVariant, QByteArray, QUrl
 from PyQt4.QtNetwork import QNetworkReply
 
-from safe.utilities.osm_downloader import fetch_zip, extract_zip
+from qgis.core import QgsVectorLayer
+
+from safe.common.utilities import temp_dir
+from safe.utilities import osm_downloader
+from safe.utilities.osm_downloader import (
+    fetch_zip, extract_zip, download, extent_tiles, prune_tile_cache)
+from safe.utilities.settings import delete_setting, set_setting
 from safe.test.utilities import standard_data_path, get_qgis_app
 from safe.common.version import get_version
 from safe.utilities.gis import qgis_version
@@ -159,6 +173,109 @@ class FakeQNetworkAccessManager:
         return reply
 
 
+# Features of the stand-in tile server: a point every 0.01 degree, some of
+# them on the border of tiles.
+TILE_SERVER_POINTS = [
+    (index, 106.0 + column * 0.01, -6.1 + row * 0.01)
+    for index, (column, row) in enumerate(
+        (column, row) for column in range(11) for row in range(11))]
+
+# Roads of the stand-in tile server, crossing the border of tiles.
+TILE_SERVER_LINES = [
+    (1, 'LINESTRING (106.02 -6.02, 106.12 -6.02)'),
+    (2, 'LINESTRING (106.03 -6.09, 106.03 -6.01)'),
+]
+
+
+class TileServer(ThreadingMixIn, HTTPServer):
+
+    """Stand-in OSM server, recording requests and concurrent requests."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), TileHandler)
+        self.requests = []
+        self.running = 0
+        self.maximum_running = 0
+        self.lock = threading.Lock()
+
+
+class TileHandler(BaseHTTPRequestHandler):
+
+    """Send a zipped shapefile with the features in the requested bbox.
+
+    Roads are clipped to the bbox, like the OSM server does.
+    """
+
+    def do_GET(self):
+        """Send the zip."""
+        with self.server.lock:
+            self.server.requests.append(self.path)
+            self.server.running += 1
+            self.server.maximum_running = max(
+                self.server.maximum_running, self.server.running)
+        # Let other requests arrive.
+        time.sleep(0.3)
+
+        query = urlparse.parse_qs(urlparse.urlparse(self.path).query)
+        bbox = [float(value) for value in query['bbox'][0].split(',')]
+        directory = tempfile.mkdtemp()
+        shapefile = os.path.join(directory, 'buildings.shp')
+        data_source = ogr.GetDriverByName('ESRI Shapefile').CreateDataSource(
+            shapefile)
+        spatial_reference = osr.SpatialReference()
+        spatial_reference.ImportFromEPSG(4326)
+        roads = '/roads' in self.path
+        layer = data_source.CreateLayer(
+            'buildings',
+            spatial_reference,
+            ogr.wkbLineString if roads else ogr.wkbPoint)
+        layer.CreateField(ogr.FieldDefn('osm_id', ogr.OFTInteger))
+        if roads:
+            box = ogr.CreateGeometryFromWkt(
+                'POLYGON ((%r %r, %r %r, %r %r, %r %r, %r %r))' % (
+                    bbox[0], bbox[1], bbox[2], bbox[1], bbox[2], bbox[3],
+                    bbox[0], bbox[3], bbox[0], bbox[1]))
+            for osm_id, wkt in TILE_SERVER_LINES:
+                geometry = ogr.CreateGeometryFromWkt(wkt).Intersection(box)
+                if geometry and not geometry.IsEmpty():
+                    feature = ogr.Feature(layer.GetLayerDefn())
+                    feature.SetField('osm_id', osm_id)
+                    feature.SetGeometry(geometry)
+                    layer.CreateFeature(feature)
+        else:
+            for osm_id, x, y in TILE_SERVER_POINTS:
+                if bbox[0] <= x <= bbox[2] and bbox[1] <= y <= bbox[3]:
+                    feature = ogr.Feature(layer.GetLayerDefn())
+                    feature.SetField('osm_id', osm_id + 1)
+                    feature.SetGeometry(
+                        ogr.CreateGeometryFromWkt('POINT (%r %r)' % (x, y)))
+                    layer.CreateFeature(feature)
+        data_source = None
+
+        zip_path = os.path.join(directory, 'tile.zip')
+        with zipfile.ZipFile(zip_path, 'w') as zip_file:
+            for extension in ['.shp', '.shx', '.dbf', '.prj']:
+                zip_file.write(
+                    shapefile.replace('.shp', extension),
+                    'buildings' + extension)
+        with open(zip_path, 'rb') as zip_file:
+            content = zip_file.read()
+        shutil.rmtree(directory)
+
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+        with self.server.lock:
+            self.server.running -= 1
+
+    def log_message(self, *args):
+        """Don't log requests."""
+        pass
+
+
 def read_all(path):
     """ Helper function to load all content of path in
         safe/test/data/control/files folder.
@@ -243,6 +360,100 @@ class OsmDownloaderTest(unittest.TestCase):
 
         shutil.rmtree(output_path)
 
+    def test_download_tiles(self):
+        """Test tiles are fetched concurrently, cached and merged.
+
+        .. versionadded:: 4.2
+        """
+        server = TileServer()
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        url_prefix = osm_downloader.URL_OSM_PREFIX
+        maximum_requests = osm_downloader.maximum_requests
+        maximum_tiles = osm_downloader.maximum_tiles
+        osm_downloader.URL_OSM_PREFIX = 'http://127.0.0.1:%s/' % (
+            server.server_port)
+        osm_downloader.maximum_requests = 2
+        cache_directory = temp_dir('test_osm_tiles')
+        shutil.rmtree(cache_directory)
+        set_setting('osmTileCachePath', cache_directory)
+        output_directory = tempfile.mkdtemp()
+        try:
+            extent = [106.005, -6.095, 106.095, -6.005]
+            self.assertEqual(len(extent_tiles(extent)), 4)
+
+            output_base_path = os.path.join(output_directory, 'first')
+            download('buildings', output_base_path, extent)
+            self.assertEqual(len(server.requests), 4)
+            self.assertEqual(server.maximum_running, 2)
+
+            # Points inside the extent, each one once even if it's on the
+            # border of two tiles.
+            expected = sorted(
+                osm_id + 1 for osm_id, x, y in TILE_SERVER_POINTS
+                if extent[0] <= x <= extent[2] and extent[1] <= y <= extent[3])
+            layer = QgsVectorLayer(
+                output_base_path + '.shp', 'buildings', 'ogr')
+            self.assertListEqual(
+                sorted(feature['osm_id'] for feature in layer.getFeatures()),
+                expected)
+
+            # The same extent comes from the cache.
+            download(
+                'buildings', os.path.join(output_directory, 'second'), extent)
+            self.assertEqual(len(server.requests), 4)
+
+            # A stale tile is downloaded again.
+            tile_path = os.path.join(
+                cache_directory,
+                'buildings',
+                str(osm_downloader.tile_size),
+                '%s_%s.zip' % extent_tiles(extent)[0])
+            os.utime(tile_path, (0, 0))
+            download(
+                'buildings', os.path.join(output_directory, 'third'), extent)
+            self.assertEqual(len(server.requests), 5)
+
+            # Roads crossing the border of tiles are joined and clipped to
+            # the extent.
+            output_base_path = os.path.join(output_directory, 'roads')
+            download('roads', output_base_path, extent)
+            layer = QgsVectorLayer(output_base_path + '.shp', 'roads', 'ogr')
+            lengths = dict(
+                (feature['osm_id'], feature.geometry().length())
+                for feature in layer.getFeatures())
+            self.assertEqual(sorted(lengths.keys()), [1, 2])
+            self.assertAlmostEqual(lengths[1], 106.095 - 106.02)
+            self.assertAlmostEqual(lengths[2], 6.09 - 6.01)
+            self.assertEqual(len(server.requests), 9)
+
+            # Too many tiles, a single request is sent for the extent.
+            osm_downloader.maximum_tiles = 3
+            output_base_path = os.path.join(output_directory, 'single')
+            download('buildings', output_base_path, extent)
+            self.assertEqual(len(server.requests), 10)
+            self.assertIn(
+                'bbox=106.005,-6.095,106.095,-6.005', server.requests[-1])
+            layer = QgsVectorLayer(
+                output_base_path + '.shp', 'buildings', 'ogr')
+            self.assertListEqual(
+                sorted(feature['osm_id'] for feature in layer.getFeatures()),
+                expected)
+
+            # Stale tiles are removed from the cache.
+            os.utime(tile_path, (0, 0))
+            self.assertEqual(prune_tile_cache(), 1)
+            self.assertFalse(os.path.exists(tile_path))
+        finally:
+            osm_downloader.URL_OSM_PREFIX = url_prefix
+            osm_downloader.maximum_requests = maximum_requests
+            osm_downloader.maximum_tiles = maximum_tiles
+            delete_setting('osmTileCachePath')
+            server.shutdown()
+            server.server_close()
+            shutil.rmtree(output_directory)
+
 
 if __name__ == '__main__':
     suite = unittest.makeSuite(OsmDownloaderTest, 'test')
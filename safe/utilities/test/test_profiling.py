@@ -0,0 +1,56 @@
+# coding=utf-8
+"""Test the profiling tree."""
+
+import unittest
+
+from safe.test.utilities import get_qgis_app
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from safe.utilities.profiling import clear_prof_data, profile, profiling_log
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+@profile
+def failing_step():
+    """A step which raises an error."""
+    raise ValueError
+
+
+@profile
+def other_step():
+    """A step which is fine."""
+
+
+@profile
+def analysis():
+    """A step calling the other ones, the error is caught."""
+    try:
+        failing_step()
+    except ValueError:
+        pass
+    other_step()
+
+
+class TestProfiling(unittest.TestCase):
+
+    """Test the profiling tree."""
+
+    def setUp(self):
+        clear_prof_data()
+
+    def tearDown(self):
+        clear_prof_data()
+
+    def test_step_raising(self):
+        """Test a step raising an error doesn't keep the next ones."""
+        analysis()
+        root = profiling_log()
+        self.assertEqual(
+            [child.key for child in root.children],
+            ['failing_step', 'other_step'])
+        self.assertIsNotNone(root.children[0].elapsed_time)
+        self.assertEqual(root.children[0].children, [])
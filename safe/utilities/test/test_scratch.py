@@ -0,0 +1,118 @@
+# coding=utf-8
+"""Test the scratch workspaces."""
+
+import os
+import unittest
+from os.path import exists, join
+
+from safe.test.utilities import get_qgis_app, load_test_vector_layer
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from safe.common.exceptions import ScratchQuotaExceededError
+from safe.common.utilities import temp_dir, unique_filename
+from safe.definitions.constants import ANALYSIS_SUCCESS, PREPARE_SUCCESS
+from safe.impact_function.impact_function import ImpactFunction
+from safe.utilities.scratch import (
+    ScratchWorkspace, check_scratch_quota, directory_size)
+
+__copyright__ = "Copyright 2016, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+def write_file(size):
+    """Write a temporary file of the given size in bytes."""
+    path = unique_filename(suffix='.bin', dir=temp_dir('pre-process'))
+    with open(path, 'wb') as output_file:
+        output_file.write('x' * size)
+    return path
+
+
+def own_workspaces(root):
+    """Workspaces of this process in the root directory."""
+    return [
+        join(root, name) for name in os.listdir(root)
+        if name.startswith('%s_' % os.getpid())]
+
+
+class TestScratch(unittest.TestCase):
+
+    """Test the scratch workspaces."""
+
+    def test_scratch_workspace(self):
+        """Test temporary files are removed with the workspace."""
+        with ScratchWorkspace(ram_disk=False) as workspace:
+            path = write_file(10)
+            self.assertTrue(path.startswith(workspace.path))
+        self.assertFalse(exists(workspace.path))
+        self.assertFalse(temp_dir().startswith(workspace.path))
+
+        # A retained workspace is kept until it's released.
+        with ScratchWorkspace(ram_disk=False) as workspace:
+            path = write_file(10)
+            workspace.retain()
+        self.assertTrue(exists(path))
+        workspace.release()
+        self.assertFalse(exists(path))
+
+        # It's removed if the run fails, even if it's retained.
+        try:
+            with ScratchWorkspace(ram_disk=False) as workspace:
+                workspace.retain()
+                write_file(10)
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(exists(workspace.path))
+
+    def test_quota(self):
+        """Test the workspaces can't use more than the quota."""
+        with ScratchWorkspace(quota=1, ram_disk=False) as workspace:
+            write_file(1024 * 1024 + 1)
+            # The quota is checked between steps, not for each file.
+            write_file(10)
+            with self.assertRaises(ScratchQuotaExceededError):
+                check_scratch_quota()
+        self.assertFalse(exists(workspace.path))
+
+        # No quota by default.
+        with ScratchWorkspace(ram_disk=False) as workspace:
+            write_file(1024 * 1024 + 1)
+            check_scratch_quota()
+
+    def test_disk_usage_bounded(self):
+        """Test the disk usage is bounded after 1000 runs."""
+        previous = None
+        for _ in range(1000):
+            with ScratchWorkspace(quota=10, ram_disk=False) as workspace:
+                write_file(10 * 1024)
+                write_file(1024)
+                # The output of the last run is still used.
+                workspace.retain()
+            if previous:
+                previous.release()
+            previous = workspace
+
+        workspaces = own_workspaces(workspace.root)
+        self.assertEqual(workspaces, [workspace.path])
+        self.assertEqual(directory_size(workspace.path), 11 * 1024)
+        workspace.release()
+        self.assertEqual(own_workspaces(workspace.root), [])
+
+    def test_impact_function(self):
+        """Test intermediate files of an analysis are removed."""
+        impact_function = ImpactFunction()
+        impact_function.hazard = load_test_vector_layer(
+            'gisv4', 'hazard', 'classified_vector.geojson')
+        impact_function.exposure = load_test_vector_layer(
+            'gisv4', 'exposure', 'building-points.geojson')
+        status, message = impact_function.prepare()
+        self.assertEqual(PREPARE_SUCCESS, status, message)
+        root = ScratchWorkspace(ram_disk=False).root
+        status, message = impact_function.run()
+        self.assertEqual(ANALYSIS_SUCCESS, status, message)
+
+        self.assertEqual(own_workspaces(root), [])
+        # Outputs are still in the datastore.
+        self.assertTrue(exists(impact_function.datastore.uri_path))